@@ -1 +1,24 @@
-# Register your models here.
+from django.contrib import admin
+from unfold.admin import ModelAdmin
+
+from grades.models import GradeSnapshot, GradeSync
+
+
+@admin.register(GradeSnapshot)
+class GradeSnapshotAdmin(ModelAdmin):
+    list_display = ("user", "term_id", "in_term_list", "fetched_at")
+    list_filter = ("term_id", "in_term_list")
+    list_select_related = ("user",)
+    search_fields = ("user__first_name", "user__last_name", "user__email", "user__student_number", "term_id")
+    readonly_fields = ("fetched_at",)
+    ordering = ("-fetched_at",)
+
+
+@admin.register(GradeSync)
+class GradeSyncAdmin(ModelAdmin):
+    list_display = ("user", "term_id", "status", "attempts", "requested_at", "finished_at")
+    list_filter = ("status",)
+    list_select_related = ("user",)
+    search_fields = ("user__first_name", "user__last_name", "user__email", "user__student_number", "term_id")
+    readonly_fields = ("requested_at", "started_at", "finished_at", "attempts", "last_error")
+    ordering = ("-requested_at",)
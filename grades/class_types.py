@@ -2,6 +2,8 @@ from collections.abc import Mapping
 
 from usos_api.services.courses import CourseClassTypeDescription, CourseClassTypesIndex
 
+from grades.dictionaries import SyncResult, upsert_rows
+from users import dictionaries
 from users.models import CourseClassType
 
 
@@ -16,18 +18,17 @@ def _class_type_names(data: CourseClassTypeDescription) -> tuple[str, str]:
     return _lang_text(name, "pl") or "", _lang_text(name, "en") or ""
 
 
-async def sync_class_types(class_types: CourseClassTypesIndex) -> int:
+async def sync_class_types(class_types: CourseClassTypesIndex) -> SyncResult:
+    rows = {}
     for class_type_id, class_type_data in class_types.items():
         name_pl, name_en = _class_type_names(class_type_data)
-        await CourseClassType.objects.aupdate_or_create(
-            id=class_type_id,
-            defaults={
-                "name_pl": name_pl,
-                "name_en": name_en,
-            },
-        )
-    return len(class_types)
+        rows[class_type_id] = {"name_pl": name_pl, "name_en": name_en}
+    result = await upsert_rows(CourseClassType, rows, ["name_pl", "name_en"])
+    if result.inserted or result.updated:
+        await dictionaries.class_types.ainvalidate()
+    return result
 
 
 async def get_class_types() -> dict[str, CourseClassType]:
-    return {class_type.id: class_type async for class_type in CourseClassType.objects.all()}
+    """All class types by id, from the process-wide cache (read-only)."""
+    return await dictionaries.class_types.aget()
@@ -0,0 +1,67 @@
+"""Bulk upserts for the USOS dictionaries (class types, terms).
+
+Each sync reads the stored rows once, skips the ones whose values are unchanged,
+and writes everything else with a single `bulk_create(update_conflicts=True)`.
+"""
+
+from collections.abc import Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from django.db import models
+
+
+@dataclass
+class SyncResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.inserted + self.updated + self.unchanged
+
+
+def _auto_now_fields(model: type[models.Model]) -> list[str]:
+    return [field.name for field in model._meta.concrete_fields if getattr(field, "auto_now", False)]
+
+
+async def upsert_rows(
+    model: type[models.Model],
+    rows: Mapping[str, Mapping[str, Any]],
+    fields: list[str],
+    *,
+    batch_size: int = 1000,
+) -> SyncResult:
+    """Store `rows` (primary key -> field values), writing only new or changed rows."""
+    result = SyncResult()
+    if not rows:
+        return result
+
+    pks = list(rows)
+    stored = {}
+    for start in range(0, len(pks), batch_size):
+        batch = model.objects.filter(pk__in=pks[start : start + batch_size]).values_list("pk", *fields)
+        stored.update({values[0]: values[1:] async for values in batch})
+    changed = []
+    for pk, values in rows.items():
+        current = stored.get(pk)
+        if current is None:
+            result.inserted += 1
+        elif current != tuple(values[field] for field in fields):
+            result.updated += 1
+        else:
+            result.unchanged += 1
+            continue
+        changed.append(model(pk=pk, **values))
+
+    if changed:
+        await model.objects.abulk_create(
+            changed,
+            batch_size=batch_size,
+            update_conflicts=True,
+            unique_fields=[model._meta.pk.name],
+            # `auto_now` stamps such as `synced_at` only move when a row is written.
+            update_fields=[*fields, *_auto_now_fields(model)],
+        )
+    return result
@@ -4,9 +4,6 @@ from typing import TypedDict
 from usos_api.models import (
     ExamReport,
     ExamReportCourseUnit,
-    ExamReportGradeDistributionItem,
-    ExamReportIssuerGrade,
-    ExamReportSession,
     LangDict,
     User,
     UserExamReportsByTerm,
@@ -109,6 +106,20 @@ class TermStats(TypedDict):
     weighted_points: float
 
 
+class CourseStatus(TypedDict):
+    course_id: str
+    course_name: str
+    ects: float
+    weighted_average: float | None
+    passing_status: str
+
+
+class TermSummary(TermStats):
+    graded_ects: float
+    ects_total: float
+    course_statuses: list[CourseStatus]
+
+
 class SerializedCoursesResult(TypedDict):
     courses: list[SerializedCourse]
     grades_by_term: dict[str, list[SerializedGrade]]
@@ -203,41 +214,6 @@ def serialize_user(value: User | None) -> SerializedModificationAuthor | None:
     return payload
 
 
-def serialize_course_unit(course_unit: ExamReportCourseUnit | None) -> SerializedCourseUnit | None:
-    if course_unit is None:
-        return None
-
-    payload: SerializedCourseUnit = {
-        "id": course_unit.id,
-        "course_id": course_unit.course_id,
-        "course_name": lang_payload(course_unit.course_name),
-        "classtype_id": course_unit.classtype_id,
-        "term_id": course_unit.term_id,
-    }
-    return payload
-
-
-def serialize_distribution_item(
-    item: ExamReportGradeDistributionItem,
-) -> SerializedGradeDistributionItem:
-    return {
-        "grade_symbol": item.grade_symbol,
-        "percentage": item.percentage,
-    }
-
-
-def issuer_grades(session: ExamReportSession) -> list[ExamReportIssuerGrade]:
-    return session.issuer_grades or []
-
-
-def counts_into_average(report: ExamReport, grade: ExamReportIssuerGrade) -> bool:
-    if grade.counts_into_average is not None:
-        return bool(grade.counts_into_average)
-    if report.counts_into_average is not None:
-        return bool(report.counts_into_average)
-    return True
-
-
 def course_name_from_reports(reports: list[ExamReport]) -> str | None:
     for report in reports:
         course_name = lang_text(report.course.name if report.course is not None else None)
@@ -260,80 +236,17 @@ def passing_status(grades: list[SerializedGrade]) -> str:
     return "failed"
 
 
-def serialize_grade(
-    *,
-    term_id: str,
-    course_id: str,
-    course_name: str | None,
-    ects: float | None,
-    report: ExamReport,
-    session: ExamReportSession,
-    grade: ExamReportIssuerGrade,
-    class_type_id: str | None,
-    class_types_by_id: dict[str, CourseClassType],
-) -> SerializedGrade:
-    course_unit = report.course_unit
-    value_symbol = grade.value_symbol
-    scope = "course_unit" if course_unit else "course"
-
-    return {
-        "term_id": term_id,
-        "course_id": course_id,
-        "course_name": course_name,
-        "ects": ects,
-        "value": numeric_grade(value_symbol),
-        "value_symbol": value_symbol,
-        "value_description": lang_text(grade.value_description) or value_symbol,
-        "counts_into_average": counts_into_average(report, grade),
-        "passes": grade.passes or False,
-        "exam_id": report.id,
-        "exam_session_number": session.number,
-        "report_type_id": report.type_id,
-        "report_type_description": lang_text(report.type_description),
-        "scope": scope,
-        "course_unit_id": course_unit.id if course_unit else None,
-        "class_type_id": class_type_id,
-        "class_type": serialize_class_type(class_type_id, class_types_by_id),
-        "comment": grade.comment,
-        "date_modified": date_text(grade.date_modified),
-        "modification_author": serialize_user(grade.modification_author),
-    }
-
-
-def serialize_report_grades(
-    *,
-    term_id: str,
-    course_id: str,
-    course_name: str | None,
-    ects: float | None,
-    report: ExamReport,
-    class_type_id: str | None,
-    class_types_by_id: dict[str, CourseClassType],
-) -> list[SerializedGrade]:
-    return [
-        serialize_grade(
-            term_id=term_id,
-            course_id=course_id,
-            course_name=course_name,
-            ects=ects,
-            report=report,
-            session=session,
-            grade=grade,
-            class_type_id=class_type_id,
-            class_types_by_id=class_types_by_id,
-        )
-        for session in (report.sessions or [])
-        for grade in issuer_grades(session)
-    ]
+def graded_ects(grades: list[SerializedGrade]) -> float:
+    """ECTS of the grades that have a numeric value: the denominator of the weighted average."""
+    return sum(
+        grade["ects"] or 0.0
+        for grade in grades
+        if grade["counts_into_average"] and grade.get("value") is not None and grade["ects"] is not None
+    )
 
 
 def weighted_totals(grades: list[SerializedGrade]) -> tuple[float | None, float, float]:
-    numeric_weighted_grades = [
-        grade
-        for grade in grades
-        if grade["counts_into_average"] and grade.get("value") is not None and grade["ects"] is not None
-    ]
-    numeric_weighted_ects = sum(grade["ects"] or 0.0 for grade in numeric_weighted_grades)
+    numeric_weighted_ects = graded_ects(grades)
     weighted_ects = sum(grade["ects"] or 0.0 for grade in grades if grade["counts_into_average"])
     weighted_points = sum(
         (grade.get("value") or 0.0) * (grade["ects"] or 0.0)
@@ -345,62 +258,6 @@ def weighted_totals(grades: list[SerializedGrade]) -> tuple[float | None, float,
     return weighted_points / numeric_weighted_ects, weighted_ects, weighted_points
 
 
-def serialize_course(
-    term_id: str,
-    course_id: str,
-    reports: list[ExamReport],
-    ects: float | None,
-    class_types_by_id: dict[str, CourseClassType],
-) -> tuple[SerializedCourse, list[SerializedGrade]]:
-    course_name = course_name_from_reports(reports) or course_id
-    report_payloads: list[SerializedReport] = []
-    final_grades: list[SerializedGrade] = []
-
-    for report in reports:
-        course_unit = report.course_unit
-        scope = "course_unit" if course_unit else "course"
-        class_type_id = course_unit.classtype_id if course_unit else None
-        grades = serialize_report_grades(
-            term_id=term_id,
-            course_id=course_id,
-            course_name=course_name,
-            ects=ects,
-            report=report,
-            class_type_id=class_type_id,
-            class_types_by_id=class_types_by_id,
-        )
-        if scope == "course":
-            final_grades.extend(grades)
-
-        report_payload: SerializedReport = {
-            "id": report.id,
-            "type_id": report.type_id,
-            "type_description": lang_text(report.type_description),
-            "scope": scope,
-            "class_type_id": class_type_id,
-            "class_type": serialize_class_type(class_type_id, class_types_by_id),
-            "course_unit": serialize_course_unit(course_unit),
-            "grades_distribution": [serialize_distribution_item(item) for item in (report.grades_distribution or [])],
-            "grades": grades,
-        }
-        report_payloads.append(report_payload)
-
-    weighted_average, _, _ = weighted_totals(final_grades)
-    course_class_type = course_class_type_from_suffix(course_id, class_types_by_id)
-    class_types: list[SerializedClassType] = [] if course_class_type is None else [course_class_type]
-    course_payload: SerializedCourse = {
-        "course_id": course_id,
-        "course_name": course_name,
-        "term_id": term_id,
-        "ects": ects or 0,
-        "weighted_average": weighted_average,
-        "passing_status": passing_status(final_grades),
-        "class_types": class_types,
-        "reports": report_payloads,
-    }
-    return course_payload, final_grades
-
-
 def term_stats(grades: list[SerializedGrade]) -> TermStats:
     weighted_average, weighted_ects, weighted_points = weighted_totals(grades)
     return {
@@ -410,6 +267,185 @@ def term_stats(grades: list[SerializedGrade]) -> TermStats:
     }
 
 
+def term_summary(grades: list[SerializedGrade], courses: list[SerializedCourse]) -> TermSummary:
+    """Aggregates of one term's serialized grades and courses, stored on its snapshot."""
+    return {
+        **term_stats(grades),
+        "graded_ects": graded_ects(grades),
+        "ects_total": sum(course["ects"] or 0.0 for course in courses),
+        "course_statuses": [
+            {
+                "course_id": course["course_id"],
+                "course_name": course["course_name"],
+                "ects": course["ects"],
+                "weighted_average": course["weighted_average"],
+                "passing_status": course["passing_status"],
+            }
+            for course in courses
+        ],
+    }
+
+
+class _CourseSerializer:
+    """Serializes one user's reports in a single pass over reports, sessions and grades.
+
+    Payloads that repeat across courses (class types, course-unit names, authors)
+    are built once and shared, so treat the output as read-only.
+    """
+
+    def __init__(self, class_types_by_id: dict[str, CourseClassType]):
+        self.class_types_by_id = class_types_by_id
+        self._class_types: dict[str | None, SerializedClassType | None] = {None: None, "": None}
+        self._suffix_class_types: dict[str, SerializedClassType | None] = {}
+        self._lang_payloads: dict[tuple[str | None, str | None], SerializedLangDict] = {}
+        self._authors: dict[tuple, SerializedModificationAuthor] = {}
+        # A transcript has a handful of distinct symbols and protocol dates.
+        self._values: dict[str | None, float | None] = {}
+        self._dates: dict[date | datetime | str | None, str | None] = {}
+
+    def class_type(self, class_type_id: str | None) -> SerializedClassType | None:
+        try:
+            return self._class_types[class_type_id]
+        except KeyError:
+            payload = self._class_types[class_type_id] = serialize_class_type(class_type_id, self.class_types_by_id)
+            return payload
+
+    def course_class_type(self, course_id: str) -> SerializedClassType | None:
+        if not course_id:
+            return None
+        suffix = course_id[-1].upper()
+        try:
+            return self._suffix_class_types[suffix]
+        except KeyError:
+            payload = self._suffix_class_types[suffix] = course_class_type_from_suffix(suffix, self.class_types_by_id)
+            return payload
+
+    def lang_payload(self, value: LangDict | None) -> SerializedLangDict | None:
+        if value is None:
+            return None
+        key = (value.pl, value.en)
+        payload = self._lang_payloads.get(key)
+        if payload is None:
+            payload = self._lang_payloads[key] = lang_payload(value)
+        return payload
+
+    def author(self, value: User | None) -> SerializedModificationAuthor | None:
+        if value is None:
+            return None
+        key = (value.id, value.first_name, value.last_name)
+        payload = self._authors.get(key)
+        if payload is None:
+            payload = self._authors[key] = serialize_user(value)
+        return payload
+
+    def value(self, value_symbol: str | None) -> float | None:
+        try:
+            return self._values[value_symbol]
+        except KeyError:
+            value = self._values[value_symbol] = numeric_grade(value_symbol)
+            return value
+
+    def date(self, value: date | datetime | str | None) -> str | None:
+        try:
+            return self._dates[value]
+        except KeyError:
+            text = self._dates[value] = date_text(value)
+            return text
+
+    def course_unit(self, course_unit: ExamReportCourseUnit) -> SerializedCourseUnit:
+        return {
+            "id": course_unit.id,
+            "course_id": course_unit.course_id,
+            "course_name": self.lang_payload(course_unit.course_name),
+            "classtype_id": course_unit.classtype_id,
+            "term_id": course_unit.term_id,
+        }
+
+    def course(
+        self,
+        term_id: str,
+        course_id: str,
+        reports: list[ExamReport],
+        ects: float | None,
+    ) -> tuple[SerializedCourse, list[SerializedGrade]]:
+        course_name = course_name_from_reports(reports) or course_id
+        report_payloads: list[SerializedReport] = []
+        final_grades: list[SerializedGrade] = []
+
+        for report in reports:
+            course_unit = report.course_unit
+            if course_unit is None:
+                scope, class_type_id, course_unit_id, course_unit_payload = "course", None, None, None
+            else:
+                scope, class_type_id, course_unit_id = "course_unit", course_unit.classtype_id, course_unit.id
+                course_unit_payload = self.course_unit(course_unit)
+            class_type = self.class_type(class_type_id)
+            report_type_description = lang_text(report.type_description)
+            report_counts = True if report.counts_into_average is None else bool(report.counts_into_average)
+
+            grades: list[SerializedGrade] = []
+            for session in report.sessions or ():
+                for grade in session.issuer_grades or ():
+                    value_symbol = grade.value_symbol
+                    counts = grade.counts_into_average
+                    grades.append(
+                        {
+                            "term_id": term_id,
+                            "course_id": course_id,
+                            "course_name": course_name,
+                            "ects": ects,
+                            "value": self.value(value_symbol),
+                            "value_symbol": value_symbol,
+                            "value_description": lang_text(grade.value_description) or value_symbol,
+                            "counts_into_average": report_counts if counts is None else bool(counts),
+                            "passes": grade.passes or False,
+                            "exam_id": report.id,
+                            "exam_session_number": session.number,
+                            "report_type_id": report.type_id,
+                            "report_type_description": report_type_description,
+                            "scope": scope,
+                            "course_unit_id": course_unit_id,
+                            "class_type_id": class_type_id,
+                            "class_type": class_type,
+                            "comment": grade.comment,
+                            "date_modified": self.date(grade.date_modified),
+                            "modification_author": self.author(grade.modification_author),
+                        }
+                    )
+            if course_unit is None:
+                final_grades.extend(grades)
+
+            report_payloads.append(
+                {
+                    "id": report.id,
+                    "type_id": report.type_id,
+                    "type_description": report_type_description,
+                    "scope": scope,
+                    "class_type_id": class_type_id,
+                    "class_type": class_type,
+                    "course_unit": course_unit_payload,
+                    "grades_distribution": [
+                        {"grade_symbol": item.grade_symbol, "percentage": item.percentage}
+                        for item in report.grades_distribution or ()
+                    ],
+                    "grades": grades,
+                }
+            )
+
+        course_class_type = self.course_class_type(course_id)
+        course_payload: SerializedCourse = {
+            "course_id": course_id,
+            "course_name": course_name,
+            "term_id": term_id,
+            "ects": ects or 0,
+            "weighted_average": weighted_totals(final_grades)[0],
+            "passing_status": passing_status(final_grades),
+            "class_types": [] if course_class_type is None else [course_class_type],
+            "reports": report_payloads,
+        }
+        return course_payload, final_grades
+
+
 def serialize_courses(
     *,
     reports_by_term: UserExamReportsByTerm,
@@ -417,19 +453,18 @@ def serialize_courses(
     term_ids: list[str],
     class_types_by_id: dict[str, CourseClassType],
 ) -> SerializedCoursesResult:
+    serializer = _CourseSerializer(class_types_by_id)
     courses_payload: list[SerializedCourse] = []
     grades_by_term: dict[str, list[SerializedGrade]] = {term_id: [] for term_id in term_ids}
 
     for report_term_id, courses in reports_by_term.items():
+        term_ects = ects_by_term.get(report_term_id, {})
+        term_grades = grades_by_term.setdefault(report_term_id, [])
         for course_id, reports in courses.items():
-            course_payload, final_grades = serialize_course(
-                term_id=report_term_id,
-                course_id=course_id,
-                reports=reports,
-                ects=ects_by_term.get(report_term_id, {}).get(course_id),
-                class_types_by_id=class_types_by_id,
+            course_payload, final_grades = serializer.course(
+                report_term_id, course_id, reports, term_ects.get(course_id)
             )
             courses_payload.append(course_payload)
-            grades_by_term.setdefault(report_term_id, []).extend(final_grades)
+            term_grades.extend(final_grades)
 
     return {"courses": courses_payload, "grades_by_term": grades_by_term}
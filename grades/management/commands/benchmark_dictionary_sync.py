@@ -0,0 +1,113 @@
+"""Benchmark the USOS term sync on synthetic terms.
+
+    python manage.py benchmark_dictionary_sync                # 5000 terms
+    python manage.py benchmark_dictionary_sync --terms 20000 --changed 0.05
+    python manage.py benchmark_dictionary_sync --baseline main
+
+Runs three passes (first sync, unchanged re-sync, re-sync with a share of
+renamed terms) with `sync_terms`. With `--baseline`, also runs them with
+`sync_terms` as of that git revision (e.g. `8fbf523~1`, the per-row
+`aupdate_or_create` loop) and checks both store the same terms. Everything
+runs inside a transaction that is rolled back, so the database is left
+untouched.
+"""
+
+import random
+import time
+from datetime import date, timedelta
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from grades.terms import TermDescription, sync_terms
+from testownik_core.benchmarks import module_at_revision
+from users.models import Term
+
+ID_PREFIX = "BENCH-"
+
+
+def synthetic_terms(count: int, seed: int) -> list[TermDescription]:
+    rng = random.Random(seed)
+    terms = []
+    for index in range(count):
+        start = date(2000, 10, 1) + timedelta(days=rng.randrange(0, 9000))
+        terms.append(
+            {
+                "id": f"{ID_PREFIX}{index:06d}",
+                "order_key": index,
+                "name": {"pl": f"Semestr {index}", "en": f"Term {index}"},
+                "start_date": start.isoformat(),
+                "end_date": (start + timedelta(days=120)).isoformat(),
+                "finish_date": (start + timedelta(days=140)).isoformat(),
+                "is_active": False,
+            }
+        )
+    return terms
+
+
+def renamed(terms: list[TermDescription], share: float, seed: int) -> list[TermDescription]:
+    rng = random.Random(seed)
+    return [
+        {**term, "name": {"pl": f"{term['name']['pl']} (zm.)", "en": term["name"]["en"]}}
+        if rng.random() < share
+        else term
+        for term in terms
+    ]
+
+
+class Command(BaseCommand):
+    help = "Benchmark the USOS term sync on synthetic terms (rolled back afterwards)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", type=int, default=5000, help="Synthetic terms (default: 5000).")
+        parser.add_argument(
+            "--changed", type=float, default=0.1, help="Share of terms renamed in the last pass (default: 0.1)."
+        )
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+        parser.add_argument(
+            "--baseline", metavar="REVISION", help="Also time (and compare with) the sync at this git revision."
+        )
+
+    def handle(self, *args, **options):
+        terms = synthetic_terms(options["terms"], options["seed"])
+        passes = [
+            ("first sync", terms),
+            ("unchanged", terms),
+            ("changed", renamed(terms, options["changed"], options["seed"])),
+        ]
+        self.stdout.write(f"{len(terms)} synthetic term(s).")
+
+        implementations = [("sync_terms", sync_terms)]
+        if options["baseline"]:
+            baseline = module_at_revision("grades.terms", options["baseline"])
+            implementations.append((options["baseline"], baseline.sync_terms))
+
+        snapshots = []
+        for label, sync in implementations:
+            snapshots.append(self._run(label, sync, passes))
+        if len(snapshots) > 1 and snapshots[0] != snapshots[1]:
+            raise CommandError(f"Stored terms differ from the sync at {options['baseline']}.")
+        if len(snapshots) > 1:
+            self.stdout.write(self.style.SUCCESS("Stored terms are identical."))
+
+    def _run(self, label, sync, passes):
+        self.stdout.write(f"  {label}")
+        with transaction.atomic():
+            for name, terms in passes:
+                started = time.perf_counter()
+                result = async_to_sync(sync)(terms)
+                elapsed = time.perf_counter() - started
+                detail = (
+                    f" ({result.inserted} inserted, {result.updated} updated, {result.unchanged} unchanged)"
+                    if not isinstance(result, int)
+                    else ""
+                )
+                self.stdout.write(f"    {name:<11} {elapsed * 1000:9.1f} ms{detail}")
+            stored = list(
+                Term.objects.filter(id__startswith=ID_PREFIX)
+                .order_by("id")
+                .values_list("id", "name", "start_date", "end_date", "finish_date")
+            )
+            transaction.set_rollback(True)
+        return stored
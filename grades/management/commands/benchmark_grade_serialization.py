@@ -0,0 +1,146 @@
+"""Benchmark `serialize_courses` on synthetic exam reports.
+
+    python manage.py benchmark_grade_serialization                # 12 terms x 10 courses
+    python manage.py benchmark_grade_serialization --terms 20 --courses 15 --repeat 20
+    python manage.py benchmark_grade_serialization --baseline main
+
+Times `serialize_courses`. With `--baseline`, also times `serialize_courses` as
+of that git revision (e.g. `a92c06d~1`, the helper-per-grade serializer) and
+checks that both produce the same payload. No database access.
+"""
+
+import gc
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from usos_api.models import UserExamReportsByTerm, parse_user_exam_reports
+
+from grades.grade_reports import serialize_courses
+from testownik_core.benchmarks import module_at_revision
+from users.models import CourseClassType
+
+CLASS_TYPES = {"W": "Wykład", "C": "Ćwiczenia", "L": "Laboratorium", "P": "Projekt", "S": "Seminarium"}
+GRADE_SYMBOLS = ["2", "3", "3,5", "4", "4,5", "5", "5,5", "ZAL", "NZAL"]
+LECTURERS = [
+    {"id": str(100 + index), "first_name": first, "last_name": last}
+    for index, (first, last) in enumerate([("Jan", "Kowalski"), ("Anna", "Nowak"), ("Piotr", "Wiśniewski")])
+]
+
+
+def synthetic_reports(terms: int, courses: int, seed: int) -> tuple[UserExamReportsByTerm, dict]:
+    """A long study history: every course has a final grade and a report per class type."""
+    rng = random.Random(seed)
+    raw: dict[str, dict[str, list[dict]]] = {}
+    ects_by_term: dict[str, dict[str, float]] = {}
+    report_id = 0
+    for term_index in range(terms):
+        term_id = f"{2010 + term_index // 2}/{11 + term_index // 2}-{'ZL'[term_index % 2]}"
+        raw[term_id] = {}
+        ects_by_term[term_id] = {}
+        for course_index in range(courses):
+            course_id = f"INZ{term_index:02d}{course_index:03d}{rng.choice('WCLG')}"
+            name = f"Kurs {term_index}.{course_index}"
+            course = {"id": course_id, "name": {"pl": name, "en": f"Course {term_index}.{course_index}"}}
+            reports = []
+            for class_type_id in [None, *rng.sample(sorted(CLASS_TYPES), rng.randint(1, 3))]:
+                report_id += 1
+                sessions = [
+                    {
+                        "number": number,
+                        "issuer_grades": [
+                            {
+                                "value_symbol": rng.choice(GRADE_SYMBOLS),
+                                "passes": rng.random() < 0.85,
+                                "counts_into_average": rng.choice(["T", "N", None]),
+                                "date_modified": f"20{10 + term_index // 2}-02-{number + 1:02d} 10:00:00",
+                                "modification_author": rng.choice(LECTURERS),
+                            }
+                        ],
+                    }
+                    for number in range(1, rng.randint(1, 2) + 1)
+                ]
+                report = {
+                    "id": report_id,
+                    "type_id": "E" if class_type_id is None else "Z",
+                    "type_description": {"pl": "Egzamin", "en": "Exam"},
+                    "counts_into_average": "T",
+                    "term_id": term_id,
+                    "course": course,
+                    "sessions": sessions,
+                    "grades_distribution": [
+                        {"grade_symbol": symbol, "percentage": round(rng.random() * 30, 1)}
+                        for symbol in ("3", "4", "5")
+                    ],
+                }
+                if class_type_id is not None:
+                    report["course_unit"] = {
+                        "id": str(report_id),
+                        "course_id": course_id,
+                        "course_name": course["name"],
+                        "classtype_id": class_type_id,
+                        "term_id": term_id,
+                    }
+                reports.append(report)
+            raw[term_id][course_id] = reports
+            ects_by_term[term_id][course_id] = float(rng.choice([2, 3, 4, 5, 6]))
+    return parse_user_exam_reports(raw), ects_by_term
+
+
+class Command(BaseCommand):
+    help = "Benchmark serialize_courses on synthetic exam reports (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--terms", type=int, default=12, help="Synthetic terms (default: 12).")
+        parser.add_argument("--courses", type=int, default=10, help="Courses per term (default: 10).")
+        parser.add_argument("--repeat", type=int, default=10, help="Timed runs; the best is reported (default: 10).")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+        parser.add_argument(
+            "--baseline", metavar="REVISION", help="Also time (and compare with) the serializer at this git revision."
+        )
+
+    def handle(self, *args, **options):
+        reports_by_term, ects_by_term = synthetic_reports(options["terms"], options["courses"], options["seed"])
+        kwargs = {
+            "reports_by_term": reports_by_term,
+            "ects_by_term": ects_by_term,
+            "term_ids": list(reports_by_term),
+            "class_types_by_id": {
+                class_type_id: CourseClassType(id=class_type_id, name_pl=name, name_en=name)
+                for class_type_id, name in CLASS_TYPES.items()
+            },
+        }
+        grades = sum(
+            len(session.issuer_grades or [])
+            for courses in reports_by_term.values()
+            for reports in courses.values()
+            for report in reports
+            for session in report.sessions or []
+        )
+        self.stdout.write(
+            f"{len(reports_by_term)} term(s), {sum(map(len, reports_by_term.values()))} course(s), {grades} grade(s)."
+        )
+
+        result = self._measure("serialize_courses", serialize_courses, kwargs, options["repeat"])
+        if not options["baseline"]:
+            return
+        baseline = module_at_revision("grades.grade_reports", options["baseline"])
+        expected = self._measure(options["baseline"], baseline.serialize_courses, kwargs, options["repeat"])
+        if result != expected:
+            raise CommandError(f"Payload differs from the serializer at {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS("Payloads are identical."))
+
+    def _measure(self, label, fn, kwargs, repeat):
+        best = float("inf")
+        for _ in range(max(1, repeat)):
+            # Like `timeit`: collector pauses would dominate runs this short.
+            gc.collect()
+            gc.disable()
+            try:
+                started = time.perf_counter()
+                result = fn(**kwargs)
+                best = min(best, time.perf_counter() - started)
+            finally:
+                gc.enable()
+        self.stdout.write(f"  {label:<18} {best * 1000:8.2f} ms (best of {max(1, repeat)})")
+        return result
@@ -0,0 +1,42 @@
+from datetime import timedelta
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from grades.models import GradeSync
+from grades.sync import run_syncs
+
+
+class Command(BaseCommand):
+    help = "Run pending grade syncs no worker picked up, e.g. after a restart."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.GRADES_SYNC_CONCURRENCY,
+            help=f"Concurrent USOS fetches (default: {settings.GRADES_SYNC_CONCURRENCY}).",
+        )
+        parser.add_argument(
+            "--include-failed",
+            action="store_true",
+            help="Also retry syncs that gave up.",
+        )
+
+    def handle(self, *args, **options):
+        lost_before = timezone.now() - timedelta(seconds=settings.GRADES_SYNC_TIMEOUT_SECONDS)
+        requeued = GradeSync.objects.filter(status=GradeSync.Status.RUNNING, started_at__lt=lost_before)
+        if options["include_failed"]:
+            requeued |= GradeSync.objects.filter(status=GradeSync.Status.FAILED)
+        requeued.update(status=GradeSync.Status.PENDING, requested_at=timezone.now(), attempts=0, last_error="")
+
+        sync_ids = [
+            str(sync_id)
+            for sync_id in GradeSync.objects.filter(status=GradeSync.Status.PENDING)
+            .order_by("requested_at")
+            .values_list("id", flat=True)
+        ]
+        succeeded = async_to_sync(run_syncs)(sync_ids, options["concurrency"])
+        self.stdout.write(self.style.SUCCESS(f"Ran {len(sync_ids)} grade sync(s), {succeeded} succeeded."))
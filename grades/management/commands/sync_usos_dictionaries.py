@@ -1,6 +1,7 @@
+import asyncio
 from typing import Literal, cast
 
-import requests
+import aiohttp
 from asgiref.sync import async_to_sync
 from django.core.management.base import BaseCommand, CommandError
 from usos_api.services.courses import CourseClassTypesIndex
@@ -40,39 +41,44 @@ class Command(BaseCommand):
         )
 
     def handle(self, *args, **options):
-        base_url = options["base_url"].rstrip("/") + "/"
-        resource = cast(Resource, options["resource"])
-        dry_run = options["dry_run"]
+        async_to_sync(self._sync)(
+            base_url=options["base_url"].rstrip("/") + "/",
+            resource=cast(Resource, options["resource"]),
+            timeout=options["timeout"],
+            dry_run=options["dry_run"],
+        )
 
-        if resource in {"all", "class-types"}:
-            class_types = self._fetch_class_types(base_url, options["timeout"])
-            if dry_run:
-                self.stdout.write(self.style.SUCCESS(f"Fetched {len(class_types)} class types."))
-            else:
-                synced_count = async_to_sync(sync_class_types)(class_types)
-                self.stdout.write(self.style.SUCCESS(f"Synced {synced_count} class types."))
+    async def _sync(self, *, base_url: str, resource: Resource, timeout: float, dry_run: bool) -> None:
+        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout), trust_env=True) as session:
+            fetches = {}
+            if resource in {"all", "class-types"}:
+                fetches["class types"] = (self._fetch_class_types(session, base_url), sync_class_types)
+            if resource in {"all", "terms"}:
+                fetches["terms"] = (self._fetch_terms(session, base_url), sync_terms)
+            payloads = await asyncio.gather(*(fetch for fetch, _ in fetches.values()))
 
-        if resource in {"all", "terms"}:
-            terms = self._fetch_terms(base_url, options["timeout"])
+        for (label, (_, sync)), payload in zip(fetches.items(), payloads, strict=True):
             if dry_run:
-                self.stdout.write(self.style.SUCCESS(f"Fetched {len(terms)} terms."))
-            else:
-                synced_count = async_to_sync(sync_terms)(terms)
-                self.stdout.write(self.style.SUCCESS(f"Synced {synced_count} terms."))
+                self.stdout.write(self.style.SUCCESS(f"Fetched {len(payload)} {label}."))
+                continue
+            result = await sync(payload)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Synced {result.total} {label}: {result.inserted} inserted, "
+                    f"{result.updated} updated, {result.unchanged} unchanged."
+                )
+            )
 
-    def _fetch_class_types(self, base_url: str, timeout: float) -> CourseClassTypesIndex:
-        data = self._get_json(
-            f"{base_url}services/courses/classtypes_index",
-            timeout=timeout,
-        )
+    async def _fetch_class_types(self, session: aiohttp.ClientSession, base_url: str) -> CourseClassTypesIndex:
+        data = await self._get_json(session, f"{base_url}services/courses/classtypes_index")
         if not isinstance(data, dict):
             raise CommandError("USOS returned invalid class type index payload.")
         return cast(CourseClassTypesIndex, data)
 
-    def _fetch_terms(self, base_url: str, timeout: float) -> list[TermDescription]:
-        data = self._get_json(
+    async def _fetch_terms(self, session: aiohttp.ClientSession, base_url: str) -> list[TermDescription]:
+        data = await self._get_json(
+            session,
             f"{base_url}services/terms/terms_index",
-            timeout=timeout,
             params={
                 "active_only": "false",
             },
@@ -81,20 +87,16 @@ class Command(BaseCommand):
             raise CommandError("USOS returned invalid terms index payload.")
         return data
 
-    def _get_json(
+    async def _get_json(
         self,
+        session: aiohttp.ClientSession,
         url: str,
         *,
-        timeout: float,
         params: dict[str, str] | None = None,
     ):
         try:
-            response = requests.get(
-                url,
-                params={"format": "json", **(params or {})},
-                timeout=timeout,
-            )
-            response.raise_for_status()
-            return response.json()
-        except requests.RequestException as exc:
+            async with session.get(url, params={"format": "json", **(params or {})}) as response:
+                response.raise_for_status()
+                return await response.json()
+        except (aiohttp.ClientError, TimeoutError) as exc:
             raise CommandError(f"Failed to fetch {url}: {exc}") from exc
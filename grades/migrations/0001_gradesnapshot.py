@@ -0,0 +1,36 @@
+# Generated by Django 6.0.6 on 2026-10-19 04:16
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GradeSnapshot',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('term_id', models.CharField(max_length=100)),
+                ('in_term_list', models.BooleanField(default=False, help_text="Listed by the user's last all-terms fetch (shown when no term is selected).")),
+                ('raw_reports', models.JSONField(default=dict)),
+                ('ects', models.JSONField(default=dict)),
+                ('courses', models.JSONField(default=list)),
+                ('grades', models.JSONField(default=list)),
+                ('fetched_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_snapshots', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['term_id'],
+                'constraints': [models.UniqueConstraint(fields=('user', 'term_id'), name='one_grade_snapshot_per_user_term')],
+            },
+        ),
+    ]
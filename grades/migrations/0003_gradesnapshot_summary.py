@@ -0,0 +1,78 @@
+# Generated by Django 6.0.6 on 2026-10-19 04:43
+
+from django.db import migrations, models
+
+
+# A frozen copy of `grades.grade_reports.term_summary` as of this migration, which must not follow later changes.
+def term_summary(grades, courses):
+    counted = [grade for grade in grades if grade["counts_into_average"]]
+    numeric = [grade for grade in counted if grade.get("value") is not None]
+    graded_ects = sum(grade["ects"] or 0.0 for grade in numeric if grade["ects"] is not None)
+    weighted_points = sum(grade["value"] * (grade["ects"] or 0.0) for grade in numeric)
+    return {
+        "weighted_average": weighted_points / graded_ects if graded_ects else None,
+        "weighted_ects": sum(grade["ects"] or 0.0 for grade in counted),
+        "weighted_points": weighted_points,
+        "graded_ects": graded_ects,
+        "ects_total": sum(course["ects"] or 0.0 for course in courses),
+        "course_statuses": [
+            {
+                "course_id": course["course_id"],
+                "course_name": course["course_name"],
+                "ects": course["ects"],
+                "weighted_average": course["weighted_average"],
+                "passing_status": course["passing_status"],
+            }
+            for course in courses
+        ],
+    }
+
+
+def backfill_summaries(apps, schema_editor):
+    GradeSnapshot = apps.get_model("grades", "GradeSnapshot")
+
+    for snapshot in GradeSnapshot.objects.all().iterator():
+        for field, value in term_summary(snapshot.grades, snapshot.courses).items():
+            setattr(snapshot, field, value)
+        snapshot.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0002_gradesync'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='course_statuses',
+            field=models.JSONField(default=list),
+        ),
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='ects_total',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='graded_ects',
+            field=models.FloatField(default=0, help_text="ECTS of numeric grades (the average's denominator)."),
+        ),
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='weighted_average',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='weighted_ects',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='gradesnapshot',
+            name='weighted_points',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 06:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('grades', '0003_gradesnapshot_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gradesync',
+            name='retry_after',
+            field=models.DateTimeField(blank=True, help_text="When a failed sync may be requested again; empty after USOS errors retrying won't fix.", null=True),
+        ),
+    ]
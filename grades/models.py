@@ -1 +1,89 @@
-# Create your models here.
+import uuid
+
+from django.conf import settings
+from django.db import models
+
+
+class GradeSnapshot(models.Model):
+    """The last USOS grade fetch for one user and term, served by `/grades`.
+
+    Keeps the raw exam reports next to the serialized output so a snapshot can
+    be re-serialized (e.g. after class types change) without calling USOS, and
+    the term's aggregates next to both for `/grades/history/`.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="grade_snapshots")
+    term_id = models.CharField(max_length=100)
+    in_term_list = models.BooleanField(
+        default=False,
+        help_text="Listed by the user's last all-terms fetch (shown when no term is selected).",
+    )
+
+    # Raw USOS data: {course_id: [exam report]} and {course_id: ects}.
+    raw_reports = models.JSONField(default=dict)
+    ects = models.JSONField(default=dict)
+
+    # `serialize_courses` output for this term.
+    courses = models.JSONField(default=list)
+    grades = models.JSONField(default=list)
+
+    # `term_summary` of the above, so the term list and history never re-read `grades` / `courses`.
+    weighted_average = models.FloatField(null=True, blank=True)
+    weighted_ects = models.FloatField(default=0)
+    weighted_points = models.FloatField(default=0)
+    graded_ects = models.FloatField(default=0, help_text="ECTS of numeric grades (the average's denominator).")
+    ects_total = models.FloatField(default=0)
+    course_statuses = models.JSONField(default=list)
+
+    fetched_at = models.DateTimeField()
+
+    class Meta:
+        ordering = ["term_id"]
+        constraints = [
+            models.UniqueConstraint(fields=["user", "term_id"], name="one_grade_snapshot_per_user_term"),
+        ]
+
+    def __str__(self):
+        return f"Grades {self.term_id} · {self.user_id}"
+
+    def stats(self) -> dict:
+        return {
+            "weighted_average": self.weighted_average,
+            "weighted_ects": self.weighted_ects,
+            "weighted_points": self.weighted_points,
+        }
+
+
+class GradeSync(models.Model):
+    """State of the background USOS fetch for one user and scope (a term, or "" for all terms)."""
+
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        RUNNING = "running", "Running"
+        SUCCEEDED = "succeeded", "Succeeded"
+        FAILED = "failed", "Failed"
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="grade_syncs")
+    term_id = models.CharField(max_length=100, blank=True, default="")
+    status = models.CharField(max_length=16, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True, default="")
+    requested_at = models.DateTimeField()
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    retry_after = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="When a failed sync may be requested again; empty after USOS errors retrying won't fix.",
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "term_id"], name="one_grade_sync_per_user_scope"),
+        ]
+        indexes = [models.Index(fields=["status", "requested_at"])]
+
+    def __str__(self):
+        return f"Grade sync {self.term_id or 'all terms'} · {self.user_id} · {self.status}"
@@ -0,0 +1,91 @@
+"""Per-user, per-term snapshots of USOS grades (stale-while-revalidate).
+
+`/grades` serves the stored snapshots. Missing snapshots and ones older than
+`settings.GRADES_SNAPSHOT_TTL_SECONDS` are asked for through
+`grades.sync.request_sync`, whose `sync_grades_task` fetches new ones in a task
+worker (or once, inline, with the immediate task backend); stale snapshots
+are served in the meantime.
+"""
+
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.utils import timezone
+from usos_api.models import ExamReport
+
+from grades.class_types import get_class_types
+from grades.grade_reports import GRADE_REPORT_FIELDS, SerializedCourse, serialize_courses, term_summary
+from grades.models import GradeSnapshot
+
+
+def is_stale(snapshots: list[GradeSnapshot], now: datetime | None = None) -> bool:
+    now = now or timezone.now()
+    ttl = timedelta(seconds=settings.GRADES_SNAPSHOT_TTL_SECONDS)
+    return any(now - snapshot.fetched_at >= ttl for snapshot in snapshots)
+
+
+async def load_snapshots(user, term_id: str | None = None) -> list[GradeSnapshot]:
+    """The snapshot for `term_id`, or every term from the user's last all-terms fetch."""
+    snapshots = GradeSnapshot.objects.filter(user=user)
+    snapshots = snapshots.filter(term_id=term_id) if term_id else snapshots.filter(in_term_list=True)
+    return [snapshot async for snapshot in snapshots]
+
+
+def _raw_reports(courses: dict[str, list[ExamReport]]) -> dict[str, list[dict]]:
+    return {
+        course_id: [report.model_dump(mode="json", exclude_defaults=True) for report in reports]
+        for course_id, reports in courses.items()
+    }
+
+
+async def fetch_snapshots(client, user, term_id: str | None = None) -> list[GradeSnapshot]:
+    """Fetch grades from USOS through `client` and store one snapshot per term.
+
+    Without `term_id` this is an all-terms fetch: it also decides which terms
+    the all-terms view shows.
+    """
+    requested_term_ids = [term_id] if term_id else None
+    ects_by_term, reports_by_term = await client.helper.get_user_exam_reports_with_ects(
+        term_ids=requested_term_ids,
+        fields=GRADE_REPORT_FIELDS,
+    )
+    term_ids = requested_term_ids or list(ects_by_term.keys())
+    serialized = serialize_courses(
+        reports_by_term=reports_by_term,
+        ects_by_term=ects_by_term,
+        term_ids=term_ids,
+        class_types_by_id=await get_class_types(),
+    )
+    courses_by_term: dict[str, list[SerializedCourse]] = defaultdict(list)
+    for course in serialized["courses"]:
+        courses_by_term[course["term_id"]].append(course)
+
+    fetched_at = timezone.now()
+    snapshots = []
+    for snapshot_term_id in dict.fromkeys([*term_ids, *reports_by_term]):
+        courses = courses_by_term[snapshot_term_id]
+        grades = serialized["grades_by_term"].get(snapshot_term_id, [])
+        defaults = {
+            "raw_reports": _raw_reports(reports_by_term.get(snapshot_term_id, {})),
+            "ects": ects_by_term.get(snapshot_term_id, {}),
+            "courses": courses,
+            "grades": grades,
+            **term_summary(grades, courses),
+            "fetched_at": fetched_at,
+        }
+        if term_id is None:
+            defaults["in_term_list"] = True
+        snapshot, _ = await GradeSnapshot.objects.aupdate_or_create(
+            user=user, term_id=snapshot_term_id, defaults=defaults
+        )
+        snapshots.append(snapshot)
+
+    if term_id is None:
+        await (
+            GradeSnapshot.objects.filter(user=user, in_term_list=True)
+            .exclude(term_id__in=[snapshot.term_id for snapshot in snapshots])
+            .aupdate(in_term_list=False)
+        )
+    # Same order as `load_snapshots`, so a response doesn't reshuffle once it's served from the store.
+    return sorted(snapshots, key=lambda snapshot: snapshot.term_id)
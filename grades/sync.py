@@ -0,0 +1,167 @@
+"""Background grade syncs: the only path that talks to USOS for `/grades`.
+
+`request_sync` records a `GradeSync` for a user and scope and enqueues
+`sync_grades_task`, unless one is already in flight for that user and scope,
+or the last one failed: it is requested again
+`settings.GRADES_SYNC_FAILED_RETRY_SECONDS` later, or after USOS errors
+retrying won't fix (e.g. a rejected token) only once the user signs in again
+(`allow_retry`).
+Workers run syncs through `run_syncs`, which caps concurrent USOS fetches at
+`settings.GRADES_SYNC_CONCURRENCY` per worker and retries transient failures
+with full-jitter exponential backoff. With the immediate task backend there is
+no worker: the request asking for the sync runs it with a single attempt, so
+it never waits on backoff, and a transient failure is requested again after
+the retry delay like any other.
+"""
+
+import asyncio
+import logging
+import random
+from datetime import timedelta
+
+import aiohttp
+from django.conf import settings
+from django.utils import timezone
+from usos_api import USOSAPIException
+
+from grades.models import GradeSync
+from grades.snapshots import fetch_snapshots
+from task_queue.backends import runs_inline
+from testownik_core.usos import usos_client
+
+logger = logging.getLogger(__name__)
+
+ALL_TERMS = ""
+
+IN_FLIGHT = (GradeSync.Status.PENDING, GradeSync.Status.RUNNING)
+
+# Client errors that another attempt won't fix (bad request, expired token, forbidden).
+_PERMANENT_HTTP_ERRORS = ("HTTP 400", "HTTP 401", "HTTP 403", "HTTP 404")
+
+
+def is_permanent(exc: BaseException) -> bool:
+    return isinstance(exc, USOSAPIException) and str(exc).startswith(_PERMANENT_HTTP_ERRORS)
+
+
+def is_retryable(exc: BaseException) -> bool:
+    if isinstance(exc, USOSAPIException):
+        return not is_permanent(exc)
+    return isinstance(exc, aiohttp.ClientError | TimeoutError)
+
+
+def backoff_delay(attempt: int) -> float:
+    """Full jitter: uniform in [0, base * 2**(attempt - 1)], so retries from a spike spread out."""
+    return random.uniform(0, settings.GRADES_SYNC_RETRY_BASE_SECONDS * 2 ** (attempt - 1))
+
+
+def _is_lost(sync: GradeSync) -> bool:
+    """Whether a sync has been running for longer than a sync can (its worker died).
+
+    Pending syncs wait for a worker however long the queue is; `run_grade_syncs` catches up on stuck ones.
+    """
+    if sync.status != GradeSync.Status.RUNNING or sync.started_at is None:
+        return False
+    return timezone.now() - sync.started_at >= timedelta(seconds=settings.GRADES_SYNC_TIMEOUT_SECONDS)
+
+
+def _may_retry(sync: GradeSync) -> bool:
+    return sync.retry_after is not None and sync.retry_after <= timezone.now()
+
+
+async def get_sync(user, term_id: str | None = None) -> GradeSync | None:
+    return await GradeSync.objects.filter(user=user, term_id=term_id or ALL_TERMS).afirst()
+
+
+async def request_sync(user, term_id: str | None = None) -> GradeSync:
+    """Ask for a fresh fetch of `user`'s grades; a no-op while one is already in flight."""
+    from grades.tasks import sync_grades_task
+
+    now = timezone.now()
+    sync, created = await GradeSync.objects.aget_or_create(
+        user=user, term_id=term_id or ALL_TERMS, defaults={"requested_at": now}
+    )
+    if not created:
+        if sync.status in IN_FLIGHT and not _is_lost(sync):
+            return sync
+        if sync.status == GradeSync.Status.FAILED and not _may_retry(sync):
+            return sync
+        # Only the request that flips the row back to pending enqueues a task.
+        claimed = await GradeSync.objects.filter(
+            id=sync.id, status=sync.status, requested_at=sync.requested_at
+        ).aupdate(status=GradeSync.Status.PENDING, requested_at=now, attempts=0, last_error="", retry_after=None)
+        if not claimed:
+            return await GradeSync.objects.aget(id=sync.id)
+
+    if runs_inline(sync_grades_task):
+        await run_sync(str(sync.id), max_attempts=1)
+    else:
+        await sync_grades_task.aenqueue([str(sync.id)])
+    return await GradeSync.objects.aget(id=sync.id)
+
+
+async def allow_retry(user) -> None:
+    """Let `user`'s failed syncs be requested again right away, e.g. after a sign-in renewed their tokens."""
+    await GradeSync.objects.filter(user=user, status=GradeSync.Status.FAILED).aupdate(retry_after=timezone.now())
+
+
+async def run_sync(sync_id: str, max_attempts: int | None = None) -> bool:
+    """Fetch and store one sync's grades, retrying transient USOS failures up to `max_attempts` times in all."""
+    started = timezone.now()
+    claimed = await GradeSync.objects.filter(id=sync_id, status=GradeSync.Status.PENDING).aupdate(
+        status=GradeSync.Status.RUNNING, started_at=started
+    )
+    if not claimed:
+        # Already picked up by another worker (or no longer wanted).
+        return False
+    sync = await GradeSync.objects.select_related("user").aget(id=sync_id)
+
+    max_attempts = max_attempts or settings.GRADES_SYNC_MAX_ATTEMPTS
+    for attempt in range(1, max_attempts + 1):
+        try:
+            async with usos_client(sync.user.access_token, sync.user.access_token_secret) as client:
+                await fetch_snapshots(client, sync.user, sync.term_id or None)
+        except Exception as exc:
+            if attempt < max_attempts and is_retryable(exc):
+                delay = backoff_delay(attempt)
+                logger.warning(
+                    "Grade sync %s failed (attempt %d/%d), retrying in %.1fs: %s",
+                    sync_id,
+                    attempt,
+                    max_attempts,
+                    delay,
+                    exc,
+                )
+                await asyncio.sleep(delay)
+                continue
+            logger.error("Grade sync %s failed for user %s", sync_id, sync.user_id, exc_info=True)
+            finished = timezone.now()
+            await GradeSync.objects.filter(id=sync_id).aupdate(
+                status=GradeSync.Status.FAILED,
+                attempts=attempt,
+                last_error=f"{type(exc).__name__}: {exc}"[:1000],
+                finished_at=finished,
+                retry_after=(
+                    None
+                    if is_permanent(exc)
+                    else finished + timedelta(seconds=settings.GRADES_SYNC_FAILED_RETRY_SECONDS)
+                ),
+            )
+            return False
+
+        await GradeSync.objects.filter(id=sync_id).aupdate(
+            status=GradeSync.Status.SUCCEEDED, attempts=attempt, last_error="", finished_at=timezone.now()
+        )
+        return True
+    return False
+
+
+async def run_syncs(sync_ids: list[str], concurrency: int | None = None) -> int:
+    """Run syncs with at most `concurrency` USOS fetches at once; returns how many succeeded."""
+    semaphore = asyncio.Semaphore(concurrency or settings.GRADES_SYNC_CONCURRENCY)
+
+    async def run_one(sync_id: str) -> bool:
+        async with semaphore:
+            return await run_sync(sync_id)
+
+    results = await asyncio.gather(*(run_one(sync_id) for sync_id in sync_ids))
+    return sum(results)
@@ -0,0 +1,8 @@
+from django.tasks import task
+
+from grades.sync import run_syncs
+
+
+@task()
+async def sync_grades_task(sync_ids: list[str]):
+    return await run_syncs(sync_ids)
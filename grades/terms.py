@@ -1,6 +1,8 @@
 from datetime import date
 from typing import TypedDict
 
+from grades.dictionaries import SyncResult, upsert_rows
+from users import dictionaries
 from users.models import Term
 
 
@@ -31,19 +33,25 @@ def _date(value: str | None) -> date | None:
     return date.fromisoformat(value)
 
 
-async def sync_terms(terms: list[TermDescription]) -> int:
-    for term in terms:
-        await Term.objects.aupdate_or_create(
-            id=term["id"],
-            defaults={
-                "name": _lang_text(term.get("name")),
-                "start_date": _date(term.get("start_date")),
-                "end_date": _date(term.get("end_date")),
-                "finish_date": _date(term.get("finish_date")),
-            },
-        )
-    return len(terms)
+TERM_FIELDS = ["name", "start_date", "end_date", "finish_date"]
+
+
+async def sync_terms(terms: list[TermDescription]) -> SyncResult:
+    rows = {
+        term["id"]: {
+            "name": _lang_text(term.get("name")),
+            "start_date": _date(term.get("start_date")),
+            "end_date": _date(term.get("end_date")),
+            "finish_date": _date(term.get("finish_date")),
+        }
+        for term in terms
+    }
+    result = await upsert_rows(Term, rows, TERM_FIELDS)
+    if result.inserted or result.updated:
+        await dictionaries.terms.ainvalidate()
+    return result
 
 
 async def get_terms(term_ids: list[str]) -> list[Term]:
-    return [term async for term in Term.objects.filter(id__in=term_ids).aiterator()]
+    terms = await dictionaries.terms.aget()
+    return [terms[term_id] for term_id in dict.fromkeys(term_ids) if term_id in terms]
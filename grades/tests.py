@@ -1 +1,545 @@
-# Create your tests here.
+import asyncio
+from contextlib import asynccontextmanager
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from usos_api import USOSAPIException
+from usos_api.models import parse_user_exam_reports
+
+from grades.class_types import get_class_types, sync_class_types
+from grades.grade_reports import serialize_courses
+from grades.models import GradeSnapshot, GradeSync
+from grades.sync import allow_retry, backoff_delay, request_sync, run_syncs
+from grades.terms import sync_terms
+from users.models import CourseClassType, Term, User
+
+WINTER = "2024/25-Z"
+SUMMER = "2024/25-L"
+
+
+def exam_report(course_id, name, value_symbol, *, term_id=WINTER, report_id=1):
+    return {
+        "id": report_id,
+        "type_id": "E",
+        "type_description": {"pl": "Egzamin", "en": "Exam"},
+        "counts_into_average": "T",
+        "term_id": term_id,
+        "course": {"id": course_id, "name": {"pl": name, "en": name}},
+        "sessions": [
+            {
+                "number": 1,
+                "issuer_grades": {
+                    "value_symbol": value_symbol,
+                    "passes": "T",
+                    "counts_into_average": "T",
+                    "date_modified": "2025-02-01 10:00:00",
+                    "modification_author": {"id": "7", "first_name": "Jan", "last_name": "Kowalski"},
+                },
+            }
+        ],
+        "grades_distribution": [{"grade_symbol": "5", "percentage": 12.5}],
+    }
+
+
+class StubHelper:
+    """Stands in for `USOSClient.helper`, recording every grade fetch."""
+
+    def __init__(self, reports_by_term, ects_by_term):
+        self.reports_by_term = reports_by_term
+        self.ects_by_term = ects_by_term
+        self.calls = []
+        self.errors = []
+        self.running = 0
+        self.max_running = 0
+
+    async def get_user_exam_reports_with_ects(self, term_ids=None, fields=None):
+        self.calls.append(term_ids)
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.running -= 1
+        if self.errors:
+            raise self.errors.pop(0)
+        selected = term_ids or list(self.ects_by_term)
+        return (
+            {term_id: self.ects_by_term.get(term_id, {}) for term_id in selected},
+            parse_user_exam_reports({t: r for t, r in self.reports_by_term.items() if t in selected}),
+        )
+
+
+@override_settings(GRADES_SYNC_RETRY_BASE_SECONDS=0)
+class GradeSnapshotTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create(
+            email="student@example.com",
+            first_name="Student",
+            last_name="Test",
+            usos_id=1234,
+            access_token="token",
+            access_token_secret="secret",
+        )
+        self.client.force_authenticate(user=self.user)
+        Term.objects.create(id=WINTER, name="Zima", start_date=date(2024, 10, 1), finish_date=date(2025, 2, 20))
+        Term.objects.create(id=SUMMER, name="Lato", start_date=date(2025, 2, 21), finish_date=date(2025, 9, 30))
+        CourseClassType.objects.create(id="W", name_pl="Wykład", name_en="Lecture")
+
+        self.helper = StubHelper(
+            reports_by_term={
+                WINTER: {"INZ001W": [exam_report("INZ001W", "Analiza", "4,5")]},
+                SUMMER: {"INZ002W": [exam_report("INZ002W", "Algebra", "3", term_id=SUMMER, report_id=2)]},
+            },
+            ects_by_term={WINTER: {"INZ001W": 5.0}, SUMMER: {"INZ002W": 4.0}},
+        )
+
+        @asynccontextmanager
+        async def stub_client(access_token=None, access_token_secret=None):
+            yield mock.Mock(helper=self.helper)
+
+        patcher = mock.patch("grades.sync.usos_client", stub_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _get(self, **params):
+        return self.client.get(reverse("get_grades"), params)
+
+    def _make_user(self, index):
+        return User.objects.create(
+            email=f"student{index}@example.com",
+            first_name="Student",
+            last_name=str(index),
+            usos_id=2000 + index,
+            access_token="token",
+            access_token_secret="secret",
+        )
+
+    def _age_snapshots(self, seconds):
+        GradeSnapshot.objects.update(fetched_at=timezone.now() - timedelta(seconds=seconds))
+
+    def test_first_request_fetches_and_stores_snapshots(self):
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.helper.calls, [None])
+        data = response.json()
+        self.assertEqual([term["id"] for term in data["terms"]], [SUMMER, WINTER])
+        self.assertEqual(data["terms"][1]["weighted_average"], 4.5)
+        self.assertEqual({course["course_id"] for course in data["courses"]}, {"INZ001W", "INZ002W"})
+        self.assertEqual(
+            set(GradeSnapshot.objects.filter(user=self.user, in_term_list=True).values_list("term_id", flat=True)),
+            {WINTER, SUMMER},
+        )
+
+    def test_fresh_snapshot_is_served_without_usos(self):
+        first = self._get().json()
+        second = self._get().json()
+
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.helper.calls), 1)
+        self.assertEqual(second["sync"]["status"], GradeSync.Status.SUCCEEDED)
+        self.assertFalse(second["sync"]["is_stale"])
+
+    def test_stale_snapshot_is_revalidated(self):
+        self._get()
+        self._age_snapshots(3600)
+        self.helper.reports_by_term[WINTER]["INZ001W"] = [exam_report("INZ001W", "Analiza", "5")]
+
+        # The immediate task backend refreshes before the response is built.
+        data = self._get().json()
+
+        self.assertEqual(len(self.helper.calls), 2)
+        winter = next(term for term in data["terms"] if term["id"] == WINTER)
+        self.assertEqual(winter["weighted_average"], 5.0)
+
+    def test_stale_snapshot_is_served_when_usos_fails(self):
+        first = self._get().json()
+        self._age_snapshots(3600)
+        self.helper.errors = [USOSAPIException("HTTP 401: Unauthorized.")]
+
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data["sync"]["status"], GradeSync.Status.FAILED)
+        self.assertTrue(data["sync"]["is_stale"])
+        self.assertEqual(data["courses"], first["courses"])
+        self.assertEqual(data["terms"], first["terms"])
+
+        # USOS rejected the token: no further fetches until the user signs in again.
+        self.assertEqual(self._get().json()["sync"]["status"], GradeSync.Status.FAILED)
+        self.assertEqual(len(self.helper.calls), 2)
+        async_to_sync(allow_retry)(self.user)
+        self.assertEqual(self._get().json()["sync"]["status"], GradeSync.Status.SUCCEEDED)
+        self.assertEqual(len(self.helper.calls), 3)
+
+    def test_single_term_snapshot_does_not_replace_the_term_list(self):
+        response = self._get(term_id=WINTER)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.helper.calls, [[WINTER]])
+        self.assertEqual([term["id"] for term in response.json()["terms"]], [WINTER])
+        self.assertFalse(GradeSnapshot.objects.filter(in_term_list=True).exists())
+
+        # The all-terms view still needs its own fetch.
+        self._get()
+        self.assertEqual(self.helper.calls, [[WINTER], None])
+
+    def test_no_reports_is_not_found(self):
+        self.helper.reports_by_term = {}
+        response = self._get()
+
+        self.assertEqual(response.status_code, 404)
+
+    def test_raw_reports_reproduce_the_serialized_courses(self):
+        self._get()
+        snapshot = GradeSnapshot.objects.get(user=self.user, term_id=WINTER)
+
+        serialized = serialize_courses(
+            reports_by_term=parse_user_exam_reports({WINTER: snapshot.raw_reports}),
+            ects_by_term={WINTER: snapshot.ects},
+            term_ids=[WINTER],
+            class_types_by_id=async_to_sync(get_class_types)(),
+        )
+        self.assertEqual(serialized["courses"], snapshot.courses)
+        self.assertEqual(serialized["grades_by_term"][WINTER], snapshot.grades)
+
+    def test_snapshots_store_term_aggregates(self):
+        self._get()
+        winter = GradeSnapshot.objects.get(user=self.user, term_id=WINTER)
+
+        self.assertEqual((winter.weighted_average, winter.graded_ects, winter.ects_total), (4.5, 5.0, 5.0))
+        self.assertEqual(
+            winter.course_statuses,
+            [
+                {
+                    "course_id": "INZ001W",
+                    "course_name": "Analiza",
+                    "ects": 5.0,
+                    "weighted_average": 4.5,
+                    "passing_status": "passed",
+                }
+            ],
+        )
+
+    def test_history_is_served_from_stored_aggregates(self):
+        self._get()
+
+        with mock.patch("grades.snapshots.serialize_courses", side_effect=AssertionError):
+            response = self.client.get(reverse("get_grade_history"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.helper.calls), 1)
+        data = response.json()
+        self.assertEqual([term["id"] for term in data["terms"]], [WINTER, SUMMER])
+        self.assertEqual([term["weighted_average"] for term in data["terms"]], [4.5, 3.0])
+        self.assertEqual(data["terms"][0]["cumulative_average"], 4.5)
+        self.assertAlmostEqual(data["terms"][1]["cumulative_average"], (4.5 * 5 + 3 * 4) / 9)
+        self.assertEqual(data["weighted_average"], data["terms"][1]["cumulative_average"])
+
+    def test_history_without_snapshots_is_empty(self):
+        response = self.client.get(reverse("get_grade_history"))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {"terms": [], "weighted_average": None})
+        self.assertEqual(self.helper.calls, [])
+
+    def test_transient_failures_are_retried_by_workers(self):
+        self.helper.errors = [USOSAPIException("HTTP 503: Service Unavailable"), TimeoutError()]
+        with mock.patch("grades.tasks.sync_grades_task", mock.Mock(aenqueue=mock.AsyncMock())):
+            sync = async_to_sync(request_sync)(self.user)
+
+        self.assertEqual(async_to_sync(run_syncs)([str(sync.id)]), 1)
+        self.assertEqual(len(self.helper.calls), 3)
+        self.assertEqual(GradeSync.objects.get(user=self.user).attempts, 3)
+
+    @override_settings(GRADES_SYNC_RETRY_BASE_SECONDS=60)
+    def test_inline_sync_does_not_wait_on_backoff(self):
+        self.helper.errors = [USOSAPIException("HTTP 503: Service Unavailable")]
+
+        with mock.patch("grades.sync.backoff_delay", wraps=backoff_delay) as delay:
+            response = self._get()
+
+        self.assertEqual(response.status_code, 500)
+        delay.assert_not_called()
+        self.assertEqual(len(self.helper.calls), 1)
+        sync = GradeSync.objects.get(user=self.user)
+        self.assertEqual(sync.status, GradeSync.Status.FAILED)
+        self.assertGreater(sync.retry_after, timezone.now())
+
+    def test_permanent_failures_are_not_retried(self):
+        self.helper.errors = [USOSAPIException("HTTP 401: Unauthorized.")]
+
+        response = self._get()
+
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.json()["sync"]["status"], GradeSync.Status.FAILED)
+        self.assertEqual(len(self.helper.calls), 1)
+
+    def test_in_flight_sync_is_not_requested_again(self):
+        GradeSync.objects.create(user=self.user, status=GradeSync.Status.RUNNING, requested_at=timezone.now())
+
+        with mock.patch("grades.tasks.sync_grades_task") as task:
+            task.aenqueue = mock.AsyncMock()
+            response = self._get()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()["sync"]["status"], GradeSync.Status.RUNNING)
+        task.aenqueue.assert_not_called()
+        self.assertEqual(self.helper.calls, [])
+
+    @override_settings(GRADES_SYNC_MAX_ATTEMPTS=1)
+    def test_failed_sync_is_requested_again_after_its_retry_delay(self):
+        self.helper.errors = [USOSAPIException("HTTP 503: Service Unavailable")]
+        self._get()
+        sync = GradeSync.objects.get(user=self.user)
+        self.assertEqual(sync.status, GradeSync.Status.FAILED)
+        self.assertGreater(sync.retry_after, timezone.now())
+
+        self.assertEqual(self._get().status_code, 500)
+        self.assertEqual(len(self.helper.calls), 1)
+
+        GradeSync.objects.update(retry_after=timezone.now())
+        self.assertEqual(self._get().status_code, 200)
+        self.assertEqual(len(self.helper.calls), 2)
+
+    def test_queued_sync_is_not_lost_while_waiting_for_a_worker(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        GradeSync.objects.create(user=self.user, status=GradeSync.Status.PENDING, requested_at=long_ago)
+
+        response = self._get()
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(self.helper.calls, [])
+
+    def test_lost_sync_is_requested_again(self):
+        long_ago = timezone.now() - timedelta(hours=1)
+        GradeSync.objects.create(
+            user=self.user, status=GradeSync.Status.RUNNING, requested_at=long_ago, started_at=long_ago
+        )
+
+        response = self._get()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(GradeSync.objects.get(user=self.user).status, GradeSync.Status.SUCCEEDED)
+
+    def test_concurrent_fetches_are_bounded(self):
+        users = [self._make_user(index) for index in range(6)]
+        with mock.patch("grades.tasks.sync_grades_task", mock.Mock(aenqueue=mock.AsyncMock())):
+            syncs = [async_to_sync(request_sync)(user) for user in users]
+
+        succeeded = async_to_sync(run_syncs)([str(sync.id) for sync in syncs], 2)
+
+        self.assertEqual(succeeded, 6)
+        self.assertEqual(self.helper.max_running, 2)
+
+    def test_command_runs_pending_syncs(self):
+        with mock.patch("grades.tasks.sync_grades_task", mock.Mock(aenqueue=mock.AsyncMock())):
+            async_to_sync(request_sync)(self.user)
+        out = StringIO()
+        call_command("run_grade_syncs", stdout=out)
+
+        self.assertIn("Ran 1 grade sync(s), 1 succeeded.", out.getvalue())
+        self.assertEqual(GradeSync.objects.get(user=self.user).status, GradeSync.Status.SUCCEEDED)
+
+
+def term_description(term_id, name, start="2024-10-01"):
+    return {
+        "id": term_id,
+        "order_key": 1,
+        "name": {"pl": name, "en": name},
+        "start_date": start,
+        "end_date": "2025-01-31",
+        "finish_date": "2025-02-20",
+        "is_active": True,
+    }
+
+
+class DictionarySyncTests(TestCase):
+    def test_terms_are_inserted_updated_and_skipped(self):
+        Term.objects.create(id=WINTER, name="Zima", start_date=date(2024, 10, 1))
+        Term.objects.create(
+            id=SUMMER,
+            name="Lato",
+            start_date=date(2025, 2, 21),
+            end_date=date(2025, 1, 31),
+            finish_date=date(2025, 2, 20),
+        )
+        descriptions = [
+            term_description(WINTER, "Zima 2024/25"),
+            term_description(SUMMER, "Lato", start="2025-02-21"),
+            term_description("2025/26-Z", "Zima 2025/26", start="2025-10-01"),
+        ]
+
+        result = async_to_sync(sync_terms)(descriptions)
+
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (1, 1, 1))
+        self.assertEqual(Term.objects.get(id=WINTER).name, "Zima 2024/25")
+        self.assertEqual(Term.objects.get(id="2025/26-Z").finish_date, date(2025, 2, 20))
+
+        again = async_to_sync(sync_terms)(descriptions)
+        self.assertEqual((again.inserted, again.updated, again.unchanged), (0, 0, 3))
+
+    def test_unchanged_class_types_are_not_rewritten(self):
+        index = {"W": {"id": "W", "name": {"pl": "Wykład", "en": "Lecture"}}}
+        async_to_sync(sync_class_types)(index)
+        synced_at = CourseClassType.objects.get(id="W").synced_at
+
+        result = async_to_sync(sync_class_types)(index)
+        self.assertEqual((result.inserted, result.updated, result.unchanged), (0, 0, 1))
+        self.assertEqual(CourseClassType.objects.get(id="W").synced_at, synced_at)
+
+        index["W"]["name"]["en"] = "Lecture (updated)"
+        result = async_to_sync(sync_class_types)(index)
+        self.assertEqual(result.updated, 1)
+        renamed = CourseClassType.objects.get(id="W")
+        self.assertEqual(renamed.name_en, "Lecture (updated)")
+        self.assertGreater(renamed.synced_at, synced_at)
+
+    def test_command_reports_counts(self):
+        async def fake_get_json(command, session, url, *, params=None):
+            if url.endswith("classtypes_index"):
+                return {"W": {"id": "W", "name": {"pl": "Wykład", "en": "Lecture"}}}
+            return [term_description(WINTER, "Zima")]
+
+        out = StringIO()
+        with mock.patch("grades.management.commands.sync_usos_dictionaries.Command._get_json", fake_get_json):
+            call_command("sync_usos_dictionaries", stdout=out)
+
+        self.assertIn("Synced 1 class types: 1 inserted, 0 updated, 0 unchanged.", out.getvalue())
+        self.assertIn("Synced 1 terms: 1 inserted, 0 updated, 0 unchanged.", out.getvalue())
+        self.assertTrue(Term.objects.filter(id=WINTER).exists())
+
+    def test_benchmark_matches_baseline_and_rolls_back(self):
+        out = StringIO()
+        call_command("benchmark_dictionary_sync", "--terms", "50", "--baseline", "HEAD", stdout=out)
+
+        self.assertIn("Stored terms are identical.", out.getvalue())
+        self.assertFalse(Term.objects.exists())
+
+
+class SerializeCoursesTests(SimpleTestCase):
+    class_types_by_id = {
+        "W": CourseClassType(id="W", name_pl="Wykład", name_en="Lecture"),
+        "L": CourseClassType(id="L", name_pl="Laboratorium", name_en="Lab"),
+    }
+
+    @staticmethod
+    def _grade(exam_id, value_symbol, value, **overrides):
+        return {
+            "term_id": WINTER,
+            "course_id": "INZ001W",
+            "course_name": "Analiza",
+            "ects": 5.0,
+            "value": value,
+            "value_symbol": value_symbol,
+            "value_description": value_symbol,
+            "counts_into_average": True,
+            "passes": True,
+            "exam_id": exam_id,
+            "exam_session_number": 1,
+            "report_type_id": "E",
+            "report_type_description": "Egzamin",
+            "scope": "course",
+            "course_unit_id": None,
+            "class_type_id": None,
+            "class_type": None,
+            "comment": None,
+            "date_modified": "2025-02-01 10:00:00",
+            "modification_author": {"id": 7, "first_name": "Jan", "last_name": "Kowalski"},
+            **overrides,
+        }
+
+    def test_course_and_course_unit_reports(self):
+        lab = exam_report("INZ001W", "Analiza", "5", report_id=2)
+        lab["course_unit"] = {
+            "id": "77",
+            "course_id": "INZ001W",
+            "course_name": {"pl": "Analiza", "en": "Analysis"},
+            "classtype_id": "L",
+            "term_id": WINTER,
+        }
+        lab["sessions"][0]["issuer_grades"]["counts_into_average"] = "N"
+        reports = parse_user_exam_reports({WINTER: {"INZ001W": [exam_report("INZ001W", "Analiza", "4,5"), lab]}})
+
+        result = serialize_courses(
+            reports_by_term=reports,
+            ects_by_term={WINTER: {"INZ001W": 5.0}},
+            # A requested term without reports still gets an (empty) grade list.
+            term_ids=[WINTER, SUMMER],
+            class_types_by_id=self.class_types_by_id,
+        )
+
+        lab_class_type = {"id": "L", "name_pl": "Laboratorium", "name_en": "Lab"}
+        exam_grade = self._grade(1, "4,5", 4.5)
+        lab_grade = self._grade(
+            2,
+            "5",
+            5.0,
+            counts_into_average=False,
+            scope="course_unit",
+            course_unit_id="77",
+            class_type_id="L",
+            class_type=lab_class_type,
+        )
+        distribution = [{"grade_symbol": "5", "percentage": 12.5}]
+        self.assertEqual(
+            result,
+            {
+                "courses": [
+                    {
+                        "course_id": "INZ001W",
+                        "course_name": "Analiza",
+                        "term_id": WINTER,
+                        "ects": 5.0,
+                        # Only course-scope grades are final.
+                        "weighted_average": 4.5,
+                        "passing_status": "passed",
+                        "class_types": [{"id": "W", "name_pl": "Wykład", "name_en": "Lecture"}],
+                        "reports": [
+                            {
+                                "id": 1,
+                                "type_id": "E",
+                                "type_description": "Egzamin",
+                                "scope": "course",
+                                "class_type_id": None,
+                                "class_type": None,
+                                "course_unit": None,
+                                "grades_distribution": distribution,
+                                "grades": [exam_grade],
+                            },
+                            {
+                                "id": 2,
+                                "type_id": "E",
+                                "type_description": "Egzamin",
+                                "scope": "course_unit",
+                                "class_type_id": "L",
+                                "class_type": lab_class_type,
+                                "course_unit": lab["course_unit"],
+                                "grades_distribution": distribution,
+                                "grades": [lab_grade],
+                            },
+                        ],
+                    }
+                ],
+                "grades_by_term": {WINTER: [exam_grade], SUMMER: []},
+            },
+        )
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command(
+            "benchmark_grade_serialization",
+            *("--terms", "2", "--courses", "3", "--repeat", "1", "--baseline", "HEAD"),
+            stdout=out,
+        )
+
+        self.assertIn("  HEAD ", out.getvalue())
+        self.assertIn("Payloads are identical.", out.getvalue())
@@ -1,7 +1,8 @@
 from django.urls import path
 
-from grades.views import get_grades
+from grades.views import get_grade_history, get_grades
 
 urlpatterns = [
     path("grades/", get_grades, name="get_grades"),
+    path("grades/history/", get_grade_history, name="get_grade_history"),
 ]
@@ -1,23 +1,24 @@
 import logging
-import os
 
-import dotenv
 from adrf.decorators import api_view as async_api_view
 from rest_framework.exceptions import APIException
 from rest_framework.response import Response
-from usos_api import USOSClient
 
-from grades.class_types import get_class_types
-from grades.grade_reports import GRADE_REPORT_FIELDS, serialize_courses, term_stats
+from grades.models import GradeSnapshot, GradeSync
+from grades.snapshots import is_stale, load_snapshots
+from grades.sync import get_sync, request_sync
 from grades.terms import get_terms
-
-dotenv.load_dotenv()
+from users import dictionaries
 
 logger = logging.getLogger(__name__)
 
-USOS_BASE_URL = "https://apps.usos.pwr.edu.pl/"
-CONSUMER_KEY = os.getenv("USOS_CONSUMER_KEY")
-CONSUMER_SECRET = os.getenv("USOS_CONSUMER_SECRET")
+
+def _sync_status(sync: GradeSync | None, snapshots: list[GradeSnapshot]) -> dict:
+    return {
+        "status": sync.status if sync is not None else GradeSync.Status.SUCCEEDED,
+        "synced_at": min((snapshot.fetched_at for snapshot in snapshots), default=None),
+        "is_stale": is_stale(snapshots),
+    }
 
 
 @async_api_view(["GET"])
@@ -28,31 +29,26 @@ async def get_grades(request):
     if not request_user.usos_id:
         return Response({"detail": "User does not have a linked USOS account."}, status=400)
     try:
-        async with USOSClient(USOS_BASE_URL, CONSUMER_KEY, CONSUMER_SECRET, trust_env=True) as client:
-            client.load_access_token(request_user.access_token, request_user.access_token_secret)
-            class_types_by_id = await get_class_types()
-
-            requested_term_ids = [selected_term_id] if selected_term_id else None
-            ects_by_term, reports_by_term = await client.helper.get_user_exam_reports_with_ects(
-                term_ids=requested_term_ids,
-                fields=GRADE_REPORT_FIELDS,
-            )
-            term_ids = requested_term_ids or list(ects_by_term.keys())
-            if not term_ids:
-                return Response({"detail": "No grade data found for this user."}, status=404)
-
-            if not reports_by_term:
-                return Response({"detail": "No grade data found for this user."}, status=404)
-
-            terms = await get_terms(term_ids)
-
-        serialized_grades = serialize_courses(
-            reports_by_term=reports_by_term,
-            ects_by_term=ects_by_term,
-            term_ids=term_ids,
-            class_types_by_id=class_types_by_id,
-        )
-        grades_by_term = serialized_grades["grades_by_term"]
+        snapshots = await load_snapshots(request_user, selected_term_id)
+        if not snapshots or is_stale(snapshots):
+            # With a task worker this only queues the sync; with the immediate task backend it runs here,
+            # one attempt without backoff, so fresh snapshots are served right away.
+            sync = await request_sync(request_user, selected_term_id)
+            if sync.status == GradeSync.Status.SUCCEEDED:
+                snapshots = await load_snapshots(request_user, selected_term_id)
+        else:
+            sync = await get_sync(request_user, selected_term_id)
+
+        if not snapshots:
+            if sync.status == GradeSync.Status.FAILED:
+                return Response({"detail": "API error", "sync": _sync_status(sync, snapshots)}, status=500)
+            if sync.status != GradeSync.Status.SUCCEEDED:
+                return Response({"terms": [], "courses": [], "sync": _sync_status(sync, snapshots)}, status=202)
+        if not any(snapshot.raw_reports for snapshot in snapshots):
+            return Response({"detail": "No grade data found for this user."}, status=404)
+
+        terms = await get_terms([snapshot.term_id for snapshot in snapshots])
+        snapshots_by_term = {snapshot.term_id: snapshot for snapshot in snapshots}
 
         return Response(
             {
@@ -65,14 +61,15 @@ async def get_grades(request):
                             "end_date": term.end_date,
                             "finish_date": term.finish_date,
                             "is_current": term.is_current,
-                            **term_stats(grades_by_term.get(term.id, [])),
+                            **snapshots_by_term[term.id].stats(),
                         }
                         for term in terms
                     ],
                     key=lambda term: term["start_date"],
                     reverse=True,
                 ),
-                "courses": serialized_grades["courses"],
+                "courses": [course for snapshot in snapshots for course in snapshot.courses],
+                "sync": _sync_status(sync, snapshots),
             }
         )
     except APIException as e:
@@ -89,3 +86,57 @@ async def get_grades(request):
             extra={"user_id": request_user.id, "term_id": selected_term_id},
         )
         return Response({"detail": "An unexpected error occurred"}, status=500)
+
+
+HISTORY_FIELDS = (
+    "term_id",
+    "weighted_average",
+    "weighted_ects",
+    "weighted_points",
+    "graded_ects",
+    "ects_total",
+    "course_statuses",
+    "fetched_at",
+)
+
+
+@async_api_view(["GET"])
+async def get_grade_history(request):
+    """Per-term averages in term order, read from the stored snapshot aggregates (never USOS)."""
+    request_user = request.user
+    if not request_user.usos_id:
+        return Response({"detail": "User does not have a linked USOS account."}, status=400)
+
+    rows = [
+        row
+        async for row in GradeSnapshot.objects.filter(user=request_user).values(*HISTORY_FIELDS)
+        if row["course_statuses"]
+    ]
+    terms = await dictionaries.terms.aget()
+
+    def term_order(row):
+        term = terms.get(row["term_id"])
+        start_date = term.start_date if term is not None else None
+        return start_date is None, start_date, row["term_id"]
+
+    history = []
+    points = ects = 0.0
+    for row in sorted(rows, key=term_order):
+        term = terms.get(row["term_id"])
+        points += row["weighted_points"]
+        ects += row["graded_ects"]
+        history.append(
+            {
+                "id": row["term_id"],
+                "name": term.name if term is not None else None,
+                "start_date": term.start_date if term is not None else None,
+                "finish_date": term.finish_date if term is not None else None,
+                "weighted_average": row["weighted_average"],
+                "weighted_ects": row["weighted_ects"],
+                "ects_total": row["ects_total"],
+                "cumulative_average": points / ects if ects else None,
+                "courses": row["course_statuses"],
+                "synced_at": row["fetched_at"],
+            }
+        )
+    return Response({"terms": history, "weighted_average": points / ects if ects else None})
@@ -6,6 +6,7 @@ from django.db import models
 from django.db.models import ProtectedError, Q, UniqueConstraint
 from django.utils import timezone
 
+from uploads.references import DefersReferenceCounts, ImageReferencing
 from users.models import StudyGroup, User
 
 QUIZ_VISIBILITY_CHOICES = [
@@ -121,7 +122,11 @@ class SharedFolder(models.Model):
         return f"Folder {self.folder.name} shared with {self.user or self.study_group}"
 
 
-class Quiz(models.Model):
+class QuizQuerySet(DefersReferenceCounts, models.QuerySet):
+    pass
+
+
+class Quiz(DefersReferenceCounts, models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     title = models.CharField(max_length=255)
     description = models.TextField(null=True, blank=True)
@@ -146,6 +151,8 @@ class Quiz(models.Model):
     deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
     folder = models.ForeignKey(Folder, on_delete=models.PROTECT, related_name="quizzes")
 
+    objects = QuizQuerySet.as_manager()
+
     class Meta:
         ordering = ["-created_at"]
         verbose_name = "quiz"
@@ -184,7 +191,7 @@ class QuestionType(models.IntegerChoices):
     TRUE_FALSE = 2, "Prawda/Fałsz"
 
 
-class Question(models.Model):
+class Question(ImageReferencing):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name="questions")
     order = models.PositiveIntegerField()
@@ -219,12 +226,12 @@ class Question(models.Model):
 
     @property
     def image(self):
-        if self.image_upload:
-            return self.image_upload.image.url
+        if upload := self.shown_upload:
+            return upload.image.url if upload.is_ready else None
         return self.image_url
 
 
-class Answer(models.Model):
+class Answer(ImageReferencing):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="answers")
     order = models.PositiveIntegerField()
@@ -247,8 +254,8 @@ class Answer(models.Model):
 
     @property
     def image(self):
-        if self.image_upload:
-            return self.image_upload.image.url
+        if upload := self.shown_upload:
+            return upload.image.url if upload.is_ready else None
         return self.image_url
 
 
@@ -16,6 +16,7 @@ from quizzes.models import (
     QuizSession,
     SharedQuiz,
 )
+from uploads.media import media_urls
 from uploads.models import UploadedImage
 from users.models import StudyGroup, User, UserSettings
 from users.serializers import (
@@ -33,8 +34,9 @@ class AnswerSerializer(serializers.ModelSerializer):
     image_upload = serializers.PrimaryKeyRelatedField(
         queryset=UploadedImage.objects.all(), required=False, allow_null=True
     )
-    image_width = serializers.IntegerField(source="image_upload.width", read_only=True, allow_null=True)
-    image_height = serializers.IntegerField(source="image_upload.height", read_only=True, allow_null=True)
+    image_width = serializers.IntegerField(source="shown_upload.width", read_only=True, allow_null=True)
+    image_height = serializers.IntegerField(source="shown_upload.height", read_only=True, allow_null=True)
+    image_status = serializers.CharField(source="shown_upload.status", read_only=True, allow_null=True)
 
     class Meta:
         model = Answer
@@ -47,17 +49,18 @@ class AnswerSerializer(serializers.ModelSerializer):
             "image_upload",
             "image_width",
             "image_height",
+            "image_status",
             "is_correct",  # frontend knows if the answer is correct!
         ]
 
     @extend_schema_field(serializers.URLField(allow_null=True))
     def get_image(self, obj):
-        if obj.image_upload and obj.image_upload.image:
-            request = self.context.get("request")
-            url = obj.image_upload.image.url
-            if request is not None:
-                return request.build_absolute_uri(url)
-            return url
+        upload = obj.shown_upload
+        if upload and upload.image:
+            if not upload.is_ready:
+                # Still being processed in the background (see `image_status`).
+                return None
+            return media_urls(self.context).url(upload.image.name)
         return obj.image_url
 
 
@@ -72,8 +75,9 @@ class QuestionSerializer(serializers.ModelSerializer):
     image_upload = serializers.PrimaryKeyRelatedField(
         queryset=UploadedImage.objects.all(), required=False, allow_null=True
     )
-    image_width = serializers.IntegerField(source="image_upload.width", read_only=True, allow_null=True)
-    image_height = serializers.IntegerField(source="image_upload.height", read_only=True, allow_null=True)
+    image_width = serializers.IntegerField(source="shown_upload.width", read_only=True, allow_null=True)
+    image_height = serializers.IntegerField(source="shown_upload.height", read_only=True, allow_null=True)
+    image_status = serializers.CharField(source="shown_upload.status", read_only=True, allow_null=True)
 
     class Meta:
         model = Question
@@ -87,6 +91,7 @@ class QuestionSerializer(serializers.ModelSerializer):
             "image_upload",
             "image_width",
             "image_height",
+            "image_status",
             "explanation",
             "multiple",
             "answers",
@@ -171,12 +176,12 @@ class QuestionSerializer(serializers.ModelSerializer):
 
     @extend_schema_field(serializers.URLField(allow_null=True))
     def get_image(self, obj):
-        if obj.image_upload and obj.image_upload.image:
-            request = self.context.get("request")
-            url = obj.image_upload.image.url
-            if request is not None:
-                return request.build_absolute_uri(url)
-            return url
+        upload = obj.shown_upload
+        if upload and upload.image:
+            if not upload.is_ready:
+                # Still being processed in the background (see `image_status`).
+                return None
+            return media_urls(self.context).url(upload.image.name)
         return obj.image_url
 
 
@@ -321,10 +326,10 @@ class QuizSerializer(serializers.ModelSerializer):
         Walks the prefetched questions/answers in Python to avoid extra SQL.
         """
         for question in obj.questions.all():
-            if question.image_url and question.image_upload_id is None:
+            if question.image_url and question.shown_upload is None:
                 return True
             for answer in question.answers.all():
-                if answer.image_url and answer.image_upload_id is None:
+                if answer.image_url and answer.shown_upload is None:
                     return True
         return False
 
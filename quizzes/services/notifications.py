@@ -2,6 +2,9 @@ from quizzes.models import Quiz
 from quizzes.tasks import send_quiz_shared_emails_task
 from users.models import StudyGroup, User, UserSettings
 
+# Recipients per `send_quiz_shared_emails_task`, so a share with a large group is sent by several tasks.
+SHARE_EMAIL_BATCH_SIZE = 100
+
 
 def should_send_notification(user: User) -> bool:
     if not user.email:
@@ -10,6 +13,28 @@ def should_send_notification(user: User) -> bool:
     return user_settings.notify_quiz_shared
 
 
+def users_to_notify(users) -> list[str]:
+    """
+    Ids of the `users` who should be notified of a share, like `should_send_notification`.
+
+    Resolves the settings of all of them in one query, creating the missing (default) ones in bulk.
+    """
+    users = [user for user in users if user.email]
+    if not users:
+        return []
+    notify = dict(UserSettings.objects.filter(user__in=users).values_list("user_id", "notify_quiz_shared"))
+    missing = [user for user in users if user.pk not in notify]
+    if missing:
+        created = UserSettings.objects.bulk_create([UserSettings(user=user) for user in missing], ignore_conflicts=True)
+        notify.update((user_settings.user_id, user_settings.notify_quiz_shared) for user_settings in created)
+    return [str(user.id) for user in users if notify[user.pk]]
+
+
+def _enqueue_share_emails(quiz: Quiz, user_ids: list[str]):
+    for start in range(0, len(user_ids), SHARE_EMAIL_BATCH_SIZE):
+        send_quiz_shared_emails_task.enqueue(str(quiz.id), user_ids[start : start + SHARE_EMAIL_BATCH_SIZE])
+
+
 def notify_quiz_shared_to_users(quiz: Quiz, user: User):
     if not should_send_notification(user):
         return
@@ -17,6 +42,6 @@ def notify_quiz_shared_to_users(quiz: Quiz, user: User):
 
 
 def notify_quiz_shared_to_groups(quiz: Quiz, group: StudyGroup):
-    user_ids = [str(user.id) for user in group.members.all() if should_send_notification(user)]
+    user_ids = users_to_notify(group.members.only("id", "email"))
     if user_ids:
-        send_quiz_shared_emails_task.enqueue(str(quiz.id), user_ids)
+        _enqueue_share_emails(quiz, user_ids)
@@ -1,5 +1,7 @@
 from django.db import transaction
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
+
+from uploads.references import refresh_reference_counts, release_references
 
 
 def initialize_user_folders(sender, instance, created, **kwargs):
@@ -20,7 +22,27 @@ def initialize_user_folders(sender, instance, created, **kwargs):
             )
 
 
+def count_image_reference(sender, instance, created, **kwargs):
+    loaded = getattr(instance, "_loaded_image_upload_id", None)
+    if created or loaded != instance.image_upload_id:
+        refresh_reference_counts({loaded, instance.image_upload_id})
+        instance._loaded_image_upload_id = instance.image_upload_id
+
+
+def release_image_reference(sender, instance, **kwargs):
+    release_references({instance.image_upload_id})
+
+
 def register_signals():
     from users.models import User
 
+    from .models import Answer, Question
+
     post_save.connect(initialize_user_folders, sender=User, dispatch_uid="quizzes.initialize_user_folders")
+    for model in (Question, Answer):
+        post_save.connect(
+            count_image_reference, sender=model, dispatch_uid=f"quizzes.count_image_reference.{model.__name__}"
+        )
+        post_delete.connect(
+            release_image_reference, sender=model, dispatch_uid=f"quizzes.release_image_reference.{model.__name__}"
+        )
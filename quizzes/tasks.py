@@ -1,14 +1,16 @@
 from django.apps import apps
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core.mail import get_connection
 from django.tasks import task
 from django.utils.html import strip_tags
 
-from testownik_core.emails import send_email
+from testownik_core.emails import render_email, send_mass_email
 
+# Stands in for the recipient's name in the rendered share email.
+FIRST_NAME_PLACEHOLDER = "%%first_name%%"
 
-@task()
+
+@task(queue_name="emails")
 def send_quiz_shared_emails_task(quiz_id: str, user_ids: list[str]):
     Quiz = apps.get_model("quizzes", "Quiz")
     User = get_user_model()
@@ -18,22 +20,21 @@ def send_quiz_shared_emails_task(quiz_id: str, user_ids: list[str]):
     except Quiz.DoesNotExist:
         return
 
-    users = User.objects.filter(id__in=user_ids)
-    if not users.exists():
+    users = User.objects.filter(id__in=user_ids).only("email", "first_name")
+    recipients = [
+        (user.email, {FIRST_NAME_PLACEHOLDER: f" {strip_tags(user.first_name)}" if user.first_name else ""})
+        for user in users
+    ]
+    if not recipients:
         return
 
     safe_title = strip_tags(quiz.title)
-    connection = get_connection(fail_silently=True)
-
-    for user in users:
-        safe_first_name = f" {strip_tags(user.first_name)}" if user.first_name else ""
-        send_email(
-            subject=f'Quiz "{safe_title}" został Ci udostępniony',
-            recipient_list=[user.email],
-            title=f"Cześć{safe_first_name}! 👋",
-            content=f'Quiz <strong>"{safe_title}"</strong> został Ci udostępniony.',
-            cta_url=f"{settings.FRONTEND_URL}/quiz/{quiz.id}",
-            cta_text="Rozpocznij quiz",
-            cta_description="Powodzenia! 🎓",
-            connection=connection,
-        )
+    email = render_email(
+        subject=f'Quiz "{safe_title}" został Ci udostępniony',
+        title=f"Cześć{FIRST_NAME_PLACEHOLDER}! 👋",
+        content=f'Quiz <strong>"{safe_title}"</strong> został Ci udostępniony.',
+        cta_url=f"{settings.FRONTEND_URL}/quiz/{quiz.id}",
+        cta_text="Rozpocznij quiz",
+        cta_description="Powodzenia! 🎓",
+    )
+    send_mass_email(email, recipients)
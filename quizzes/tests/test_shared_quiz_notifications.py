@@ -1,12 +1,20 @@
 from unittest.mock import Mock, patch
 
-from django.test import TransactionTestCase
+from django.core import mail
+from django.template.loader import render_to_string
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils.html import strip_tags
 
+from quizzes.models import Quiz
 from quizzes.services.notifications import (
     notify_quiz_shared_to_groups,
     notify_quiz_shared_to_users,
     should_send_notification,
+    users_to_notify,
 )
+from quizzes.tasks import send_quiz_shared_emails_task
+from testownik_core.emails import render_email
+from users.models import StudyGroup, User, UserSettings
 
 
 class ShouldSendNotificationTests(TransactionTestCase):
@@ -97,69 +105,115 @@ class NotifyQuizSharedToUsersTests(TransactionTestCase):
 class NotifyQuizSharedToGroupsTests(TransactionTestCase):
     """Testy funkcji notify_quiz_shared_to_groups"""
 
-    @patch("quizzes.services.notifications.send_quiz_shared_emails_task")
-    @patch("quizzes.services.notifications.should_send_notification")
-    def test_enqueues_task_for_eligible_group_members(self, mock_should_send, mock_task):
-        """Kolejkuje task z listą user_ids dla użytkowników, którzy powinni dostać powiadomienie"""
-        mock_should_send.side_effect = [True, False, True]
-
-        mock_quiz = Mock()
-        mock_quiz.id = "quiz-id"
+    def setUp(self):
+        self.group = StudyGroup.objects.create(id="group", name="Grupa")
+        self.quiz = Mock()
+        self.quiz.id = "quiz-id"
 
-        user1 = Mock()
-        user1.id = "user1"
-        user2 = Mock()
-        user2.id = "user2"
-        user3 = Mock()
-        user3.id = "user3"
-
-        mock_group = Mock()
-        mock_group.members.all.return_value = [user1, user2, user3]
-
-        notify_quiz_shared_to_groups(mock_quiz, mock_group)
-
-        mock_task.enqueue.assert_called_once_with("quiz-id", ["user1", "user3"])
+    def _member(self, email, notify=None):
+        user = User.objects.create_user(email=email, password="password")
+        if notify is not None:
+            UserSettings.objects.create(user=user, notify_quiz_shared=notify)
+        self.group.members.add(user)
+        return user
 
     @patch("quizzes.services.notifications.send_quiz_shared_emails_task")
-    @patch("quizzes.services.notifications.should_send_notification")
-    def test_skips_users_who_should_not_receive_notification(self, mock_should_send, mock_task):
-        """Pomija użytkowników, dla których should_send_notification zwraca False"""
-        mock_should_send.side_effect = [False, False, True]
+    def test_enqueues_task_for_eligible_group_members(self, mock_task):
+        """Kolejkuje task z listą user_ids dla użytkowników, którzy powinni dostać powiadomienie"""
+        user1 = self._member("user1@example.com", notify=True)
+        self._member("user2@example.com", notify=False)
+        user3 = self._member("user3@example.com")
 
-        mock_quiz = Mock()
-        mock_quiz.id = "quiz-id"
+        notify_quiz_shared_to_groups(self.quiz, self.group)
 
-        user1 = Mock()
-        user1.id = "user1"
-        user2 = Mock()
-        user2.id = "user2"
-        user3 = Mock()
-        user3.id = "user3"
+        mock_task.enqueue.assert_called_once()
+        quiz_id, user_ids = mock_task.enqueue.call_args.args
+        self.assertEqual(quiz_id, "quiz-id")
+        self.assertCountEqual(user_ids, [str(user1.id), str(user3.id)])
 
-        mock_group = Mock()
-        mock_group.members.all.return_value = [user1, user2, user3]
+    @patch("quizzes.services.notifications.send_quiz_shared_emails_task")
+    def test_skips_users_without_email(self, mock_task):
+        """Pomija użytkowników bez adresu email"""
+        self.group.members.add(User.objects.create_guest_user())
+        user = self._member("user@example.com")
 
-        notify_quiz_shared_to_groups(mock_quiz, mock_group)
+        notify_quiz_shared_to_groups(self.quiz, self.group)
 
-        mock_task.enqueue.assert_called_once_with("quiz-id", ["user3"])
+        mock_task.enqueue.assert_called_once_with("quiz-id", [str(user.id)])
 
     @patch("quizzes.services.notifications.send_quiz_shared_emails_task")
-    @patch("quizzes.services.notifications.should_send_notification")
-    def test_does_not_enqueue_when_no_eligible_users(self, mock_should_send, mock_task):
+    def test_does_not_enqueue_when_no_eligible_users(self, mock_task):
         """Nie kolejkuje taska gdy żaden użytkownik nie powinien dostać powiadomienia"""
-        mock_should_send.return_value = False
+        self._member("user1@example.com", notify=False)
+        self._member("user2@example.com", notify=False)
 
-        mock_quiz = Mock()
-        mock_quiz.id = "quiz-id"
+        notify_quiz_shared_to_groups(self.quiz, self.group)
 
-        user1 = Mock()
-        user1.id = "user1"
-        user2 = Mock()
-        user2.id = "user2"
+        mock_task.enqueue.assert_not_called()
 
-        mock_group = Mock()
-        mock_group.members.all.return_value = [user1, user2]
+    def test_resolves_settings_in_bulk(self):
+        """Ustawienia wszystkich członków są pobierane jednym zapytaniem, a brakujące tworzone hurtowo"""
+        users = [self._member(f"user{i}@example.com", notify=i % 2 == 0) for i in range(10)]
+        users += [self._member(f"new{i}@example.com") for i in range(10)]
 
-        notify_quiz_shared_to_groups(mock_quiz, mock_group)
+        with self.assertNumQueries(2):
+            user_ids = users_to_notify(users)
 
-        mock_task.enqueue.assert_not_called()
+        self.assertCountEqual(user_ids, [str(user.id) for user in users[0:10:2] + users[10:]])
+        self.assertEqual(UserSettings.objects.filter(user__in=users).count(), 20)
+
+    @patch("quizzes.services.notifications.SHARE_EMAIL_BATCH_SIZE", 2)
+    @patch("quizzes.services.notifications.send_quiz_shared_emails_task")
+    def test_enqueues_tasks_in_batches(self, mock_task):
+        """Dzieli odbiorców na kilka tasków"""
+        for i in range(5):
+            self._member(f"user{i}@example.com")
+
+        notify_quiz_shared_to_groups(self.quiz, self.group)
+
+        batches = [call.args[1] for call in mock_task.enqueue.call_args_list]
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(len({user_id for batch in batches for user_id in batch}), 5)
+
+
+@override_settings(EMAIL_BACKEND="django.core.mail.backends.locmem.EmailBackend", FRONTEND_URL="https://example.com")
+class SendQuizSharedEmailsTaskTests(TestCase):
+    """Testy taska send_quiz_shared_emails_task"""
+
+    def setUp(self):
+        self.creator = User.objects.create_user(email="creator@example.com", password="password")
+        self.quiz = Quiz.objects.create(title="Quiz <b>&</b>", creator=self.creator, folder=self.creator.root_folder)
+
+    def test_renders_once_and_personalises_each_email(self):
+        """Renderuje szablon raz na quiz i podstawia imię każdego odbiorcy"""
+        anna = User.objects.create_user(email="anna@example.com", first_name="Anna", password="password")
+        bob = User.objects.create_user(email="bob@example.com", first_name="<Bob> & co", password="password")
+        nameless = User.objects.create_user(email="nameless@example.com", password="password")
+
+        with patch("testownik_core.emails.render_to_string", wraps=render_to_string) as mock_render:
+            send_quiz_shared_emails_task.call(str(self.quiz.id), [str(anna.id), str(bob.id), str(nameless.id)])
+
+        self.assertEqual(mock_render.call_count, 2)
+        self.assertEqual(len(mail.outbox), 3)
+        emails = {email.to[0]: email for email in mail.outbox}
+        for user in (anna, bob, nameless):
+            expected = render_email(
+                subject='Quiz "Quiz &" został Ci udostępniony',
+                title=f"Cześć{f' {strip_tags(user.first_name)}' if user.first_name else ''}! 👋",
+                content='Quiz <strong>"Quiz &"</strong> został Ci udostępniony.',
+                cta_url=f"https://example.com/quiz/{self.quiz.id}",
+                cta_text="Rozpocznij quiz",
+                cta_description="Powodzenia! 🎓",
+            )
+            email = emails[user.email]
+            self.assertEqual(email.subject, expected.subject)
+            self.assertEqual(email.body, expected.text)
+            self.assertEqual(email.alternatives[0].content, expected.html)
+        self.assertIn("Cześć Anna! 👋", emails["anna@example.com"].body)
+        self.assertIn("Cześć! 👋", emails["nameless@example.com"].body)
+
+    def test_skips_unknown_users(self):
+        """Nie wysyła nic, gdy użytkownicy nie istnieją"""
+        send_quiz_shared_emails_task.call(str(self.quiz.id), ["00000000-0000-0000-0000-000000000000"])
+
+        self.assertEqual(mail.outbox, [])
@@ -102,6 +102,7 @@ from quizzes.services.stats import (
 from quizzes.throttling import CopyQuizThrottle, QuizStatsThrottle
 from quizzes.utils import parse_include_values, parse_positive_int_query_param
 from testownik_core.emails import send_email
+from uploads.mirror import schedule_mirror
 from users.models import AccountType
 
 logger = logging.getLogger(__name__)
@@ -457,10 +458,12 @@ class QuizViewSet(viewsets.ModelViewSet):
         return Response(data)
 
     def perform_create(self, serializer):
-        serializer.save(creator=self.request.user, folder=self.request.user.root_folder)
+        quiz = serializer.save(creator=self.request.user, folder=self.request.user.root_folder)
+        schedule_mirror(quiz.pk)
 
     def perform_update(self, serializer):
-        serializer.save(version=serializer.instance.version + 1)
+        quiz = serializer.save(version=serializer.instance.version + 1)
+        schedule_mirror(quiz.pk)
 
     def perform_destroy(self, instance):
         if instance.folder.owner != self.request.user:
@@ -1068,6 +1071,14 @@ class QuestionViewSet(
     queryset = Question.objects.all()
     permission_classes = [permissions.IsAuthenticated, IsQuizCreatorOrCollaboratorOrReadOnly, IsQuestionReadable]
 
+    def perform_create(self, serializer):
+        question = serializer.save()
+        schedule_mirror(question.quiz_id)
+
+    def perform_update(self, serializer):
+        question = serializer.save()
+        schedule_mirror(question.quiz_id)
+
     @extend_schema(
         request=BulkCreateQuestionsSerializer,
         responses={201: QuestionSerializer(many=True)},
@@ -1077,6 +1088,7 @@ class QuestionViewSet(
         serializer = BulkCreateQuestionsSerializer(data=request.data, context={"request": request})
         serializer.is_valid(raise_exception=True)
         questions = serializer.save()
+        schedule_mirror(serializer.validated_data["quiz"].pk)
         return Response(
             QuestionSerializer(questions, many=True, context={"request": request}).data,
             status=status.HTTP_201_CREATED,
@@ -0,0 +1,28 @@
+from django.contrib import admin
+from django.db.models import F
+from django.tasks import TaskResultStatus
+from django.utils import timezone
+from unfold.admin import ModelAdmin
+
+from task_queue.models import QueuedTask
+
+
+@admin.register(QueuedTask)
+class QueuedTaskAdmin(ModelAdmin):
+    list_display = ("task_path", "queue_name", "priority", "status", "attempts", "enqueued_at", "finished_at")
+    list_filter = ("status", "queue_name", "task_path")
+    search_fields = ("id", "task_path")
+    readonly_fields = [field.name for field in QueuedTask._meta.fields]
+    ordering = ("-enqueued_at",)
+    date_hierarchy = "enqueued_at"
+    actions = ["retry_tasks"]
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description="Retry selected failed tasks")
+    def retry_tasks(self, request, queryset):
+        count = queryset.filter(status=TaskResultStatus.FAILED).update(
+            status=TaskResultStatus.READY, run_after=timezone.now(), finished_at=None, max_attempts=F("attempts") + 1
+        )
+        self.message_user(request, f"Queued {count} task(s) for one more attempt.")
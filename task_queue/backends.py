@@ -0,0 +1,99 @@
+"""A `django.tasks` backend storing tasks in the database, for `manage.py run_task_worker`.
+
+    TASKS = {
+        "default": {
+            "BACKEND": "task_queue.backends.DatabaseBackend",
+            "QUEUES": ["default", "emails", "images"],
+            "OPTIONS": {"MAX_ATTEMPTS": 3, "RETRY_BASE_SECONDS": 10, "LEASE_SECONDS": 900},
+        },
+    }
+
+Enqueueing inserts a `QueuedTask` row in the caller's transaction, so a task
+enqueued by a request that rolls back never runs; no broker is involved.
+Workers (`task_queue.worker`) claim ready rows by priority, retry failures
+with full-jitter exponential backoff (`RETRY_BASE_SECONDS`) until
+`MAX_ATTEMPTS`, and leave tasks out of attempts FAILED as dead letters. A task
+still running `LEASE_SECONDS` after it started is assumed lost with its worker
+and counts as a failed attempt.
+"""
+
+from django.core.exceptions import ValidationError
+from django.tasks.backends.base import BaseTaskBackend
+from django.tasks.backends.immediate import ImmediateBackend
+from django.tasks.base import TaskError, TaskResult
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.tasks.signals import task_enqueued
+from django.utils import timezone
+from django.utils.json import normalize_json
+from django.utils.module_loading import import_string
+
+
+def runs_inline(task) -> bool:
+    """Whether enqueueing `task` runs it right away in the caller (`ImmediateBackend`) instead of in a worker."""
+    return isinstance(task.get_backend(), ImmediateBackend)
+
+
+def task_result(row, task=None) -> TaskResult:
+    """The `TaskResult` of a `QueuedTask` row."""
+    if task is None:
+        task = import_string(row.task_path)
+    task = task.using(priority=row.priority, queue_name=row.queue_name, backend=row.backend)
+    result = TaskResult(
+        task=task,
+        id=str(row.id),
+        status=row.status,
+        enqueued_at=row.enqueued_at,
+        started_at=row.started_at,
+        finished_at=row.finished_at,
+        last_attempted_at=row.last_attempted_at,
+        args=row.args,
+        kwargs=row.kwargs,
+        backend=row.backend,
+        errors=[TaskError(**error) for error in row.errors],
+        worker_ids=list(row.worker_ids),
+    )
+    object.__setattr__(result, "_return_value", row.return_value)
+    return result
+
+
+class DatabaseBackend(BaseTaskBackend):
+    supports_defer = True
+    supports_async_task = True
+    supports_get_result = True
+    supports_priority = True
+
+    def __init__(self, alias, params):
+        super().__init__(alias, params)
+        self.max_attempts = int(self.options.get("MAX_ATTEMPTS", 3))
+        self.retry_base_seconds = float(self.options.get("RETRY_BASE_SECONDS", 10))
+        self.lease_seconds = float(self.options.get("LEASE_SECONDS", 900))
+
+    def enqueue(self, task, args, kwargs):
+        from .models import QueuedTask
+
+        self.validate_task(task)
+        now = timezone.now()
+        row = QueuedTask.objects.create(
+            backend=self.alias,
+            task_path=task.module_path,
+            queue_name=task.queue_name,
+            priority=task.priority,
+            args=normalize_json(args),
+            kwargs=normalize_json(kwargs),
+            takes_context=task.takes_context,
+            enqueued_at=now,
+            run_after=task.run_after or now,
+            max_attempts=self.max_attempts,
+        )
+        result = task_result(row, task)
+        task_enqueued.send(type(self), task_result=result)
+        return result
+
+    def get_result(self, result_id):
+        from .models import QueuedTask
+
+        try:
+            row = QueuedTask.objects.get(pk=result_id, backend=self.alias)
+        except (QueuedTask.DoesNotExist, ValidationError):
+            raise TaskResultDoesNotExist(result_id) from None
+        return task_result(row)
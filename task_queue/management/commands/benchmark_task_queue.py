@@ -0,0 +1,60 @@
+"""Benchmark the database task queue: enqueue rate, worker throughput and latency.
+
+    python manage.py benchmark_task_queue --backend database           # 1000 no-op tasks
+    python manage.py benchmark_task_queue --backend database --tasks 200 --sleep-ms 20 --concurrency 1 4 8
+
+Needs a backend alias configured with `task_queue.backends.DatabaseBackend`.
+Every run enqueues its tasks up front, then drains them with one burst worker
+per concurrency level; the tasks are deleted afterwards.
+"""
+
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from task_queue.models import QueuedTask
+from task_queue.tasks import benchmark_task
+from task_queue.worker import Worker, percentile
+
+
+class Command(BaseCommand):
+    help = "Benchmark the database task queue: enqueue rate, worker throughput and enqueue-to-finish latency."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backend", default="default", help="DatabaseBackend alias (default: default)")
+        parser.add_argument("--tasks", type=int, default=1000, help="Tasks per run (default: 1000).")
+        parser.add_argument("--sleep-ms", type=float, default=0, help="Time each task sleeps (default: 0).")
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1], help="Worker concurrency levels to run (default: 1)."
+        )
+
+    def handle(self, *args, **options):
+        try:
+            task = benchmark_task.using(backend=options["backend"])
+            Worker(backend=options["backend"])
+        except (KeyError, ValueError) as e:
+            raise CommandError(f"{e} Configure one with task_queue.backends.DatabaseBackend.") from e
+
+        self.stdout.write(f"{options['tasks']} tasks sleeping {options['sleep_ms']:g} ms each.")
+        self.stdout.write(
+            f"  {'workers':>7} {'enqueue':>10} {'throughput':>12} "
+            f"{'wait p50':>9} {'p95':>7} {'total p50':>10} {'p95':>7}"
+        )
+        for concurrency in options["concurrency"]:
+            started = time.perf_counter()
+            ids = [task.enqueue(options["sleep_ms"]).id for _ in range(options["tasks"])]
+            enqueue_rate = len(ids) / (time.perf_counter() - started)
+
+            stats = Worker(backend=options["backend"], concurrency=concurrency, poll_interval=0.05).run(burst=True)
+            rows = QueuedTask.objects.filter(pk__in=ids)
+            totals = [
+                (finished_at - enqueued_at).total_seconds()
+                for enqueued_at, finished_at in rows.exclude(finished_at=None).values_list("enqueued_at", "finished_at")
+            ]
+            rows.delete()
+
+            self.stdout.write(
+                f"  {concurrency:>7} {enqueue_rate:>8.0f}/s {stats.throughput:>10.0f}/s "
+                f"{percentile(stats.waits, 0.5) * 1000:>6.0f} ms {percentile(stats.waits, 0.95) * 1000:>4.0f} ms "
+                f"{percentile(totals, 0.5) * 1000:>7.0f} ms {percentile(totals, 0.95) * 1000:>4.0f} ms"
+            )
@@ -0,0 +1,70 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from task_queue.worker import Worker, percentile
+
+
+class Command(BaseCommand):
+    """Management command to run the background tasks queued on the database task backend."""
+
+    help = (
+        "Runs tasks enqueued on the database task backend (task_queue.backends.DatabaseBackend), highest priority "
+        "first, until stopped (SIGINT/SIGTERM finish the running tasks first). Run several workers, e.g. one per "
+        "queue, to scale out."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--queue",
+            action="append",
+            default=[],
+            help="Only run tasks of this queue (repeatable; default: every queue of the backend)",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=settings.TASK_WORKER_CONCURRENCY,
+            help=f"Tasks run at once, in threads (default: {settings.TASK_WORKER_CONCURRENCY})",
+        )
+        parser.add_argument(
+            "--poll-interval", type=float, default=1.0, help="Seconds between looks for new tasks (default: 1)"
+        )
+        parser.add_argument("--burst", action="store_true", help="Exit once no task is due")
+        parser.add_argument("--max-tasks", type=int, help="Exit after this many tasks")
+        parser.add_argument("--backend", default="default", help="Task backend alias (default: default)")
+
+    def handle(self, *args, **options):
+        try:
+            worker = Worker(
+                backend=options["backend"],
+                queues=options["queue"],
+                concurrency=options["concurrency"],
+                poll_interval=options["poll_interval"],
+            )
+        except (KeyError, ValueError) as e:
+            raise CommandError(str(e)) from e
+        unknown = set(worker.queues) - worker.backend.queues
+        if unknown:
+            raise CommandError(f"Unknown queues: {', '.join(sorted(unknown))}.")
+
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+
+        self.stdout.write(
+            f"Worker {worker.worker_id} running {', '.join(worker.queues)} with concurrency {worker.concurrency}."
+        )
+        stats = worker.run(burst=options["burst"], max_tasks=options["max_tasks"])
+
+        self.stdout.write(
+            f"Processed {stats.processed} tasks in {stats.elapsed:.1f}s ({stats.throughput:.1f}/s): "
+            f"{stats.succeeded} succeeded, {stats.retried} to be retried, {stats.dead_lettered} dead-lettered."
+        )
+        if stats.processed:
+            self.stdout.write(
+                f"Wait p50 {percentile(stats.waits, 0.5) * 1000:.0f} ms, "
+                f"p95 {percentile(stats.waits, 0.95) * 1000:.0f} ms; "
+                f"runtime p50 {percentile(stats.runtimes, 0.5) * 1000:.0f} ms, "
+                f"p95 {percentile(stats.runtimes, 0.95) * 1000:.0f} ms."
+            )
@@ -0,0 +1,43 @@
+# Generated by Django 6.0.6 on 2026-10-19 06:08
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QueuedTask',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('backend', models.CharField(max_length=100)),
+                ('task_path', models.CharField(db_index=True, help_text='Import path of the task.', max_length=255)),
+                ('queue_name', models.CharField(max_length=100)),
+                ('priority', models.SmallIntegerField(default=0)),
+                ('args', models.JSONField(blank=True, default=list)),
+                ('kwargs', models.JSONField(blank=True, default=dict)),
+                ('takes_context', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('READY', 'Ready'), ('RUNNING', 'Running'), ('FAILED', 'Failed'), ('SUCCESSFUL', 'Successful')], default='READY', max_length=16)),
+                ('enqueued_at', models.DateTimeField()),
+                ('run_after', models.DateTimeField(help_text='Earliest the task may (next) run.')),
+                ('started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_attempted_at', models.DateTimeField(blank=True, null=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('lease_expires_at', models.DateTimeField(blank=True, help_text='A running task not finished by then is assumed lost with its worker.', null=True)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('max_attempts', models.PositiveSmallIntegerField(default=1)),
+                ('worker_ids', models.JSONField(blank=True, default=list)),
+                ('errors', models.JSONField(blank=True, default=list, help_text='`{exception_class_path, traceback}` per failure.')),
+                ('return_value', models.JSONField(blank=True, null=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'queue_name', '-priority', 'run_after'], name='queuedtask_claim_idx'), models.Index(fields=['status', 'lease_expires_at'], name='queuedtask_lease_idx')],
+            },
+        ),
+    ]
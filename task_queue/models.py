@@ -0,0 +1,50 @@
+import uuid
+
+from django.db import models
+from django.tasks import TaskResultStatus
+
+
+class QueuedTask(models.Model):
+    """
+    A `django.tasks` task enqueued on the database backend (`task_queue.backends.DatabaseBackend`).
+
+    Rows are READY until a worker claims one (RUNNING), then SUCCESSFUL, or READY again with a later
+    `run_after` while attempts remain; a task out of attempts stays FAILED as a dead letter.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    backend = models.CharField(max_length=100)
+    task_path = models.CharField(max_length=255, db_index=True, help_text="Import path of the task.")
+    queue_name = models.CharField(max_length=100)
+    priority = models.SmallIntegerField(default=0)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    takes_context = models.BooleanField(default=False)
+    status = models.CharField(max_length=16, choices=TaskResultStatus.choices, default=TaskResultStatus.READY)
+    enqueued_at = models.DateTimeField()
+    run_after = models.DateTimeField(help_text="Earliest the task may (next) run.")
+    started_at = models.DateTimeField(null=True, blank=True)
+    last_attempted_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(
+        null=True, blank=True, help_text="A running task not finished by then is assumed lost with its worker."
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=1)
+    worker_ids = models.JSONField(default=list, blank=True)
+    errors = models.JSONField(default=list, blank=True, help_text="`{exception_class_path, traceback}` per failure.")
+    return_value = models.JSONField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claiming: the next ready task of a queue, by priority.
+            models.Index(fields=["status", "queue_name", "-priority", "run_after"], name="queuedtask_claim_idx"),
+            models.Index(fields=["status", "lease_expires_at"], name="queuedtask_lease_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.task_path} · {self.queue_name} · {self.status}"
+
+    @property
+    def is_dead_letter(self):
+        return self.status == TaskResultStatus.FAILED
@@ -0,0 +1,11 @@
+import time
+
+from django.tasks import task
+
+
+@task()
+def benchmark_task(sleep_ms: float = 0):
+    """A task doing nothing (but sleeping), for measuring the queue itself (`manage.py benchmark_task_queue`)."""
+    if sleep_ms:
+        time.sleep(sleep_ms / 1000)
+    return sleep_ms
@@ -0,0 +1,253 @@
+import asyncio
+import time
+from datetime import timedelta
+from io import StringIO
+from unittest import skipIf
+from unittest.mock import patch
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection, transaction
+from django.tasks import TaskResultStatus, task
+from django.tasks.exceptions import TaskResultDoesNotExist
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from task_queue.models import QueuedTask
+from task_queue.worker import Worker, percentile
+
+ran = []
+
+
+@task()
+def record_task(name):
+    ran.append(name)
+    return name
+
+
+@task()
+def failing_task():
+    raise RuntimeError("Broken")
+
+
+@task()
+async def async_task(value):
+    await asyncio.sleep(0)
+    return value * 2
+
+
+@task(takes_context=True)
+def attempt_task(context):
+    if context.attempt < 2:
+        raise RuntimeError("Try again")
+    return context.attempt
+
+
+@task()
+def sleep_task(seconds):
+    time.sleep(seconds)
+
+
+DATABASE_TASKS = {
+    "default": {
+        "BACKEND": "task_queue.backends.DatabaseBackend",
+        "QUEUES": ["default", "emails", "images"],
+        "OPTIONS": {"MAX_ATTEMPTS": 3, "RETRY_BASE_SECONDS": 0},
+    }
+}
+
+
+@override_settings(TASKS=DATABASE_TASKS)
+class DatabaseBackendTests(TestCase):
+    def setUp(self):
+        ran.clear()
+
+    def test_enqueued_task_runs_on_the_worker(self):
+        result = record_task.enqueue("a")
+
+        self.assertEqual(result.status, TaskResultStatus.READY)
+        self.assertEqual(ran, [])
+        stats = Worker().run(burst=True)
+
+        self.assertEqual(ran, ["a"])
+        self.assertEqual(stats.succeeded, 1)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.return_value, "a")
+        self.assertEqual(result.attempts, 1)
+
+    def test_get_result(self):
+        result = record_task.enqueue("a")
+
+        fetched = record_task.get_result(result.id)
+
+        self.assertEqual(fetched.id, result.id)
+        self.assertEqual(fetched.args, ["a"])
+        with self.assertRaises(TaskResultDoesNotExist):
+            record_task.get_result("not-a-task")
+
+    def test_rolled_back_enqueue_never_runs(self):
+        with transaction.atomic():
+            record_task.enqueue("a")
+            transaction.set_rollback(True)
+
+        self.assertFalse(QueuedTask.objects.exists())
+
+    def test_higher_priority_runs_first(self):
+        record_task.enqueue("low")
+        record_task.using(priority=10).enqueue("high")
+        record_task.using(priority=-10).enqueue("lowest")
+
+        Worker().run(burst=True)
+
+        self.assertEqual(ran, ["high", "low", "lowest"])
+
+    def test_deferred_task_waits_until_due(self):
+        result = record_task.using(run_after=timezone.now() + timedelta(hours=1)).enqueue("later")
+
+        Worker().run(burst=True)
+        self.assertEqual(ran, [])
+
+        QueuedTask.objects.filter(pk=result.id).update(run_after=timezone.now())
+        Worker().run(burst=True)
+        self.assertEqual(ran, ["later"])
+
+    def test_workers_only_run_their_queues(self):
+        record_task.using(queue_name="emails").enqueue("email")
+        record_task.using(queue_name="images").enqueue("image")
+
+        Worker(queues=["emails"]).run(burst=True)
+
+        self.assertEqual(ran, ["email"])
+
+    def test_failures_are_retried_then_dead_lettered(self):
+        result = failing_task.enqueue()
+
+        stats = Worker().run(burst=True)
+
+        self.assertEqual((stats.retried, stats.dead_lettered), (2, 1))
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.FAILED)
+        self.assertEqual(result.attempts, 3)
+        self.assertEqual(len(result.errors), 3)
+        self.assertIs(result.errors[0].exception_class, RuntimeError)
+
+    def test_retries_back_off(self):
+        with self.settings(TASKS={"default": {**DATABASE_TASKS["default"], "OPTIONS": {"RETRY_BASE_SECONDS": 60}}}):
+            failing_task.enqueue()
+            before = timezone.now()
+            stats = Worker().run(burst=True)
+
+            self.assertEqual(stats.retried, 1)
+            row = QueuedTask.objects.get()
+            self.assertEqual(row.status, TaskResultStatus.READY)
+            self.assertLessEqual(row.run_after, before + timedelta(seconds=61))
+
+    def test_task_context_counts_attempts(self):
+        result = attempt_task.enqueue()
+
+        Worker().run(burst=True)
+
+        result.refresh()
+        self.assertEqual(result.return_value, 2)
+
+    def test_async_tasks_run(self):
+        result = async_task.enqueue(21)
+
+        Worker().run(burst=True)
+
+        result.refresh()
+        self.assertEqual(result.return_value, 42)
+
+    def test_tasks_of_dead_workers_are_recovered(self):
+        result = record_task.enqueue("a")
+        worker = Worker()
+        (row,) = worker.claim(1)
+        QueuedTask.objects.filter(pk=row.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(Worker().recover_lost(), 1)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.READY)
+        self.assertEqual(result.errors[0].exception_class_path, "task_queue.worker.LeaseExpired")
+
+        # The lost worker finishing late doesn't overwrite the retry.
+        self.assertIsNone(worker.execute(row).status)
+        Worker().run(burst=True)
+        result.refresh()
+        self.assertEqual(result.status, TaskResultStatus.SUCCESSFUL)
+        self.assertEqual(result.attempts, 2)
+
+    def test_claimed_tasks_are_not_claimed_again(self):
+        record_task.enqueue("a")
+
+        self.assertEqual(len(Worker().claim(5)), 1)
+        self.assertEqual(Worker().claim(5), [])
+
+    def test_worker_command(self):
+        record_task.enqueue("a")
+        out = StringIO()
+
+        call_command("run_task_worker", "--burst", "--concurrency", "1", stdout=out)
+
+        self.assertEqual(ran, ["a"])
+        self.assertIn("Processed 1 tasks", out.getvalue())
+        self.assertIn("1 succeeded", out.getvalue())
+
+    @override_settings(TASKS={"default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}})
+    def test_worker_needs_the_database_backend(self):
+        with self.assertRaisesMessage(Exception, "is not a DatabaseBackend"):
+            call_command("run_task_worker", "--burst", stdout=StringIO())
+
+
+@override_settings(TASKS=DATABASE_TASKS)
+class WorkerRecordingTests(TestCase):
+    def test_bookkeeping_error_doesnt_stop_the_worker(self):
+        """A task whose outcome can't be saved is logged and left to lease recovery; the rest still run."""
+        for name in ("a", "b"):
+            record_task.enqueue(name)
+        execute = Worker.execute
+        calls = []
+
+        def flaky_execute(worker, row):
+            calls.append(row.pk)
+            if len(calls) == 1:
+                raise DatabaseError("database table is locked")
+            return execute(worker, row)
+
+        with patch.object(Worker, "execute", flaky_execute), self.assertLogs("task_queue.worker", "ERROR"):
+            stats = Worker().run(burst=True)
+
+        self.assertEqual((stats.succeeded, stats.lost), (1, 1))
+        self.assertEqual(QueuedTask.objects.get(pk=calls[0]).status, TaskResultStatus.RUNNING)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_task_queue", "--tasks", "20", "--concurrency", "1", stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 3)
+        self.assertFalse(QueuedTask.objects.exists())
+
+
+# SQLite serializes writers across connections; worker threads would fail with "database table is locked".
+@skipIf(connection.vendor == "sqlite", "Concurrent workers need a database with row locks.")
+@override_settings(TASKS=DATABASE_TASKS)
+class ConcurrentWorkerTests(TransactionTestCase):
+    def test_concurrent_worker(self):
+        """Tasks run side by side in threads; the worker reports latency of each."""
+        for _ in range(12):
+            sleep_task.enqueue(0.05)
+
+        stats = Worker(concurrency=4, poll_interval=0.01).run(burst=True)
+
+        self.assertEqual(stats.succeeded, 12)
+        self.assertEqual(len(stats.waits), 12)
+        self.assertGreaterEqual(percentile(stats.runtimes, 0.5), 0.05)
+        self.assertFalse(QueuedTask.objects.exclude(status=TaskResultStatus.SUCCESSFUL).exists())
+
+    def test_benchmark_command(self):
+        out = StringIO()
+
+        call_command("benchmark_task_queue", "--tasks", "20", "--concurrency", "1", "2", stdout=out)
+
+        self.assertEqual(len(out.getvalue().splitlines()), 4)
+        self.assertFalse(QueuedTask.objects.exists())
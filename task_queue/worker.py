@@ -0,0 +1,296 @@
+"""The worker of `DatabaseBackend` (`manage.py run_task_worker`).
+
+A worker claims ready tasks of its queues, highest priority first, and runs up
+to `concurrency` of them at once in threads (one at a time runs inline).
+Claims are conditional updates of the rows, so any number of workers, on any
+number of machines, can share the queues without running a task twice. Each
+claim takes an attempt and a lease; `recover_lost` hands tasks whose lease
+expired (their worker died) to the retry/dead-letter path like any other
+failure.
+"""
+
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import timedelta
+from traceback import format_exception
+
+from django.db import connections, transaction
+from django.tasks import TaskResultStatus, task_backends
+from django.tasks.base import TaskContext
+from django.tasks.signals import task_finished, task_started
+from django.utils import timezone
+from django.utils.crypto import get_random_string
+from django.utils.json import normalize_json
+
+from .backends import DatabaseBackend, task_result
+from .models import QueuedTask
+
+logger = logging.getLogger(__name__)
+
+# How often a worker looks for tasks lost by dead workers.
+RECOVER_INTERVAL_SECONDS = 30
+
+
+class LeaseExpired(Exception):
+    """Recorded for a task whose worker didn't finish it within the lease."""
+
+
+def backoff_delay(attempt: int, base: float) -> float:
+    """Full jitter: uniform in [0, base * 2**(attempt - 1)], so retries from a spike spread out."""
+    return random.uniform(0, base * 2 ** (attempt - 1))
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    """Nearest-rank percentile of `values` (0 when empty)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(fraction * len(ordered)) - 1))]
+
+
+@dataclass
+class Outcome:
+    status: str | None  # SUCCESSFUL, READY (to be retried), FAILED (dead-lettered), None if the lease was lost.
+    wait: float  # Seconds between the task being due and starting.
+    runtime: float
+
+
+@dataclass
+class WorkerStats:
+    succeeded: int = 0
+    retried: int = 0
+    dead_lettered: int = 0
+    lost: int = 0  # Finished after their lease expired, or not recorded; the lease expiry fails the attempt.
+    waits: list[float] = field(default_factory=list)
+    runtimes: list[float] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def processed(self) -> int:
+        return self.succeeded + self.retried + self.dead_lettered + self.lost
+
+    @property
+    def throughput(self) -> float:
+        """Tasks per second."""
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def record(self, outcome: Outcome):
+        if outcome.status == TaskResultStatus.SUCCESSFUL:
+            self.succeeded += 1
+        elif outcome.status == TaskResultStatus.READY:
+            self.retried += 1
+        elif outcome.status == TaskResultStatus.FAILED:
+            self.dead_lettered += 1
+        else:
+            self.lost += 1
+        self.waits.append(outcome.wait)
+        self.runtimes.append(outcome.runtime)
+
+
+def _error(exc: BaseException) -> dict:
+    exception_type = type(exc)
+    return {
+        "exception_class_path": f"{exception_type.__module__}.{exception_type.__qualname__}",
+        "traceback": "".join(format_exception(exc)),
+    }
+
+
+class Worker:
+    def __init__(self, backend="default", queues=None, concurrency=1, poll_interval=1.0):
+        self.backend = task_backends[backend]
+        if not isinstance(self.backend, DatabaseBackend):
+            raise ValueError(f"Task backend {backend!r} is not a DatabaseBackend.")
+        self.queues = sorted(queues or self.backend.queues)
+        self.concurrency = max(1, concurrency)
+        self.poll_interval = poll_interval
+        self.worker_id = get_random_string(32)
+        self.stats = WorkerStats()
+        self._stopping = threading.Event()
+        self._next_recover = 0.0
+
+    def stop(self):
+        """Stop claiming tasks; `run` returns once the running ones finish."""
+        self._stopping.set()
+
+    def _queued(self):
+        return QueuedTask.objects.filter(backend=self.backend.alias, queue_name__in=self.queues)
+
+    def claim(self, limit: int) -> list[QueuedTask]:
+        """Take up to `limit` due tasks, highest priority first."""
+        now = timezone.now()
+        claimed = []
+        with transaction.atomic():
+            candidates = (
+                self._queued()
+                .select_for_update(skip_locked=True)
+                .filter(status=TaskResultStatus.READY, run_after__lte=now)
+                .order_by("-priority", "run_after")[:limit]
+            )
+            for row in candidates:
+                row.status = TaskResultStatus.RUNNING
+                row.started_at = row.started_at or now
+                row.last_attempted_at = now
+                row.lease_expires_at = now + timedelta(seconds=self.backend.lease_seconds)
+                row.worker_ids = [*row.worker_ids, self.worker_id]
+                # Conditional on the row being unclaimed still, for databases without row locks.
+                updated = QueuedTask.objects.filter(
+                    pk=row.pk, status=TaskResultStatus.READY, attempts=row.attempts
+                ).update(
+                    status=row.status,
+                    started_at=row.started_at,
+                    last_attempted_at=now,
+                    lease_expires_at=row.lease_expires_at,
+                    worker_ids=row.worker_ids,
+                    attempts=row.attempts + 1,
+                )
+                if updated:
+                    row.attempts += 1
+                    claimed.append(row)
+        return claimed
+
+    def _held(self, row: QueuedTask):
+        """The row, while still running under the lease `row` was claimed with."""
+        return QueuedTask.objects.filter(
+            pk=row.pk, status=TaskResultStatus.RUNNING, lease_expires_at=row.lease_expires_at
+        )
+
+    def _fail(self, row: QueuedTask, error: dict) -> str | None:
+        """Schedule a retry of a failed attempt, or dead-letter the task if it was the last one.
+
+        Returns the new status, or None if the lease was lost meanwhile (and the attempt already failed).
+        """
+        now = timezone.now()
+        errors = [*row.errors, error]
+        if row.attempts < row.max_attempts:
+            delay = backoff_delay(row.attempts, self.backend.retry_base_seconds)
+            changes = {"status": TaskResultStatus.READY, "run_after": now + timedelta(seconds=delay)}
+        else:
+            logger.error("Task %s (%s) failed %s times; giving up", row.pk, row.task_path, row.attempts)
+            changes = {"status": TaskResultStatus.FAILED, "finished_at": now}
+        if not self._held(row).update(errors=errors, lease_expires_at=None, **changes):
+            return None
+        row.errors = errors
+        for name, value in changes.items():
+            setattr(row, name, value)
+        return changes["status"]
+
+    def recover_lost(self) -> int:
+        """Fail the attempts of running tasks whose lease expired; returns how many there were."""
+        expired = self._queued().filter(status=TaskResultStatus.RUNNING, lease_expires_at__lt=timezone.now())
+        lost = 0
+        for row in expired:
+            error = {
+                "exception_class_path": f"{LeaseExpired.__module__}.{LeaseExpired.__qualname__}",
+                "traceback": f"Not finished by {row.lease_expires_at.isoformat()} (worker {row.worker_ids[-1]}).",
+            }
+            # Another worker may recover it at the same time: only the one that wins the update counts.
+            if self._fail(row, error) is not None:
+                lost += 1
+        return lost
+
+    def execute(self, row: QueuedTask) -> Outcome:
+        """Run a claimed task and record how it went."""
+        started = time.perf_counter()
+        wait_seconds = max(0.0, (row.last_attempted_at - row.run_after).total_seconds())
+        try:
+            result = task_result(row)
+        except ImportError as exc:
+            status = self._fail(row, _error(exc))
+            return Outcome(status, wait_seconds, time.perf_counter() - started)
+
+        task = result.task
+        task_started.send(sender=type(self.backend), task_result=result)
+        try:
+            if row.takes_context:
+                value = task.call(TaskContext(task_result=result), *row.args, **row.kwargs)
+            else:
+                value = task.call(*row.args, **row.kwargs)
+            value = normalize_json(value)
+        except KeyboardInterrupt:
+            raise
+        except BaseException as exc:
+            logger.warning("Task %s (%s) failed on attempt %s", row.pk, row.task_path, row.attempts, exc_info=True)
+            status = self._fail(row, _error(exc))
+        else:
+            status = TaskResultStatus.SUCCESSFUL
+            row.finished_at = timezone.now()
+            if self._held(row).update(
+                status=status, finished_at=row.finished_at, return_value=value, lease_expires_at=None
+            ):
+                row.status = status
+                row.return_value = value
+            else:
+                status = None
+        if status is not None:
+            task_finished.send(sender=type(self.backend), task_result=task_result(row, task))
+        return Outcome(status, wait_seconds, time.perf_counter() - started)
+
+    def _execute_in_thread(self, row: QueuedTask) -> Outcome:
+        try:
+            return self.execute(row)
+        finally:
+            connections.close_all()
+
+    def _record(self, row: QueuedTask, run) -> None:
+        """Record the outcome of `run()`, logging (not raising) errors of the worker's own bookkeeping.
+
+        The task's lease then runs out and `recover_lost` fails the attempt, so one row can't stop the worker.
+        """
+        try:
+            outcome = run()
+        except KeyboardInterrupt:
+            raise
+        except Exception:
+            logger.exception("Recording task %s (%s) failed; retried when its lease expires", row.pk, row.task_path)
+            self.stats.lost += 1
+            return
+        self.stats.record(outcome)
+
+    def run(self, burst=False, max_tasks=None) -> WorkerStats:
+        """
+        Process tasks until stopped; with `burst`, only until no task is due.
+
+        Returns the stats of this run (also kept in `self.stats`).
+        """
+        self.stats = WorkerStats()
+        started = time.perf_counter()
+        pool = ThreadPoolExecutor(self.concurrency, thread_name_prefix="task-worker") if self.concurrency > 1 else None
+        running = {}
+        try:
+            while not self._stopping.is_set():
+                if time.monotonic() >= self._next_recover:
+                    self.recover_lost()
+                    self._next_recover = time.monotonic() + RECOVER_INTERVAL_SECONDS
+
+                free = self.concurrency - len(running)
+                if max_tasks is not None:
+                    free = min(free, max_tasks - self.stats.processed - len(running))
+                    if free <= 0 and not running:
+                        break
+                rows = self.claim(free) if free > 0 else []
+
+                if pool is None:
+                    for row in rows:
+                        self._record(row, lambda row=row: self.execute(row))
+                else:
+                    running.update({pool.submit(self._execute_in_thread, row): row for row in rows})
+
+                if running:
+                    done, _ = wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        self._record(running.pop(future), future.result)
+                elif not rows:
+                    if burst:
+                        break
+                    self._stopping.wait(self.poll_interval)
+        finally:
+            if pool is not None:
+                for future in wait(running).done:
+                    self._record(running[future], future.result)
+                pool.shutdown()
+            self.stats.elapsed = time.perf_counter() - started
+        return self.stats
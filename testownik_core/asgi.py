@@ -13,4 +13,27 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testownik_core.settings")
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from testownik_core.usos import pool as usos_pool  # noqa: E402 - needs configured settings
+
+
+async def lifespan(receive, send):
+    """Open the shared USOS connection pool on startup and close it on shutdown."""
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await usos_pool.start()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await usos_pool.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    # Django doesn't handle lifespan events itself.
+    if scope["type"] == "lifespan":
+        await lifespan(receive, send)
+        return
+    await django_application(scope, receive, send)
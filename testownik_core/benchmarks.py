@@ -0,0 +1,37 @@
+"""Shared by the `benchmark_*` management commands."""
+
+import subprocess
+import sys
+import types
+
+from django.conf import settings
+from django.core.management.base import CommandError
+
+
+def module_at_revision(module_name: str, revision: str) -> types.ModuleType:
+    """Load `module_name` as of git `revision` (e.g. `main`, `HEAD~3`), to benchmark against.
+
+    Only that module's source is taken from the revision; its imports resolve
+    against the working tree. Needs a git checkout with the revision's history.
+    """
+    path = f"{module_name.replace('.', '/')}.py"
+    try:
+        source = subprocess.run(
+            ["git", "show", f"{revision}:{path}"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+    except subprocess.CalledProcessError as exc:
+        raise CommandError(f"Cannot read {path} at {revision}: {exc.stderr.strip()}") from exc
+    except OSError as exc:
+        raise CommandError(f"Cannot run git: {exc}") from exc
+
+    name = f"{module_name}@{revision}"
+    module = types.ModuleType(name)
+    module.__file__ = f"{revision}:{path}"
+    # Registered like any import, for code that looks its module up (e.g. dataclasses).
+    sys.modules[name] = module
+    exec(compile(source, module.__file__, "exec"), module.__dict__)
+    return module
@@ -1,11 +1,13 @@
 import logging
 import re
+from dataclasses import dataclass
 from typing import Any
 
 import nh3
 from django.conf import settings
-from django.core.mail import EmailMultiAlternatives
+from django.core.mail import EmailMultiAlternatives, get_connection
 from django.template.loader import render_to_string
+from django.utils.html import escape
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,90 @@ def _sanitize_email_header(value: str | None) -> str:
     return re.sub(r"[\x00-\x1F\x7F-\x9F]", "", value).strip()
 
 
+@dataclass(frozen=True)
+class RenderedEmail:
+    """
+    An email rendered from the base template, ready to be addressed.
+
+    The rendered bodies may contain placeholders (plain tokens such as `%%first_name%%` passed in
+    `title` or `content`), which `message` fills in per recipient. This way an email sent to many
+    people is rendered once instead of once per recipient.
+    """
+
+    subject: str
+    text: str
+    html: str
+
+    def message(
+        self,
+        to: list[str],
+        substitutions: dict[str, str] | None = None,
+        from_email: str | None = None,
+        reply_to: list[str] | None = None,
+        connection=None,
+    ) -> EmailMultiAlternatives:
+        """
+        Build the message for `to`, replacing each placeholder in `substitutions` with its value.
+
+        Values are HTML-escaped, as the template context they stand in for would have been.
+        """
+        text, html = self.text, self.html
+        for placeholder, value in (substitutions or {}).items():
+            value = escape(value)
+            text = text.replace(placeholder, value)
+            html = html.replace(placeholder, value)
+
+        email = EmailMultiAlternatives(
+            subject=self.subject,
+            body=text,
+            from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+            to=to,
+            reply_to=reply_to,
+            connection=connection,
+        )
+        email.attach_alternative(html, "text/html")
+        return email
+
+
+def render_email(
+    subject: str,
+    title: str | None = None,
+    content: str | None = None,
+    template_name: str | None = None,
+    context: dict[str, Any] | None = None,
+    cta_url: str | None = None,
+    cta_text: str | None = None,
+    cta_description: str | None = None,
+) -> RenderedEmail:
+    """
+    Render an email with the standardized base template.
+
+    Takes the same content arguments as `send_email`, which renders through this function.
+    """
+    # Prepare content
+    final_content = content or ""
+    if template_name:
+        final_content = render_to_string(template_name, context or {})
+
+    # Base template context
+    base_context = {
+        "title": title,
+        "content": nh3.clean(final_content),
+        "cta_url": cta_url,
+        "cta_text": cta_text,
+        "cta_description": cta_description,
+        "frontend_url": settings.FRONTEND_URL,
+        # Add any other global context settings needed by base.html
+    }
+
+    html_message = render_to_string("emails/base.html", base_context)
+
+    # Create a plain text version
+    text_message = render_to_string("emails/base.txt", base_context)
+
+    return RenderedEmail(subject=_sanitize_email_header(subject), text=text_message, html=html_message)
+
+
 def send_email(
     subject: str,
     recipient_list: list[str],
@@ -72,47 +158,62 @@ def send_email(
         logger.warning("Attempted to send email with no recipients.")
         return False
 
-    if from_email is None:
-        from_email = settings.DEFAULT_FROM_EMAIL
+    email = render_email(
+        subject,
+        title=title,
+        content=content,
+        template_name=template_name,
+        context=context,
+        cta_url=cta_url,
+        cta_text=cta_text,
+        cta_description=cta_description,
+    ).message(recipient_list, from_email=from_email, reply_to=reply_to, connection=connection)
 
-    # Prepare content
-    final_content = content or ""
-    if template_name:
-        final_content = render_to_string(template_name, context or {})
+    try:
+        return email.send(fail_silently=fail_silently) == 1
+    except Exception as e:
+        logger.error(f"Failed to send email to {recipient_list}: {e}")
+        if not fail_silently:
+            raise
+        return False
 
-    # Base template context
-    base_context = {
-        "title": title,
-        "content": nh3.clean(final_content),
-        "cta_url": cta_url,
-        "cta_text": cta_text,
-        "cta_description": cta_description,
-        "frontend_url": settings.FRONTEND_URL,
-        # Add any other global context settings needed by base.html
-    }
 
-    html_message = render_to_string("emails/base.html", base_context)
+def send_mass_email(
+    email: RenderedEmail,
+    recipients: list[tuple[str, dict[str, str]]],
+    from_email: str | None = None,
+    fail_silently: bool = True,
+    connection=None,
+) -> int:
+    """
+    Send a rendered email to many recipients, each as their own message, over a single connection.
 
-    # Create a plain text version
-    text_message = render_to_string("emails/base.txt", base_context)
+    Args:
+        email: The email to send, usually from `render_email`.
+        recipients: `(address, substitutions)` pairs; see `RenderedEmail.message`.
+        from_email: The sender's email address. Defaults to `settings.DEFAULT_FROM_EMAIL`.
+        fail_silently: If True, suppress exceptions raised during sending. Defaults to True.
+        connection: Optional email backend connection to use for sending.
 
-    # Sanitize subject
-    safe_subject = _sanitize_email_header(subject)
+    Returns:
+        int: The number of messages sent.
+    """
 
-    email = EmailMultiAlternatives(
-        subject=safe_subject,
-        body=text_message,
-        from_email=from_email,
-        to=recipient_list,
-        reply_to=reply_to,
-        connection=connection,
-    )
-    email.attach_alternative(html_message, "text/html")
+    if not recipients:
+        logger.warning("Attempted to send email with no recipients.")
+        return 0
+
+    if connection is None:
+        connection = get_connection(fail_silently=fail_silently)
+    messages = [
+        email.message([address], substitutions, from_email=from_email, connection=connection)
+        for address, substitutions in recipients
+    ]
 
     try:
-        return email.send(fail_silently=fail_silently) == 1
+        return connection.send_messages(messages) or 0
     except Exception as e:
-        logger.error(f"Failed to send email to {recipient_list}: {e}")
+        logger.error(f"Failed to send email to {len(messages)} recipients: {e}")
         if not fail_silently:
             raise
-        return False
+        return 0
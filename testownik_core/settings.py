@@ -91,6 +91,7 @@ INSTALLED_APPS = [
     "testownik_core.apps.TestownikCoreConfig",
     "oauth_integrations.apps.OAuthIntegrationsConfig",
     "uploads.apps.UploadsConfig",
+    "task_queue.apps.TaskQueueConfig",
     "constance",
     "constance.backends.database",
     "rest_framework",
@@ -278,6 +279,10 @@ if os.getenv("S3_BUCKET_NAME"):
                 "file_overwrite": False,
                 "default_acl": "public-read",
                 "querystring_auth": False,
+                # Stored files are never overwritten, so browsers and CDNs may keep them for good.
+                "object_parameters": {
+                    "CacheControl": os.getenv("S3_CACHE_CONTROL", "public, max-age=31536000, immutable"),
+                },
             },
         },
         "staticfiles": {
@@ -315,10 +320,51 @@ EMAIL_TIMEOUT = 10
 
 SPECTACULAR_SETTINGS = spectacular.SPECTACULAR_SETTINGS
 
-TASKS = {"default": {"BACKEND": "django.tasks.backends.immediate.ImmediateBackend"}}
+# Background tasks: "immediate" runs them inside the request, "database" queues them for
+# `manage.py run_task_worker` (see `task_queue`), retrying failures with backoff up to TASK_MAX_ATTEMPTS.
+TASK_BACKENDS = {
+    "immediate": "django.tasks.backends.immediate.ImmediateBackend",
+    "database": "task_queue.backends.DatabaseBackend",
+}
+TASKS = {
+    "default": {
+        "BACKEND": TASK_BACKENDS[os.getenv("TASKS_BACKEND", "immediate")],
+        "QUEUES": ["default", "emails", "images"],
+        "OPTIONS": {
+            "MAX_ATTEMPTS": int(os.getenv("TASK_MAX_ATTEMPTS", 3)),
+            "RETRY_BASE_SECONDS": 10,
+            "LEASE_SECONDS": 15 * 60,
+        },
+    }
+}
+# Tasks a `run_task_worker` process runs at once (in threads) unless given --concurrency.
+TASK_WORKER_CONCURRENCY = int(os.getenv("TASK_WORKER_CONCURRENCY", 4))
 
 TRASH_TTL_DAYS = 30
 
+# Shared keep-alive connections to USOS (see `testownik_core.usos`).
+USOS_POOL_SIZE = int(os.environ.get("USOS_POOL_SIZE", 20))
+USOS_KEEPALIVE_SECONDS = 30
+
+# Images a process decodes/encodes at once (uploads and responsive variants); each may take a few hundred MB.
+IMAGE_ENCODE_CONCURRENCY = int(os.environ.get("IMAGE_ENCODE_CONCURRENCY", 2))
+# Let the external image mirror (`uploads.mirror`) fetch from private/loopback addresses; local development only.
+IMAGE_MIRROR_ALLOW_PRIVATE_HOSTS = os.getenv("IMAGE_MIRROR_ALLOW_PRIVATE_HOSTS", "False") == "True"
+
+# Longest a process serves its in-memory copy of terms / class types (see `users.dictionaries`).
+USOS_DICTIONARY_CACHE_SECONDS = int(os.environ.get("USOS_DICTIONARY_CACHE_SECONDS", 300))
+
+# `/grades` serves the last USOS fetch and refreshes it in the background once it is older than this.
+GRADES_SNAPSHOT_TTL_SECONDS = int(os.environ.get("GRADES_SNAPSHOT_TTL_SECONDS", 15 * 60))
+# Grade syncs: concurrent USOS fetches per worker, attempts per sync, and the base of the jittered backoff.
+GRADES_SYNC_CONCURRENCY = int(os.environ.get("GRADES_SYNC_CONCURRENCY", 4))
+GRADES_SYNC_MAX_ATTEMPTS = 3
+GRADES_SYNC_RETRY_BASE_SECONDS = 2.0
+# A sync still running after this long is assumed lost and may be requested again.
+GRADES_SYNC_TIMEOUT_SECONDS = 10 * 60
+# A sync that failed on transient errors is requested again by `/grades` no sooner than this.
+GRADES_SYNC_FAILED_RETRY_SECONDS = 5 * 60
+
 UNFOLD = get_unfold_settings(FRONTEND_URL)
 
 # OAuth 2.0 Authorization Server (django-oauth-toolkit)
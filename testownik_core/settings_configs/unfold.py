@@ -136,6 +136,11 @@ def get_unfold_settings(frontend_url):
                             "icon": "image",
                             "link": reverse_lazy("admin:uploads_uploadedimage_changelist"),
                         },
+                        {
+                            "title": "Mirror Failures",
+                            "icon": "link_off",
+                            "link": reverse_lazy("admin:uploads_mirrorfailure_changelist"),
+                        },
                     ],
                 },
                 {
@@ -180,6 +185,11 @@ def get_unfold_settings(frontend_url):
                             "icon": "category",
                             "link": reverse_lazy("admin:users_courseclasstype_changelist"),
                         },
+                        {
+                            "title": "Background Tasks",
+                            "icon": "schedule",
+                            "link": reverse_lazy("admin:task_queue_queuedtask_changelist"),
+                        },
                     ],
                 },
             ],
@@ -0,0 +1,80 @@
+import asyncio
+
+from django.test import SimpleTestCase, override_settings
+
+from testownik_core.asgi import application
+from testownik_core.usos import PooledConnection, USOSConnectionPool, pool, usos_client
+
+
+@override_settings(USOS_POOL_SIZE=5)
+class USOSClientPoolTests(SimpleTestCase):
+    def test_clients_on_a_loop_share_its_connector(self):
+        async def scenario():
+            async with usos_client("token-a", "secret-a") as a, usos_client("token-b", "secret-b") as b:
+                connector = pool.connector()
+                self.assertIsNotNone(connector)
+                self.assertEqual(connector.limit, 5)
+                for client in (a, b):
+                    self.assertIsInstance(client.connection, PooledConnection)
+                    self.assertIs(client.grade_service.connection, client.connection)
+                    self.assertIs(client.connection._session.connector, connector)
+                    self.assertIs(client.connection.auth_manager._session.connector, connector)
+                # Tokens are bound per client, not per pool.
+                self.assertEqual(a.connection.auth_manager.access_token, "token-a")
+                self.assertEqual(b.connection.auth_manager.access_token, "token-b")
+            self.assertTrue(a.connection._session.closed)
+            self.assertIs(pool.connector(), connector)
+            self.assertFalse(connector.closed)
+            return connector
+
+        connector = asyncio.run(scenario())
+        # asyncio.run (like async_to_sync) shuts the loop's async generators down, closing its connector.
+        self.assertTrue(connector.closed)
+
+    def test_each_loop_gets_its_own_connector(self):
+        async def scenario():
+            async with usos_client(scopes=["studies"]) as client:
+                self.assertEqual(client.connection.auth_manager.SCOPES, "studies")
+                return client.connection._session.connector
+
+        first = asyncio.run(scenario())
+        second = asyncio.run(scenario())
+        self.assertIsNot(first, second)
+        self.assertTrue(first.closed)
+        self.assertTrue(second.closed)
+
+    def test_closing_the_pool_lets_the_loop_start_a_new_connector(self):
+        async def scenario():
+            shared = USOSConnectionPool()
+            first = await shared.start()
+            self.assertIs(await shared.start(), first)
+            await shared.close()
+            self.assertTrue(first.closed)
+            self.assertIsNone(shared.connector())
+            second = await shared.start()
+            self.assertIsNot(second, first)
+            return second
+
+        self.assertTrue(asyncio.run(scenario()).closed)
+
+    def test_asgi_lifespan_opens_and_closes_the_pool(self):
+        async def scenario():
+            events = [{"type": "lifespan.startup"}, {"type": "lifespan.shutdown"}]
+            sent = []
+            seen_during_startup = []
+
+            async def receive():
+                return events.pop(0)
+
+            async def send(message):
+                sent.append(message["type"])
+                if message["type"] == "lifespan.startup.complete":
+                    seen_during_startup.append(pool.connector())
+
+            await application({"type": "lifespan"}, receive, send)
+
+            self.assertEqual(sent, ["lifespan.startup.complete", "lifespan.shutdown.complete"])
+            self.assertIsNotNone(seen_during_startup[0])
+            self.assertIsNone(pool.connector())
+
+        asyncio.run(scenario())
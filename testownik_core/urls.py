@@ -1,5 +1,6 @@
+import re
+
 from django.conf import settings
-from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import include, path, re_path
 from django.utils.module_loading import import_string
@@ -22,6 +23,7 @@ from oauth_integrations.views import (
     ProtectedResourceMetadataView,
 )
 from testownik_core.views import ApiIndexView
+from uploads.views import serve_media
 from users.views import (
     CustomTokenObtainPairView,
     CustomTokenRefreshView,
@@ -117,4 +119,11 @@ urlpatterns = [
 ]
 
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    # Like `static()`, but with the cache headers stored media deserves.
+    urlpatterns += [
+        re_path(
+            rf"^{re.escape(settings.MEDIA_URL.lstrip('/'))}(?P<path>.*)$",
+            serve_media,
+            {"document_root": settings.MEDIA_ROOT},
+        )
+    ]
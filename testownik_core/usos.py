@@ -0,0 +1,147 @@
+"""Process-wide pooled `USOSClient`s.
+
+A plain `USOSClient` opens its own `aiohttp` sessions, so every request paid
+for fresh TCP and TLS handshakes to USOS. `usos_client()` hands out a
+lightweight client whose sessions share one keep-alive `TCPConnector`, sized by
+`settings.USOS_POOL_SIZE`. The OAuth token is bound to that one client, so
+concurrent calls for different users never share credentials.
+
+`aiohttp` connectors belong to an event loop, so the pool keeps one per loop,
+created on first use and closed when the loop shuts down its async generators
+(`asyncio.run` and `async_to_sync` both do). The ASGI server's loop lives as long
+as the process; `asgi.py` opens its connector on lifespan startup and closes it
+on shutdown. Under WSGI and in the task worker every `async_to_sync` call runs
+its own loop, so connections are shared within one request or task (e.g. the
+concurrent syncs of `run_syncs`) rather than across them.
+"""
+
+import asyncio
+import os
+import weakref
+from collections.abc import AsyncGenerator, AsyncIterator
+from contextlib import asynccontextmanager
+
+import aiohttp
+import dotenv
+from django.conf import settings
+from usos_api import USOSClient
+from usos_api.auth import AuthManager
+from usos_api.connection import USOSAPIConnection
+
+dotenv.load_dotenv()
+
+USOS_BASE_URL = "https://apps.usos.pwr.edu.pl/"
+
+
+class USOSConnectionPool:
+    def __init__(self):
+        # loop -> (connector, the async generator closing it on loop shutdown)
+        self._connectors: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, tuple[aiohttp.TCPConnector, AsyncGenerator[None]]
+        ] = weakref.WeakKeyDictionary()
+
+    async def start(self) -> aiohttp.TCPConnector:
+        """The running loop's connector, created if it has none yet."""
+        connector = self.connector()
+        if connector is not None:
+            return connector
+        loop = asyncio.get_running_loop()
+        connector = aiohttp.TCPConnector(
+            limit=settings.USOS_POOL_SIZE,
+            keepalive_timeout=settings.USOS_KEEPALIVE_SECONDS,
+        )
+        closer = self._close_on_shutdown(loop, connector)
+        # The first step registers the generator with the loop, whose shutdown_asyncgens() runs its finally.
+        await anext(closer)
+        self._connectors[loop] = (connector, closer)
+        return connector
+
+    async def close(self) -> None:
+        """Close the running loop's connector, if it has one."""
+        entry = self._connectors.get(asyncio.get_running_loop())
+        if entry is not None:
+            await entry[1].aclose()
+
+    def connector(self) -> aiohttp.TCPConnector | None:
+        """The running loop's connector, if it was started."""
+        entry = self._connectors.get(asyncio.get_running_loop())
+        if entry is None or entry[0].closed:
+            return None
+        return entry[0]
+
+    async def _close_on_shutdown(
+        self, loop: asyncio.AbstractEventLoop, connector: aiohttp.TCPConnector
+    ) -> AsyncGenerator[None]:
+        try:
+            yield
+        finally:
+            # Not `pop`: a later connector for the same loop may have replaced this one.
+            if self._connectors.get(loop, (None,))[0] is connector:
+                del self._connectors[loop]
+            await connector.close()
+
+
+pool = USOSConnectionPool()
+
+
+class PooledAuthManager(AuthManager):
+    """An `AuthManager` whose session runs on a shared connector instead of one of its own."""
+
+    def __init__(self, *args, connector: aiohttp.TCPConnector, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connector = connector
+
+    async def open(self):
+        self._session = aiohttp.ClientSession(connector=self.connector, connector_owner=False, trust_env=self.trust_env)
+
+
+class PooledConnection(USOSAPIConnection):
+    """A `USOSAPIConnection` whose sessions run on a shared connector; closing it leaves the connector open."""
+
+    def __init__(self, api_base_address, consumer_key, consumer_secret, trust_env=False, *, connector):
+        super().__init__(api_base_address, consumer_key, consumer_secret, trust_env)
+        self.connector = connector
+        self.auth_manager = PooledAuthManager(
+            api_base_address, consumer_key, consumer_secret, trust_env, connector=connector
+        )
+
+    async def open(self):
+        self._session = aiohttp.ClientSession(connector=self.connector, connector_owner=False, trust_env=self.trust_env)
+        await self.auth_manager.open()
+
+
+class PooledUSOSClient(USOSClient):
+    """A `USOSClient` on a `PooledConnection`."""
+
+    def __init__(self, api_base_address, consumer_key, consumer_secret, trust_env=False, *, connector):
+        super().__init__(api_base_address, consumer_key, consumer_secret, trust_env)
+        connection = PooledConnection(api_base_address, consumer_key, consumer_secret, trust_env, connector=connector)
+        # The services were built around the stock connection.
+        for service in vars(self).values():
+            if getattr(service, "connection", None) is self.connection:
+                service.connection = connection
+        self.connection = connection
+
+
+def consumer_credentials() -> tuple[str | None, str | None]:
+    return os.getenv("USOS_CONSUMER_KEY"), os.getenv("USOS_CONSUMER_SECRET")
+
+
+@asynccontextmanager
+async def usos_client(
+    access_token: str | None = None,
+    access_token_secret: str | None = None,
+    *,
+    scopes: list[str] | None = None,
+) -> AsyncIterator[USOSClient]:
+    """A `USOSClient` on the running loop's pool, acting with the given user token (if any)."""
+    consumer_key, consumer_secret = consumer_credentials()
+    connector = await pool.start()
+    client = PooledUSOSClient(USOS_BASE_URL, consumer_key, consumer_secret, trust_env=True, connector=connector)
+    if scopes is not None:
+        client.set_scopes(scopes)
+    if access_token and access_token_secret:
+        client.load_access_token(access_token, access_token_secret)
+
+    async with client:
+        yield client
@@ -1,10 +1,10 @@
 from django.contrib import admin
-from django.db.models import Count
+from django.db.models import F, Sum
 from django.utils.html import format_html
 from django.utils.safestring import mark_safe
 from unfold.admin import ModelAdmin
 
-from .models import UploadedImage
+from .models import MirrorFailure, UploadedImage
 
 
 @admin.register(UploadedImage)
@@ -15,32 +15,34 @@ class UploadedImageAdmin(ModelAdmin):
         "original_filename",
         "dimensions",
         "file_size_display",
+        "size_reduction",
         "uploaded_by",
         "uploaded_at",
-        "reference_count",
+        "references",
+        "dedup_savings",
     ]
     list_filter = ["uploaded_at", "content_type"]
-    search_fields = ["id", "original_filename", "uploaded_by__email"]
+    search_fields = ["id", "original_filename", "uploaded_by__email", "source_url"]
     readonly_fields = [
         "id",
         "image_preview",
         "original_filename",
         "content_type",
         "file_size",
+        "original_size",
         "width",
         "height",
         "uploaded_by",
         "uploaded_at",
+        "content_hash",
+        "source_url",
+        "processing_ms",
+        "dedup_hits",
+        "failed_variants",
     ]
     ordering = ["-uploaded_at"]
     date_hierarchy = "uploaded_at"
-
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        return qs.annotate(
-            _question_count=Count("questions", distinct=True),
-            _answer_count=Count("answers", distinct=True),
-        )
+    list_before_template = "admin/uploads/uploadedimage/dedup_summary.html"
 
     def thumbnail_preview(self, obj):
         if obj.image:
@@ -71,23 +73,63 @@ class UploadedImageAdmin(ModelAdmin):
 
     dimensions.short_description = "Size (px)"
 
+    @staticmethod
+    def _format_size(size):
+        if size < 1024:
+            return f"{size} B"
+        elif size < 1024 * 1024:
+            return f"{size / 1024:.1f} KB"
+        else:
+            return f"{size / (1024 * 1024):.2f} MB"
+
     def file_size_display(self, obj):
         if obj.file_size:
-            if obj.file_size < 1024:
-                return f"{obj.file_size} B"
-            elif obj.file_size < 1024 * 1024:
-                return f"{obj.file_size / 1024:.1f} KB"
-            else:
-                return f"{obj.file_size / (1024 * 1024):.2f} MB"
+            return self._format_size(obj.file_size)
         return "-"
 
     file_size_display.short_description = "File Size"
     file_size_display.admin_order_field = "file_size"
 
-    def reference_count(self, obj):
-        count = obj._question_count + obj._answer_count
-        if count == 0:
+    def size_reduction(self, obj):
+        if not obj.original_size or not obj.file_size:
+            return "-"
+        return f"{(obj.original_size - obj.file_size) / obj.original_size:.0%}"
+
+    size_reduction.short_description = "Saved by processing"
+
+    def references(self, obj):
+        if obj.reference_count == 0:
             return mark_safe('<span style="color: #999;">0 (orphan)</span>')
-        return count
+        return obj.reference_count
+
+    references.short_description = "References"
+    references.admin_order_field = "reference_count"
+
+    def dedup_savings(self, obj):
+        if not obj.dedup_hits:
+            return "-"
+        return f"{obj.dedup_hits} × {self._format_size(obj.dedup_hits * obj.file_size)}"
+
+    dedup_savings.short_description = "Deduplicated"
+    dedup_savings.admin_order_field = "dedup_hits"
+
+    def dedup_summary(self):
+        """Totals for the banner above the list: what re-uploads would have cost without deduplication."""
+        totals = UploadedImage.objects.aggregate(
+            hits=Sum("dedup_hits", default=0),
+            bytes_saved=Sum(F("dedup_hits") * F("file_size"), default=0),
+            ms_saved=Sum(F("dedup_hits") * F("processing_ms"), default=0),
+        )
+        return {
+            "hits": totals["hits"],
+            "storage": self._format_size(totals["bytes_saved"]),
+            "cpu_seconds": f"{totals['ms_saved'] / 1000:.1f}",
+        }
+
 
-    reference_count.short_description = "References"
+@admin.register(MirrorFailure)
+class MirrorFailureAdmin(ModelAdmin):
+    list_display = ["url", "failures", "last_failed_at", "retry_after"]
+    search_fields = ["url"]
+    readonly_fields = ["url", "error", "failures", "last_failed_at", "retry_after"]
+    ordering = ["-last_failed_at"]
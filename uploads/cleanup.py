@@ -0,0 +1,156 @@
+"""Batched deletion of orphaned uploads.
+
+Orphans (a zero `reference_count`, see `uploads.references`) are walked in
+primary key order with a keyset cursor, so every batch is one indexed range
+query no matter how far the cleanup has got, and a run can be resumed from the
+last key it reported. Each batch deletes its rows in one statement, under a row
+lock that re-checks against the questions and answers themselves that they are
+still unreferenced, and only then removes their files: with
+S3 through multi-object deletes (up to 1000 keys per request), elsewhere
+through a small thread pool. A crash between the two steps leaves files without
+rows, never rows without files.
+"""
+
+import time
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef, QuerySet
+
+from .models import UploadedImage
+
+S3_DELETE_LIMIT = 1000
+
+
+@dataclass
+class CleanupResult:
+    deleted: int = 0
+    bytes_freed: int = 0
+    files_deleted: int = 0
+    failed_files: list[tuple[str, str]] = field(default_factory=list)
+    last_id: str | None = None
+
+
+def orphans(queryset: QuerySet | None = None) -> QuerySet:
+    """`queryset` narrowed to images whose reference count is zero (an indexed lookup)."""
+    queryset = UploadedImage.objects.all() if queryset is None else queryset
+    return queryset.filter(reference_count=0)
+
+
+def _unreferenced(queryset: QuerySet) -> QuerySet:
+    """`queryset` narrowed to images no question or answer refers to, checked against the rows themselves."""
+    from quizzes.models import Answer, Question
+
+    return queryset.filter(
+        ~Exists(Question.objects.filter(image_upload=OuterRef("pk"))),
+        ~Exists(Answer.objects.filter(image_upload=OuterRef("pk"))),
+    )
+
+
+def orphan_batches(queryset: QuerySet, *, batch_size: int, after=None) -> Iterator[list]:
+    """Primary keys of `queryset`'s orphans, `batch_size` at a time, in key order after `after`."""
+    queryset = orphans(queryset).order_by("pk")
+    while True:
+        page = queryset if after is None else queryset.filter(pk__gt=after)
+        ids = list(page.values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return
+        yield ids
+        after = ids[-1]
+
+
+def delete_orphan_batch(ids: Iterable) -> tuple[int, list[str], int]:
+    """Delete those of `ids` that are still orphans.
+
+    Returns how many rows went, the storage names of their files and their total size.
+    """
+    with transaction.atomic():
+        rows = list(
+            _unreferenced(UploadedImage.objects.filter(pk__in=list(ids)))
+            .select_for_update()
+            .values_list("pk", "image", "variants", "file_size")
+        )
+        if not rows:
+            return 0, [], 0
+        UploadedImage.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    names = []
+    for _, image, variants, _ in rows:
+        if image:
+            names.append(image)
+        names.extend(variants.values())
+    return len(rows), names, sum(row[3] or 0 for row in rows)
+
+
+def s3_bucket(storage):
+    """The boto3 bucket behind `storage`, or None if it is not an S3 storage."""
+    try:
+        from storages.backends.s3 import S3Storage
+    except ImportError:
+        return None
+    return storage.bucket if isinstance(storage, S3Storage) else None
+
+
+def delete_files(storage, names: list[str], *, workers: int = 8) -> list[tuple[str, str]]:
+    """Delete `names` from `storage`; returns `(name, error)` for each file that could not be deleted."""
+    bucket = s3_bucket(storage)
+    if bucket is not None:
+        return _delete_s3_objects(storage, bucket, names)
+
+    def delete(name):
+        try:
+            storage.delete(name)
+        except Exception as e:
+            return name, str(e)
+        return None
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return [failure for failure in executor.map(delete, names) if failure is not None]
+
+
+def _delete_s3_objects(storage, bucket, names):
+    from storages.utils import clean_name
+
+    keys = {storage._normalize_name(clean_name(name)): name for name in names}
+    failed = []
+    key_list = list(keys)
+    for start in range(0, len(key_list), S3_DELETE_LIMIT):
+        chunk = key_list[start : start + S3_DELETE_LIMIT]
+        response = bucket.delete_objects(Delete={"Objects": [{"Key": key} for key in chunk], "Quiet": True})
+        failed.extend(
+            (keys[error["Key"]], error.get("Message", error.get("Code", ""))) for error in response.get("Errors", [])
+        )
+    return failed
+
+
+def cleanup_orphans(
+    queryset: QuerySet,
+    *,
+    batch_size: int = 500,
+    workers: int = 8,
+    max_per_second: float | None = None,
+    after=None,
+    on_batch=None,
+) -> CleanupResult:
+    """Delete the orphans in `queryset` batch by batch, calling `on_batch(result)` after each one."""
+    result = CleanupResult(last_id=after)
+    storage = UploadedImage._meta.get_field("image").storage
+    for ids in orphan_batches(queryset, batch_size=batch_size, after=after):
+        started = time.monotonic()
+        deleted, names, size = delete_orphan_batch(ids)
+        failed = delete_files(storage, names, workers=workers) if names else []
+
+        result.deleted += deleted
+        result.bytes_freed += size
+        result.files_deleted += len(names) - len(failed)
+        result.failed_files.extend(failed)
+        result.last_id = str(ids[-1])
+        if on_batch is not None:
+            on_batch(result)
+
+        if max_per_second:
+            remaining = len(ids) / max_per_second - (time.monotonic() - started)
+            if remaining > 0:
+                time.sleep(remaining)
+    return result
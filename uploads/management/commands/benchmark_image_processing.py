@@ -0,0 +1,113 @@
+"""Benchmark `process_uploaded_image` per input format.
+
+    python manage.py benchmark_image_processing                   # 4000x3000, every format
+    python manage.py benchmark_image_processing --width 6000 --height 4000 --formats JPEG PNG
+    python manage.py benchmark_image_processing --baseline main
+
+Each format and implementation runs in a forked process, so the peak RSS it
+reports (growth over the process's RSS before the first run) isn't masked by
+an earlier, hungrier run. With `--baseline`, `process_uploaded_image` as of that
+git revision is measured too (e.g. `84db630~1`, which decoded at full size
+before resizing and encoded into memory). Outputs are not compared: decoding
+JPEGs at reduced scale changes pixels slightly. No database access. Linux/macOS
+only (uses `fork` and `resource`).
+"""
+
+import io
+import multiprocessing
+import resource
+import sys
+import time
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from testownik_core.benchmarks import module_at_revision
+from uploads.utils import process_uploaded_image
+
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 85},
+    "PNG": {},
+    "GIF": {},
+    "WEBP": {"quality": 85},
+    "AVIF": {"quality": 80, "speed": 8},
+}
+
+
+def synthetic_image(width: int, height: int, image_format: str) -> bytes:
+    """A photo-sized image with some detail (gradients and a Mandelbrot set), encoded as `image_format`."""
+    size = (width, height)
+    img = Image.merge(
+        "RGB",
+        [
+            Image.linear_gradient("L").resize(size),
+            Image.effect_mandelbrot(size, (-2.0, -1.2, 1.0, 1.2), 100),
+            Image.radial_gradient("L").resize(size),
+        ],
+    )
+    if image_format == "GIF":
+        img = img.convert("P")
+    output = io.BytesIO()
+    img.save(output, format=image_format, **SAVE_OPTIONS[image_format])
+    return output.getvalue()
+
+
+def _max_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS.
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def _measure(connection, process, data, name, repeat):
+    baseline = _max_rss_bytes()
+    best = float("inf")
+    for _ in range(repeat):
+        image_file = SimpleUploadedFile(name, data)
+        started = time.perf_counter()
+        processed_file, *_ = process(image_file)
+        best = min(best, time.perf_counter() - started)
+        processed_file.close()
+    connection.send((best, _max_rss_bytes() - baseline))
+    connection.close()
+
+
+class Command(BaseCommand):
+    help = "Benchmark upload processing per input format: latency and peak memory (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--width", type=int, default=4000, help="Synthetic image width (default: 4000).")
+        parser.add_argument("--height", type=int, default=3000, help="Synthetic image height (default: 3000).")
+        parser.add_argument(
+            "--formats",
+            nargs="+",
+            default=list(SAVE_OPTIONS),
+            choices=list(SAVE_OPTIONS),
+            help="Input formats (default: all).",
+        )
+        parser.add_argument("--repeat", type=int, default=3, help="Timed runs; the best is reported (default: 3).")
+        parser.add_argument("--baseline", metavar="REVISION", help="Also measure the pipeline at this git revision.")
+
+    def handle(self, *args, **options):
+        implementations = [("current", process_uploaded_image)]
+        if options["baseline"]:
+            baseline = module_at_revision("uploads.utils", options["baseline"])
+            implementations.append((options["baseline"], baseline.process_uploaded_image))
+        context = multiprocessing.get_context("fork")
+
+        self.stdout.write(f"{options['width']}x{options['height']} synthetic images.")
+        self.stdout.write(f"  {'format':<6} {'input':>9}  {'version':<10} {'latency':>10} {'peak RSS':>10}")
+        for image_format in options["formats"]:
+            data = synthetic_image(options["width"], options["height"], image_format)
+            name = f"benchmark.{image_format.lower()}"
+            for label, process in implementations:
+                receiver, sender = context.Pipe(duplex=False)
+                worker = context.Process(target=_measure, args=(sender, process, data, name, max(1, options["repeat"])))
+                worker.start()
+                sender.close()
+                latency, peak = receiver.recv()
+                worker.join()
+                self.stdout.write(
+                    f"  {image_format:<6} {len(data) / 1024:>6.0f} KB  {label:<10} "
+                    f"{latency * 1000:>7.0f} ms {peak / (1024 * 1024):>7.1f} MB"
+                )
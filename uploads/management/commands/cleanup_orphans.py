@@ -4,6 +4,7 @@ from django.core.management.base import BaseCommand
 from django.db.models import Sum
 from django.utils import timezone
 
+from uploads.cleanup import cleanup_orphans, orphans
 from uploads.models import UploadedImage
 
 
@@ -32,6 +33,29 @@ class Command(BaseCommand):
             action="store_true",
             help="Show detailed information about each image",
         )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Images deleted per batch (default: 500)",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=8,
+            help="Parallel file deletes for storages without bulk delete (default: 8)",
+        )
+        parser.add_argument(
+            "--max-per-second",
+            type=float,
+            default=None,
+            help="Delete at most this many images per second (default: no limit)",
+        )
+        parser.add_argument(
+            "--after",
+            default=None,
+            help="Resume after this image ID, as printed by an interrupted run",
+        )
 
     def handle(self, *args, **options):
         hours = options["hours"]
@@ -43,12 +67,13 @@ class Command(BaseCommand):
         total_images = UploadedImage.objects.count()
 
         # Find orphaned images older than cutoff
-        orphans = UploadedImage.objects.filter(
-            uploaded_at__lt=cutoff, questions__isnull=True, answers__isnull=True
-        ).distinct()
+        candidates = UploadedImage.objects.filter(uploaded_at__lt=cutoff)
+        if options["after"]:
+            candidates = candidates.filter(pk__gt=options["after"])
+        orphaned = orphans(candidates)
 
-        orphan_count = orphans.count()
-        total_size = orphans.aggregate(total=Sum("file_size"))["total"] or 0
+        orphan_count = orphaned.count()
+        total_size = orphaned.aggregate(total=Sum("file_size"))["total"] or 0
 
         self.stdout.write("\nImage Statistics:")
         self.stdout.write(f"   Total images: {total_images}")
@@ -63,7 +88,7 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING("DRY RUN - No files will be deleted\n"))
 
         if verbose or dry_run:
-            for img in orphans[:50]:
+            for img in orphaned.order_by("pk")[:50]:
                 size_kb = (img.file_size or 0) / 1024
                 age_hours = (timezone.now() - img.uploaded_at).total_seconds() / 3600
                 self.stdout.write(
@@ -81,22 +106,29 @@ class Command(BaseCommand):
 
         self.stdout.write(f"\nDeleting {orphan_count} orphaned images...")
 
-        deleted_count = 0
-        failed_count = 0
+        def report(result):
+            self.stdout.write(f"  {result.deleted} deleted (resume with --after {result.last_id})")
 
-        for img in orphans:
-            try:
-                img.delete()
-                deleted_count += 1
-            except Exception as e:
-                failed_count += 1
-                self.stderr.write(self.style.ERROR(f"Failed to delete {img.id}: {e}"))
+        result = cleanup_orphans(
+            candidates,
+            batch_size=options["batch_size"],
+            workers=options["workers"],
+            max_per_second=options["max_per_second"],
+            on_batch=report,
+        )
+        for name, error in result.failed_files:
+            self.stderr.write(self.style.ERROR(f"Failed to delete {name}: {error}"))
 
         self.stdout.write(
             self.style.SUCCESS(
-                f"\nSuccessfully deleted {deleted_count} orphaned images "
-                f"({total_size / (1024 * 1024):.2f} MB reclaimed)"
+                f"\nSuccessfully deleted {result.deleted} orphaned images "
+                f"({result.bytes_freed / (1024 * 1024):.2f} MB reclaimed)"
             )
         )
-        if failed_count:
-            self.stdout.write(self.style.WARNING(f"Failed to delete {failed_count} images"))
+        if result.failed_files:
+            self.stdout.write(
+                self.style.WARNING(
+                    f"Failed to delete {len(result.failed_files)} files; their rows are gone, "
+                    "so they are left behind in storage"
+                )
+            )
@@ -0,0 +1,45 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from quizzes.models import Answer, Question
+from uploads.mirror import STALE_MIRROR, mirror_external_images
+
+
+class Command(BaseCommand):
+    """Management command to mirror the external images of existing quizzes."""
+
+    help = (
+        "Downloads the external images (image_url without an upload, or edited since mirroring) of questions and "
+        "answers, stores them as uploads and points the questions and answers at them, keeping image_url as the "
+        "source. With a task worker, quizzes are also mirrored when saved; this catches up on older ones (or on "
+        "every quiz, with the immediate task backend) and retries failed downloads."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--quiz",
+            action="append",
+            default=[],
+            help="Only mirror this quiz (repeatable; default: every quiz with external images)",
+        )
+
+    def handle(self, *args, **options):
+        if options["quiz"]:
+            quiz_ids = options["quiz"]
+        else:
+            external = STALE_MIRROR | (Q(image_upload=None) & ~Q(image_url=None) & ~Q(image_url=""))
+            quiz_ids = sorted(
+                set(Question.objects.filter(external).values_list("quiz_id", flat=True).distinct())
+                | set(Answer.objects.filter(external).values_list("question__quiz_id", flat=True).distinct()),
+                key=str,
+            )
+
+        mirrored = failed = 0
+        for quiz_id in quiz_ids:
+            result = mirror_external_images(quiz_id, retry_failed=True)
+            mirrored += result.mirrored
+            failed += len(result.failed)
+            for url, error in result.failed.items():
+                self.stderr.write(self.style.WARNING(f"  {quiz_id}: {url}: {error}"))
+
+        self.stdout.write(self.style.SUCCESS(f"Mirrored {mirrored} images; {failed} left external."))
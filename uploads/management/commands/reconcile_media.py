@@ -0,0 +1,101 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from uploads.cleanup import delete_files
+from uploads.models import UploadedImage
+from uploads.reconcile import MISSING, ORPHAN, UnsortedListing, date_prefix, modified_time, reconcile, repair_missing
+
+DELETE_BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Management command to find (and optionally repair) drift between image storage and the database."""
+
+    help = (
+        "Compares the files under images/ with the UploadedImage rows, reporting files no row refers to "
+        "and rows whose files are missing. Use --date to scan one year, month or day, e.g. to run "
+        "several scans in parallel."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--date",
+            action="append",
+            default=[],
+            help="Only scan uploads from this YYYY, YYYY-MM or YYYY-MM-DD (repeatable; default: everything)",
+        )
+        parser.add_argument(
+            "--fix",
+            action="store_true",
+            help="Delete orphaned files, forget missing variants and mark images with missing files as failed",
+        )
+        parser.add_argument(
+            "--min-age-hours",
+            type=float,
+            default=1,
+            help="Leave orphaned files younger than this alone; uploads store the file before the row (default: 1)",
+        )
+
+    def handle(self, *args, **options):
+        try:
+            prefixes = [date_prefix(value) for value in options["date"]] or ["images/"]
+        except ValueError as e:
+            raise CommandError(str(e)) from e
+        fix = options["fix"]
+        cutoff = timezone.now() - timedelta(hours=options["min_age_hours"])
+        storage = UploadedImage._meta.get_field("image").storage
+
+        counts = {ORPHAN: 0, MISSING: 0}
+        skipped = deleted = 0
+        failed = []
+        pending = []
+
+        def flush():
+            nonlocal deleted
+            errors = delete_files(storage, pending)
+            deleted += len(pending) - len(errors)
+            failed.extend(errors)
+            pending.clear()
+
+        for prefix in prefixes:
+            try:
+                for drift in reconcile(storage, prefix):
+                    counts[drift.kind] += 1
+                    if drift.kind == ORPHAN:
+                        self.stdout.write(f"  orphaned file: {drift.name}")
+                        if not fix:
+                            continue
+                        if modified_time(storage, drift) > cutoff:
+                            skipped += 1
+                            continue
+                        pending.append(drift.name)
+                        if len(pending) >= DELETE_BATCH_SIZE:
+                            flush()
+                    else:
+                        what = f"variant {drift.variant}" if drift.variant else "image"
+                        self.stdout.write(f"  missing file: {drift.name} ({what} of {drift.image_id})")
+                        if fix:
+                            repair_missing(drift)
+            except UnsortedListing as e:
+                raise CommandError(str(e)) from e
+        if pending:
+            flush()
+
+        self.stdout.write(f"\nOrphaned files: {counts[ORPHAN]}")
+        self.stdout.write(f"Missing files: {counts[MISSING]}")
+        if not fix:
+            if counts[ORPHAN] or counts[MISSING]:
+                self.stdout.write(self.style.WARNING("Run with --fix to repair."))
+            else:
+                self.stdout.write(self.style.SUCCESS("Storage and database agree."))
+            return
+
+        for name, error in failed:
+            self.stderr.write(self.style.ERROR(f"Failed to delete {name}: {error}"))
+        self.stdout.write(
+            self.style.SUCCESS(f"Deleted {deleted} orphaned files and repaired {counts[MISSING]} missing ones.")
+        )
+        if skipped:
+            self.stdout.write(f"Kept {skipped} orphaned files younger than {options['min_age_hours']:g}h.")
@@ -0,0 +1,50 @@
+"""URLs and cache headers for stored media.
+
+Stored files never change: names are unique (`image_upload_path`, variant
+suffixes) and the storage refuses to overwrite, so caches may keep them for
+good. Serializers build their URLs through `media_urls`, which asks the storage
+and the request once per response rather than once per image.
+"""
+
+import re
+
+from django.utils.encoding import filepath_to_uri
+
+from .models import UploadedImage
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Names made only of these come out of `storage.url` unchanged after its base URL.
+_PLAIN_NAME = re.compile(r"[A-Za-z0-9/._-]+")
+_PROBE = "url-probe.avif"
+
+
+class MediaURLs:
+    """Absolute URLs of files in `storage`, derived from one sample URL."""
+
+    def __init__(self, storage, request=None):
+        self.storage = storage
+        self.request = request
+        sample = storage.url(_PROBE)
+        self.base = sample[: -len(_PROBE)] if sample.endswith(_PROBE) else None
+        if self.base is not None:
+            self.base = self._absolute(self.base)
+
+    def _absolute(self, url):
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def url(self, name: str) -> str:
+        if self.base is not None and _PLAIN_NAME.fullmatch(name):
+            return self.base + filepath_to_uri(name)
+        return self._absolute(self.storage.url(name))
+
+
+def media_urls(context: dict) -> MediaURLs:
+    """The `MediaURLs` of a serializer tree, kept in its (shared) context."""
+    urls = context.get("media_urls")
+    if urls is None:
+        storage = UploadedImage._meta.get_field("image").storage
+        urls = context["media_urls"] = MediaURLs(storage, context.get("request"))
+    return urls
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 04:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='variants',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text="Rendered variants: '<width>.<ext>' -> storage name."),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.6 on 2026-10-19 05:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0003_uploadedimage_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, default='', help_text='SHA-256 of the bytes as uploaded.', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='dedup_hits',
+            field=models.PositiveIntegerField(default=0, help_text='Later uploads of the same bytes that were answered with this image.'),
+        ),
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='processing_ms',
+            field=models.PositiveIntegerField(blank=True, help_text='Time spent validating and encoding the upload.', null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 05:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0004_uploadedimage_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='original_size',
+            field=models.PositiveIntegerField(blank=True, help_text='Size of the upload before processing, in bytes.', null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 6.0.6 on 2026-10-19 05:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_references(apps, schema_editor):
+    UploadedImage = apps.get_model("uploads", "UploadedImage")
+
+    def references(model):
+        counts = (
+            apps.get_model("quizzes", model)
+            .objects.filter(image_upload=OuterRef("pk"))
+            .order_by()
+            .values("image_upload")
+            .annotate(count=Count("pk"))
+            .values("count")
+        )
+        return Coalesce(Subquery(counts), Value(0))
+
+    UploadedImage.objects.update(reference_count=references("Question") + references("Answer"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('quizzes', '0033_alter_answerrecord_answered_at_and_more'),
+        ('uploads', '0005_uploadedimage_original_size'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='reference_count',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False, help_text='Questions and answers showing this image (see `uploads.references`).'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
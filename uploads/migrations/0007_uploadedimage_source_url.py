@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 05:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0006_uploadedimage_reference_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='source_url',
+            field=models.URLField(blank=True, db_index=True, default='', help_text='External image this was mirrored from (see `uploads.mirror`).', max_length=512),
+        ),
+    ]
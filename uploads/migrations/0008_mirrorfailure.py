@@ -0,0 +1,27 @@
+# Generated by Django 6.0.6 on 2026-10-19 06:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0007_uploadedimage_source_url'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorFailure',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.URLField(max_length=512, unique=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('failures', models.PositiveIntegerField(default=1)),
+                ('last_failed_at', models.DateTimeField(auto_now=True)),
+                ('retry_after', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'ordering': ['-last_failed_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 06:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('uploads', '0008_mirrorfailure'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadedimage',
+            name='failed_variants',
+            field=models.JSONField(blank=True, default=list, editable=False, help_text="Variants ('<width>.<ext>') that failed to render; the original is served instead."),
+        ),
+    ]
@@ -0,0 +1,347 @@
+"""Mirroring of external question/answer images into uploads.
+
+Questions and answers may hotlink an `image_url` on any host (what
+`QuizSerializer.has_external_images` flags). `mirror_external_images` downloads
+each such URL once, runs it through the upload pipeline
+(`process_uploaded_image`) and points the rows' `image_upload` at the result;
+`image_url` is kept as the provenance of the image, and the upload remembers
+it in `source_url` so other quizzes showing the same URL reuse it. URLs that
+can't be fetched or aren't images are left as they are and recorded as a
+`MirrorFailure`; saves don't try them again until its `retry_after` (backing
+off from `MIRROR_RETRY_BASE` to `MIRROR_RETRY_MAX`).
+
+Saves only enqueue `mirror_external_images_task` when a task worker runs it:
+with the immediate task backend the downloads would hold up the request, so
+`manage.py mirror_external_images` (e.g. from cron) mirrors the quizzes then.
+
+Downloads go through `fetch_image`: HTTP(S) only, at most `MAX_FILE_SIZE`
+bytes and `MIRROR_TIMEOUT_SECONDS` in total (redirects included), and only to
+public addresses, connecting to the address that was checked so the name
+can't be re-resolved elsewhere in between.
+"""
+
+import ipaddress
+import logging
+import os
+import socket
+import ssl
+import time
+from dataclasses import dataclass, field
+from datetime import timedelta
+from urllib.parse import unquote, urljoin, urlparse
+
+import urllib3
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.text import Truncator
+from requests.certs import where as default_ca_bundle_path
+from urllib3.exceptions import HTTPError
+
+from . import variants
+from .models import MirrorFailure, UploadedImage
+from .utils import MAX_FILE_SIZE, content_hash, process_uploaded_image
+
+logger = logging.getLogger(__name__)
+
+MIRROR_TIMEOUT_SECONDS = 10
+MIRROR_MAX_REDIRECTS = 3
+MIRROR_CHUNK_SIZE = 64 * 1024
+MIRROR_RETRY_BASE = timedelta(hours=1)
+MIRROR_RETRY_MAX = timedelta(days=7)
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+
+
+class MirrorError(ValueError):
+    pass
+
+
+@dataclass
+class MirrorResult:
+    mirrored: int = 0  # URLs now served from uploads.
+    failed: dict[str, str] = field(default_factory=dict)  # URL -> why it was left external.
+    deferred: int = 0  # URLs skipped as they failed recently.
+
+
+def _is_blocked_ip(address: str) -> bool:
+    ip = ipaddress.ip_address(address)
+    return any(
+        (
+            ip.is_private,
+            ip.is_loopback,
+            ip.is_link_local,
+            ip.is_multicast,
+            ip.is_unspecified,
+            ip.is_reserved,
+        )
+    )
+
+
+def _port(parsed) -> int:
+    try:
+        port = parsed.port
+    except ValueError as exc:
+        raise MirrorError("Invalid port.") from exc
+    return port or (443 if parsed.scheme == "https" else 80)
+
+
+def _resolve(parsed) -> str:
+    """The address to connect to for `parsed`, refusing private ones (unless allowed by settings)."""
+    try:
+        infos = socket.getaddrinfo(parsed.hostname, _port(parsed), type=socket.SOCK_STREAM)
+    except OSError as exc:
+        raise MirrorError("Could not resolve the image host.") from exc
+    addresses = sorted({info[4][0] for info in infos})
+    if not addresses:
+        raise MirrorError("Could not resolve the image host.")
+    if not settings.IMAGE_MIRROR_ALLOW_PRIVATE_HOSTS and any(_is_blocked_ip(address) for address in addresses):
+        raise MirrorError("The image host resolves to a private address.")
+    return addresses[0]
+
+
+def _validate_url(url: str):
+    parsed = urlparse(url)
+    if parsed.scheme not in ("http", "https") or not parsed.hostname:
+        raise MirrorError("Only HTTP(S) image URLs can be mirrored.")
+    if parsed.username or parsed.password:
+        raise MirrorError("Image URLs must not include user info.")
+    return parsed
+
+
+def _host_header(parsed) -> str:
+    hostname = parsed.hostname
+    if ":" in hostname:
+        hostname = f"[{hostname}]"
+    port = _port(parsed)
+    if port != (443 if parsed.scheme == "https" else 80):
+        return f"{hostname}:{port}"
+    return hostname
+
+
+def _request_target(parsed) -> str:
+    target = parsed.path or "/"
+    if parsed.params:
+        target = f"{target};{parsed.params}"
+    if parsed.query:
+        target = f"{target}?{parsed.query}"
+    return target
+
+
+def _pool(parsed, address: str, timeout: float):
+    options = {
+        "port": _port(parsed),
+        "timeout": urllib3.Timeout(connect=timeout, read=timeout),
+        "retries": False,
+        "maxsize": 1,
+        "block": True,
+    }
+    if parsed.scheme == "https":
+        return urllib3.HTTPSConnectionPool(
+            address,
+            cert_reqs="CERT_REQUIRED",
+            ca_certs=default_ca_bundle_path(),
+            assert_hostname=parsed.hostname,
+            server_hostname=parsed.hostname,
+            ssl_minimum_version=ssl.TLSVersion.TLSv1_2,
+            **options,
+        )
+    return urllib3.HTTPConnectionPool(address, **options)
+
+
+def _get(parsed, address: str, max_bytes: int, deadline: float) -> tuple[int, str | None, bytes]:
+    """`(status, Location, body)` of a GET of `parsed` from `address`; the body is read for 200s only."""
+    pool = _pool(parsed, address, max(deadline - time.monotonic(), 0.1))
+    response = None
+    try:
+        response = pool.urlopen(
+            "GET",
+            _request_target(parsed),
+            headers={
+                "Host": _host_header(parsed),
+                "Accept": "image/*",
+                # Images don't compress further; identity also rules out decompression bombs.
+                "Accept-Encoding": "identity",
+                "Connection": "close",
+                "User-Agent": "testownik-image-mirror/1.0",
+            },
+            preload_content=False,
+            decode_content=False,
+            redirect=False,
+            retries=False,
+        )
+        if response.status != 200:
+            return response.status, response.headers.get("location"), b""
+        content_length = response.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > max_bytes:
+            raise MirrorError("The image is too large.")
+        body = bytearray()
+        while chunk := response.read(MIRROR_CHUNK_SIZE):
+            body += chunk
+            if len(body) > max_bytes:
+                raise MirrorError("The image is too large.")
+            if time.monotonic() > deadline:
+                raise MirrorError("Downloading the image took too long.")
+        return response.status, None, bytes(body)
+    except HTTPError as exc:
+        raise MirrorError(f"Downloading the image failed: {exc}") from exc
+    finally:
+        if response is not None:
+            response.close()
+            response.release_conn()
+        pool.close()
+
+
+def fetch_image(url: str, *, max_bytes: int = MAX_FILE_SIZE, timeout: float = MIRROR_TIMEOUT_SECONDS) -> bytes:
+    """The bytes at `url`, following redirects; raises `MirrorError` past `max_bytes` or `timeout` seconds."""
+    deadline = time.monotonic() + timeout
+    for _ in range(MIRROR_MAX_REDIRECTS + 1):
+        parsed = _validate_url(url)
+        status, location, body = _get(parsed, _resolve(parsed), max_bytes, deadline)
+        if status in REDIRECT_STATUSES and location:
+            url = urljoin(url, location)
+            continue
+        if status != 200:
+            raise MirrorError(f"The image host answered {status}.")
+        return body
+    raise MirrorError("Too many redirects.")
+
+
+def _filename(url: str) -> str:
+    name = os.path.basename(unquote(urlparse(url).path)) or "image"
+    return Truncator(name).chars(255, truncate="")
+
+
+def mirror_image(url: str, uploaded_by=None) -> UploadedImage:
+    """An upload of the image at `url`: an earlier mirror or upload of it, or a new one."""
+    existing = (
+        UploadedImage.objects.filter(source_url=url, status=UploadedImage.Status.READY).order_by("uploaded_at").first()
+    )
+    if existing is not None:
+        return existing
+
+    image_file = SimpleUploadedFile(_filename(url), fetch_image(url))
+    digest = content_hash(image_file)
+    duplicate = UploadedImage.find_duplicate(digest, uploaded_by=uploaded_by)
+    if duplicate is not None:
+        return duplicate
+
+    started = time.perf_counter()
+    processed_file, width, height, content_type, fallback_ext = process_uploaded_image(image_file)
+    uploaded_image = UploadedImage.objects.create(
+        image=processed_file,
+        original_filename=image_file.name,
+        content_type=content_type,
+        file_size=processed_file.size,
+        original_size=image_file.size,
+        width=width,
+        height=height,
+        uploaded_by=uploaded_by,
+        content_hash=digest,
+        source_url=url,
+        processing_ms=round((time.perf_counter() - started) * 1000),
+    )
+    if fallback_ext:
+        variants.store_fallback(uploaded_image, image_file, fallback_ext)
+    return uploaded_image
+
+
+# Rows still pointing at the mirror of a URL they no longer show (`image_url` was edited since).
+STALE_MIRROR = (
+    Q(image_upload__isnull=False)
+    & ~Q(image_upload__source_url="")
+    & ~Q(image_upload__source_url=Coalesce(F("image_url"), Value("")))
+)
+
+
+def _quiz_rows(quiz_id):
+    from quizzes.models import Answer, Question
+
+    return Question.objects.filter(quiz_id=quiz_id), Answer.objects.filter(question__quiz_id=quiz_id)
+
+
+def _external(quiz_id):
+    """Querysets of the quiz's questions and of its answers showing an `image_url` not served from uploads."""
+    return [
+        rows.exclude(image_url=None).exclude(image_url="").filter(Q(image_upload=None) | STALE_MIRROR)
+        for rows in _quiz_rows(quiz_id)
+    ]
+
+
+def external_image_urls(quiz_id) -> set[str]:
+    return {url for rows in _external(quiz_id) for url in rows.values_list("image_url", flat=True).distinct()}
+
+
+def _due(urls) -> set[str]:
+    """`urls` without the ones that failed recently."""
+    return set(urls) - set(
+        MirrorFailure.objects.filter(url__in=urls, retry_after__gt=timezone.now()).values_list("url", flat=True)
+    )
+
+
+def _record_failure(url: str, error: str):
+    failure = MirrorFailure.objects.filter(url=url).first() or MirrorFailure(url=url, failures=0)
+    failure.failures += 1
+    failure.error = error
+    failure.retry_after = timezone.now() + min(MIRROR_RETRY_BASE * 2 ** (failure.failures - 1), MIRROR_RETRY_MAX)
+    failure.save()
+
+
+def release_dropped_mirrors(quiz_id) -> None:
+    """Unlink mirrors from the rows whose image was removed since it was mirrored."""
+    for rows in _quiz_rows(quiz_id):
+        rows.filter(STALE_MIRROR).filter(Q(image_url=None) | Q(image_url="")).update(image_upload=None)
+
+
+def schedule_mirror(quiz_id) -> None:
+    """Enqueue `mirror_external_images_task` for the quiz on commit, if a worker runs it and any URL is due."""
+    from task_queue.backends import runs_inline
+
+    from .tasks import mirror_external_images_task
+
+    release_dropped_mirrors(quiz_id)
+    if runs_inline(mirror_external_images_task) or not _due(external_image_urls(quiz_id)):
+        return
+    quiz_id = str(quiz_id)
+    transaction.on_commit(lambda: mirror_external_images_task.enqueue(quiz_id))
+
+
+def mirror_external_images(quiz_id, *, retry_failed=False) -> MirrorResult:
+    """
+    Mirror the external images of the quiz and point its questions and answers at the uploads.
+
+    URLs that failed recently are skipped unless `retry_failed`.
+    """
+    from quizzes.models import Quiz
+
+    result = MirrorResult()
+    quiz = Quiz.objects.select_related("creator").filter(pk=quiz_id).first()
+    if quiz is None:
+        return result
+
+    release_dropped_mirrors(quiz.pk)
+    urls = external_image_urls(quiz.pk)
+    due = urls if retry_failed else _due(urls)
+    result.deferred = len(urls) - len(due)
+    for url in sorted(due):
+        try:
+            image = mirror_image(url, uploaded_by=quiz.creator)
+        except (MirrorError, ValidationError) as exc:
+            logger.info("Could not mirror %s for quiz %s: %s", url, quiz.pk, exc)
+            result.failed[url] = str(exc)
+            _record_failure(url, str(exc))
+            continue
+        except Exception as exc:
+            logger.exception("Mirroring %s for quiz %s failed", url, quiz.pk)
+            result.failed[url] = str(exc)
+            _record_failure(url, str(exc))
+            continue
+        MirrorFailure.objects.filter(url=url).delete()
+        # Only rows still showing the URL without its mirror: an edit meanwhile wins.
+        for rows in _external(quiz.pk):
+            rows.filter(image_url=url).update(image_upload=image)
+        result.mirrored += 1
+    return result
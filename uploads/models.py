@@ -27,6 +27,11 @@ class UploadedImage(models.Model):
     can reference the same image.
     """
 
+    class Status(models.TextChoices):
+        PENDING = "pending", "Pending"
+        READY = "ready", "Ready"
+        FAILED = "failed", "Failed"
+
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     image = models.ImageField(upload_to=image_upload_path)
     original_filename = models.CharField(max_length=255, db_index=True)
@@ -38,6 +43,47 @@ class UploadedImage(models.Model):
         settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.SET_NULL, related_name="uploaded_images"
     )
     uploaded_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    status = models.CharField(
+        max_length=16,
+        choices=Status.choices,
+        default=Status.READY,
+        help_text="Pending while a background upload still holds the raw file.",
+    )
+    processing_error = models.TextField(blank=True, default="")
+    content_hash = models.CharField(
+        max_length=64, blank=True, default="", db_index=True, help_text="SHA-256 of the bytes as uploaded."
+    )
+    source_url = models.URLField(
+        max_length=512,
+        blank=True,
+        default="",
+        db_index=True,
+        help_text="External image this was mirrored from (see `uploads.mirror`).",
+    )
+    original_size = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Size of the upload before processing, in bytes."
+    )
+    processing_ms = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Time spent validating and encoding the upload."
+    )
+    reference_count = models.PositiveIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        help_text="Questions and answers showing this image (see `uploads.references`).",
+    )
+    dedup_hits = models.PositiveIntegerField(
+        default=0, help_text="Later uploads of the same bytes that were answered with this image."
+    )
+    variants = models.JSONField(
+        default=dict, blank=True, editable=False, help_text="Rendered variants: '<width>.<ext>' -> storage name."
+    )
+    failed_variants = models.JSONField(
+        default=list,
+        blank=True,
+        editable=False,
+        help_text="Variants ('<width>.<ext>') that failed to render; the original is served instead.",
+    )
 
     class Meta:
         ordering = ["-uploaded_at"]
@@ -50,15 +96,65 @@ class UploadedImage(models.Model):
     def __str__(self):
         return f"{self.original_filename} ({self.id})"
 
+    @classmethod
+    def find_duplicate(cls, content_hash, uploaded_by):
+        """
+        An earlier upload of the same bytes by `uploaded_by` (that didn't fail processing), counting the hit.
+
+        Only the uploader's own images are reused, so nobody learns what others uploaded. An orphan
+        handed out again gets its `uploaded_at` refreshed, restarting the grace period `cleanup_orphans`
+        gives new uploads before they are attached to a question.
+        """
+        duplicate = (
+            cls.objects.filter(content_hash=content_hash, uploaded_by=uploaded_by)
+            .exclude(status=cls.Status.FAILED)
+            .order_by("uploaded_at")
+            .first()
+        )
+        if duplicate is not None:
+            now = timezone.now()
+            cls.objects.filter(pk=duplicate.pk).update(
+                dedup_hits=models.F("dedup_hits") + 1,
+                uploaded_at=models.Case(
+                    models.When(reference_count=0, then=models.Value(now)), default=models.F("uploaded_at")
+                ),
+            )
+            duplicate.dedup_hits += 1
+            if duplicate.reference_count == 0:
+                duplicate.uploaded_at = now
+        return duplicate
+
+    @property
+    def is_ready(self):
+        return self.status == self.Status.READY
+
     @property
     def is_orphan(self):
         """Check if this image has no references."""
-        return not self.questions.exists() and not self.answers.exists()
+        return self.reference_count == 0
 
     def delete(self, *args, **kwargs):
-        """Delete the file from storage when model is deleted."""
+        """Delete the file (and its rendered variants) from storage when model is deleted."""
         image = self.image
         if image:
+            for name in self.variants.values():
+                image.storage.delete(name)
             image.delete(save=False)
 
         super().delete(*args, **kwargs)
+
+
+class MirrorFailure(models.Model):
+    """An external image URL that couldn't be mirrored (see `uploads.mirror`); saves skip it until `retry_after`."""
+
+    url = models.URLField(max_length=512, unique=True)
+    error = models.TextField(blank=True, default="")
+    failures = models.PositiveIntegerField(default=1)
+    last_failed_at = models.DateTimeField(auto_now=True)
+    retry_after = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ["-last_failed_at"]
+
+    def __str__(self):
+        return self.url
@@ -0,0 +1,90 @@
+"""Background processing of uploads (`ImageUploadView` with `?background=true`).
+
+The request only validates the upload and stores the raw file as a pending
+`UploadedImage`; `process_uploaded_image_task` later runs the expensive part
+(EXIF transpose, resize, AVIF encode) and swaps the raw file for the result.
+Uploads that fail processing keep their row (and error) for polling, but not
+the raw file.
+"""
+
+import logging
+import time
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from . import variants
+from .models import UploadedImage
+from .utils import FORMAT_TO_MIME, process_uploaded_image, validate_uploaded_image
+
+logger = logging.getLogger(__name__)
+
+
+def store_pending_image(image_file, *, original_filename, uploaded_by, content_hash=""):
+    """Validate `image_file` and store it unprocessed; processing is enqueued on commit."""
+    from .tasks import process_uploaded_image_task
+
+    img = validate_uploaded_image(image_file)
+    width, height = img.size
+    uploaded_image = UploadedImage.objects.create(
+        image=image_file,
+        original_filename=original_filename,
+        content_type=FORMAT_TO_MIME[img.format],
+        file_size=image_file.size,
+        original_size=image_file.size,
+        width=width,
+        height=height,
+        uploaded_by=uploaded_by,
+        status=UploadedImage.Status.PENDING,
+        content_hash=content_hash,
+    )
+    image_id = str(uploaded_image.id)
+    transaction.on_commit(lambda: process_uploaded_image_task.enqueue(image_id))
+    return uploaded_image
+
+
+def process_pending_image(image_id) -> bool:
+    """Process a pending upload in place; returns whether it ended up ready."""
+    uploaded_image = UploadedImage.objects.filter(id=image_id, status=UploadedImage.Status.PENDING).first()
+    if uploaded_image is None:
+        return False
+    raw = uploaded_image.image
+    raw_name = raw.name
+
+    started = time.perf_counter()
+    try:
+        with raw.open("rb"):
+            processed_file, width, height, content_type, fallback_ext = process_uploaded_image(raw)
+    except Exception as exc:
+        if not isinstance(exc, ValidationError):
+            logger.exception("Background processing of image %s failed", image_id)
+        failed = UploadedImage.objects.filter(id=image_id, status=UploadedImage.Status.PENDING).update(
+            image="", status=UploadedImage.Status.FAILED, processing_error=str(exc)[:1000]
+        )
+        if failed:
+            # Nothing will ever serve the raw upload.
+            raw.storage.delete(raw_name)
+        return False
+
+    storage = raw.storage
+    name = storage.save(raw.field.generate_filename(uploaded_image, processed_file.name), processed_file)
+    # The raw upload doubles as the fallback of an animation re-encode.
+    fallback = {variants.variant_key(uploaded_image.width, fallback_ext): raw_name} if fallback_ext else {}
+    updated = UploadedImage.objects.filter(id=image_id, status=UploadedImage.Status.PENDING).update(
+        image=name,
+        content_type=content_type,
+        file_size=processed_file.size,
+        width=width,
+        height=height,
+        variants=fallback,
+        status=UploadedImage.Status.READY,
+        processing_error="",
+        processing_ms=round((time.perf_counter() - started) * 1000),
+    )
+    if not updated:
+        # Deleted (or processed elsewhere) meanwhile: the new file belongs to nobody.
+        storage.delete(name)
+        return False
+    if not fallback:
+        storage.delete(raw_name)
+    return True
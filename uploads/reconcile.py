@@ -0,0 +1,155 @@
+"""Reconciliation of the image storage with the `UploadedImage` rows.
+
+Both sides are streamed in name order and merge-joined, so memory stays
+constant however many files there are: the storage listing (one flat listing
+on S3, a sorted directory walk elsewhere) against every file the rows refer to
+(the image itself plus its rendered variants). Scans are limited to a prefix of
+the `images/YYYY/MM/DD/` layout of `image_upload_path`, so several of them can
+run side by side, e.g. one per month.
+
+The merge relies on every file of a row sharing its image name's root
+(`<id>.avif`, `<id>-640w.jpg`) and on those roots never being prefixes of one
+another, which the layout guarantees; a listing that comes back out of order
+raises `UnsortedListing` instead of reporting bogus drift.
+"""
+
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime
+
+from django.db import connection, transaction
+from django.db.models import F, QuerySet
+from django.db.models.functions import Collate
+
+from .cleanup import s3_bucket
+from .models import UploadedImage
+
+ORPHAN = "orphan"
+MISSING = "missing"
+
+# Collations that compare bytewise, i.e. in the order storages list names.
+BINARY_COLLATIONS = {"postgresql": "C", "mysql": "utf8mb4_bin"}
+
+
+class UnsortedListing(Exception):
+    pass
+
+
+@dataclass
+class Drift:
+    kind: str  # ORPHAN: a file no row refers to; MISSING: a row's file that isn't stored.
+    name: str
+    image_id: str | None = None
+    variant: str | None = None  # `UploadedImage.variants` key, for a missing variant.
+    modified: datetime | None = None  # From the listing, where it comes for free.
+
+
+def date_prefix(value: str) -> str:
+    """`2025`, `2025-01` or `2025-01-31` -> the matching `images/...` directory."""
+    parts = value.split("-")
+    if not 1 <= len(parts) <= 3 or not all(part.isdigit() for part in parts):
+        raise ValueError(f"Expected YYYY, YYYY-MM or YYYY-MM-DD, got {value!r}.")
+    if [len(part) for part in parts] != [4, 2, 2][: len(parts)]:
+        raise ValueError(f"Expected YYYY, YYYY-MM or YYYY-MM-DD, got {value!r}.")
+    return "images/" + "/".join(parts) + "/"
+
+
+def storage_files(storage, prefix: str) -> Iterator[tuple[str, datetime | None]]:
+    """`(name, modified)` of every file under `prefix` (a directory, ending in `/`), in name order."""
+    bucket = s3_bucket(storage)
+    if bucket is not None:
+        yield from _s3_files(storage, bucket, prefix)
+    else:
+        yield from _walk(storage, prefix.rstrip("/"))
+
+
+def _s3_files(storage, bucket, prefix):
+    from storages.utils import clean_name
+
+    key_prefix = storage._normalize_name(clean_name(prefix))
+    if not key_prefix.endswith("/"):
+        key_prefix += "/"
+    # Keys carry the storage location; file names don't.
+    strip = len(key_prefix) - len(prefix)
+    for obj in bucket.objects.filter(Prefix=key_prefix):
+        yield obj.key[strip:], obj.last_modified
+
+
+def _walk(storage, directory):
+    try:
+        directories, files = storage.listdir(directory)
+    except FileNotFoundError:
+        return
+    # Sorting directories as `name/` puts their contents where a flat listing would.
+    entries = sorted([(f"{name}/", True) for name in directories] + [(name, False) for name in files])
+    for name, is_directory in entries:
+        path = f"{directory}/{name}"
+        if is_directory:
+            yield from _walk(storage, path.rstrip("/"))
+        else:
+            yield path, None
+
+
+def referenced_files(queryset: QuerySet) -> Iterator[tuple[str, str, str | None]]:
+    """`(name, image id, variant key)` of every file the rows in `queryset` refer to, in name order."""
+    collation = BINARY_COLLATIONS.get(connection.vendor)
+    order = Collate("image", collation) if collation else F("image")
+    rows = queryset.exclude(image="").order_by(order).values_list("pk", "image", "variants")
+    for pk, image, variants in rows.iterator(chunk_size=2000):
+        names = [(image, None), *((name, key) for key, name in variants.items())]
+        for name, key in sorted(names):
+            yield name, str(pk), key
+
+
+def _in_order(items, side):
+    previous = None
+    for item in items:
+        if previous is not None and item[0] < previous:
+            raise UnsortedListing(f"The {side} listing is not sorted: {item[0]!r} came after {previous!r}.")
+        previous = item[0]
+        yield item
+
+
+def reconcile(storage, prefix: str) -> Iterator[Drift]:
+    """Drift between `storage` and the rows for the files under `prefix`, in name order."""
+    files = _in_order(storage_files(storage, prefix), "storage")
+    references = _in_order(
+        referenced_files(UploadedImage.objects.filter(image__startswith=prefix)),
+        "database",
+    )
+    file = next(files, None)
+    reference = next(references, None)
+    while file is not None or reference is not None:
+        if reference is None or (file is not None and file[0] < reference[0]):
+            yield Drift(ORPHAN, file[0], modified=file[1])
+            file = next(files, None)
+        elif file is None or reference[0] < file[0]:
+            yield Drift(MISSING, reference[0], image_id=reference[1], variant=reference[2])
+            reference = next(references, None)
+        else:
+            reference = next(references, None)
+            # Several rows may share a file; only move on once none is left.
+            if reference is None or reference[0] != file[0]:
+                file = next(files, None)
+
+
+def modified_time(storage, drift: Drift) -> datetime:
+    if drift.modified is None:
+        drift.modified = storage.get_modified_time(drift.name)
+    return drift.modified
+
+
+def repair_missing(drift: Drift) -> None:
+    """Forget a missing variant (it is rendered again on request), or mark an image with no file as failed."""
+    with transaction.atomic():
+        image = UploadedImage.objects.select_for_update().filter(pk=drift.image_id).first()
+        if image is None:
+            return
+        if drift.variant is not None:
+            if image.variants.get(drift.variant) == drift.name:
+                del image.variants[drift.variant]
+                UploadedImage.objects.filter(pk=image.pk).update(variants=image.variants)
+        elif image.image.name == drift.name:
+            UploadedImage.objects.filter(pk=image.pk).update(
+                status=UploadedImage.Status.FAILED, processing_error="File missing from storage."
+            )
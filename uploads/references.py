@@ -0,0 +1,134 @@
+"""`UploadedImage.reference_count`: how many questions and answers show an image.
+
+The count is recomputed (not incremented) for the images a write touched, so
+a missed write is corrected by the next one to touch the image, and
+`refresh_reference_counts()` without arguments recounts everything. Single
+saves and deletes are covered by signals (`quizzes.signals`); bulk writes,
+which send none, by `ImageReferencingQuerySet`. Deletes of many rows at once
+(querysets, and models whose deletes cascade to them, see
+`DefersReferenceCounts`) recount the images they release once, at the end.
+"""
+
+from collections.abc import Iterable
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import UploadedImage
+
+
+def _references(model):
+    counts = (
+        model.objects.filter(image_upload=OuterRef("pk"))
+        .order_by()
+        .values("image_upload")
+        .annotate(count=Count("pk"))
+        .values("count")
+    )
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def refresh_reference_counts(image_ids: Iterable | None = None) -> None:
+    """Recount the references of `image_ids` (None: of every image)."""
+    from quizzes.models import Answer, Question
+
+    images = UploadedImage.objects.all()
+    if image_ids is not None:
+        image_ids = {image_id for image_id in image_ids if image_id is not None}
+        if not image_ids:
+            return
+        images = images.filter(pk__in=image_ids)
+    images.update(reference_count=_references(Question) + _references(Answer))
+
+
+# Images released by the deletes inside `deferred_reference_counts`, None outside of it.
+_released: ContextVar[set | None] = ContextVar("released_images", default=None)
+
+
+@contextmanager
+def deferred_reference_counts():
+    """Recount the images released by deletes inside the block once, at its end, instead of per deleted row."""
+    if _released.get() is not None:
+        yield
+        return
+    released = set()
+    token = _released.set(released)
+    try:
+        yield
+    finally:
+        _released.reset(token)
+    refresh_reference_counts(released)
+
+
+def release_references(image_ids: Iterable) -> None:
+    """Recount `image_ids` after rows showing them were deleted (at the end of `deferred_reference_counts`)."""
+    released = _released.get()
+    if released is None:
+        refresh_reference_counts(image_ids)
+    else:
+        released.update(image_ids)
+
+
+class DefersReferenceCounts:
+    """Mixin of models and querysets whose deletes may cascade to many image rows, recounting once per delete."""
+
+    def delete(self, *args, **kwargs):
+        with deferred_reference_counts():
+            return super().delete(*args, **kwargs)
+
+
+class ImageReferencingQuerySet(DefersReferenceCounts, models.QuerySet):
+    """Queryset of a model with an `image_upload` foreign key, keeping reference counts right on bulk writes."""
+
+    def _image_ids(self):
+        return set(self.exclude(image_upload=None).values_list("image_upload_id", flat=True))
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = super().bulk_create(objs, *args, **kwargs)
+        refresh_reference_counts(obj.image_upload_id for obj in objs)
+        return objs
+
+    def bulk_update(self, objs, fields, *args, **kwargs):
+        if "image_upload" not in fields and "image_upload_id" not in fields:
+            return super().bulk_update(objs, fields, *args, **kwargs)
+        objs = list(objs)
+        image_ids = self.filter(pk__in=[obj.pk for obj in objs])._image_ids()
+        rows = super().bulk_update(objs, fields, *args, **kwargs)
+        refresh_reference_counts(image_ids | {obj.image_upload_id for obj in objs})
+        return rows
+
+    def update(self, **kwargs):
+        if "image_upload" not in kwargs and "image_upload_id" not in kwargs:
+            return super().update(**kwargs)
+        image_ids = self._image_ids()
+        rows = super().update(**kwargs)
+        new = kwargs.get("image_upload_id", kwargs.get("image_upload"))
+        refresh_reference_counts(image_ids | {getattr(new, "pk", new)})
+        return rows
+
+
+class ImageReferencing(DefersReferenceCounts, models.Model):
+    """Base of models showing an uploaded image (`image_upload`), which count towards its `reference_count`."""
+
+    objects = ImageReferencingQuerySet.as_manager()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # What the row refers to now, so a save can also recount the image it stops showing.
+        instance._loaded_image_upload_id = instance.__dict__.get("image_upload_id")
+        return instance
+
+    @property
+    def shown_upload(self):
+        """`image_upload`, or None if it is a mirror of another URL than `image_url` (edited since mirroring)."""
+        upload = self.image_upload
+        if upload is not None and upload.source_url and upload.source_url != self.image_url:
+            return None
+        return upload
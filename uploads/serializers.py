@@ -1,19 +1,38 @@
+from django.urls import reverse
 from drf_spectacular.utils import extend_schema_field
 from rest_framework import serializers
 
+from . import variants
+from .media import media_urls
 from .models import UploadedImage
 
 
+class ImageVariantSerializer(serializers.Serializer):
+    width = serializers.IntegerField()
+    url = serializers.URLField()
+
+
+class ImageSourceSerializer(serializers.Serializer):
+    """One `<source>` of a `<picture>`: a format and its widths."""
+
+    type = serializers.CharField()
+    srcset = ImageVariantSerializer(many=True)
+
+
 class UploadedImageSerializer(serializers.ModelSerializer):
     """Serializer for uploaded image responses."""
 
     url = serializers.SerializerMethodField(read_only=True)
+    sources = serializers.SerializerMethodField(read_only=True)
 
     class Meta:
         model = UploadedImage
         fields = [
             "id",
             "url",
+            "status",
+            "processing_error",
+            "sources",
             "original_filename",
             "content_type",
             "file_size",
@@ -23,13 +42,52 @@ class UploadedImageSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = fields
 
+    def _absolute(self, url):
+        request = self.context.get("request")
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+
     @extend_schema_field(serializers.URLField(allow_null=True))
     def get_url(self, obj):
-        """Return absolute URL for the image."""
-        request = self.context.get("request")
-        if obj.image:
-            url = obj.image.url
-            if request is not None:
-                return request.build_absolute_uri(url)
-            return url
+        """Return absolute URL for the image; null until a background upload is processed."""
+        if obj.image and obj.is_ready:
+            return media_urls(self.context).url(obj.image.name)
         return None
+
+    def _variant_url(self, obj, width, ext):
+        key = variants.variant_key(width, ext)
+        name = obj.variants.get(key)
+        if name is not None:
+            return media_urls(self.context).url(name)
+        if key in obj.failed_variants:
+            # Can't be rendered: the original stands in.
+            return media_urls(self.context).url(obj.image.name)
+        # Not rendered yet: the variant view renders it on first request.
+        return self._absolute(reverse("image-variant", kwargs={"pk": obj.pk, "width": width, "ext": ext}))
+
+    @extend_schema_field(ImageSourceSerializer(many=True))
+    def get_sources(self, obj):
+        """Responsive sources, best format first; for animations, the re-encode and the original if kept."""
+        if not variants.has_variants(obj):
+            fallback = variants.animation_fallback(obj)
+            if fallback is None or not obj.is_ready:
+                return []
+            width, ext = fallback
+            return [
+                {"type": obj.content_type, "srcset": [{"width": obj.width, "url": self.get_url(obj)}]},
+                {
+                    "type": variants.content_type(ext),
+                    "srcset": [{"width": width, "url": self._variant_url(obj, width, ext)}],
+                },
+            ]
+        sources = []
+        for ext in (variants.PRIMARY_FORMAT, variants.FALLBACK_FORMAT):
+            srcset = [
+                {"width": width, "url": self._variant_url(obj, width, ext)}
+                for width in variants.variant_widths(obj, ext)
+            ]
+            if ext == variants.PRIMARY_FORMAT:
+                srcset.append({"width": obj.width, "url": self.get_url(obj)})
+            sources.append({"type": variants.content_type(ext), "srcset": srcset})
+        return sources
@@ -0,0 +1,17 @@
+from django.tasks import task
+
+from uploads.processing import process_pending_image
+
+
+# Someone is polling for the result.
+@task(queue_name="images", priority=10)
+def process_uploaded_image_task(image_id: str):
+    return process_pending_image(image_id)
+
+
+# Quizzes show the external image meanwhile.
+@task(queue_name="images", priority=-10)
+def mirror_external_images_task(quiz_id: str):
+    from uploads.mirror import mirror_external_images
+
+    return mirror_external_images(quiz_id).mirrored
@@ -1,16 +1,41 @@
+import os
+import threading
+import time
 from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from io import BytesIO, StringIO
-
-from django.core.management import call_command
-from django.test import override_settings
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test import RequestFactory, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils import timezone
 from PIL import Image
 from rest_framework import status
 from rest_framework.test import APITestCase
-
-from quizzes.models import Question, Quiz
-from uploads.models import UploadedImage
+from storages.backends.s3 import S3Storage
+
+from quizzes.models import Answer, Question, Quiz
+from quizzes.serializers import AnswerSerializer, QuestionSerializer
+from task_queue.models import QueuedTask
+from task_queue.worker import Worker
+from uploads import cleanup, reconcile, variants
+from uploads.media import MediaURLs
+from uploads.mirror import MirrorError, fetch_image, mirror_external_images, schedule_mirror
+from uploads.models import MirrorFailure, UploadedImage
+from uploads.references import refresh_reference_counts
+from uploads.serializers import UploadedImageSerializer
+from uploads.throttling import VariantRenderThrottle
+from uploads.utils import _encode_slots, encode_slot, process_uploaded_image
+from uploads.views import serve_media
 from users.models import User
 
 
@@ -74,6 +99,31 @@ def create_corrupted_image_file():
     return file
 
 
+# Queues tasks for `task_queue.worker.Worker` instead of running them on enqueue.
+WORKER_TASKS = {
+    "default": {"BACKEND": "task_queue.backends.DatabaseBackend", "QUEUES": ["default", "emails", "images"]}
+}
+
+
+class ImageStub(BaseHTTPRequestHandler):
+    """Serves `server.routes`: path -> (status, headers, body), counting requests per path."""
+
+    def do_GET(self):
+        self.server.hits[self.path] = self.server.hits.get(self.path, 0) + 1
+        code, headers, body = self.server.routes.get(self.path, (404, {}, b""))
+        self.send_response(code)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        for offset in range(0, len(body), 1024):
+            self.wfile.write(body[offset : offset + 1024])
+            time.sleep(self.server.delay)
+
+    def log_message(self, format, *args):
+        pass
+
+
 # Use local filesystem storage for tests instead of S3
 @override_settings(
     STORAGES={
@@ -128,17 +178,27 @@ class UploadFlowTests(APITestCase):
         uploaded = UploadedImage.objects.get(id=response.data["id"])
         self.assertEqual(uploaded.content_type, "image/avif")
 
-    def test_upload_animated_gif_stays_gif(self):
-        """Test that animated GIFs are NOT converted (kept as GIF)."""
+    def test_upload_animated_gif_becomes_animated_webp(self):
+        """Test that animated GIFs are re-encoded as animated WebP, keeping the GIF as a fallback."""
         img = create_animated_gif()
         response = self.client.post(self.upload_url, {"image": img}, format="multipart")
 
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
-        # Animated GIF should stay as GIF
         uploaded = UploadedImage.objects.get(id=response.data["id"])
-        self.assertEqual(uploaded.content_type, "image/gif")
-        self.assertTrue(uploaded.image.name.endswith(".gif"))
+        self.assertEqual(uploaded.content_type, "image/webp")
+        self.assertTrue(uploaded.image.name.endswith(".webp"))
+        self.assertEqual(uploaded.original_size, len(create_animated_gif().getvalue()))
+        with uploaded.image.open("rb") as stored:
+            self.assertEqual(Image.open(stored).n_frames, 2)
+
+        fallback = uploaded.variants["50.gif"]
+        with uploaded.image.storage.open(fallback) as stored:
+            self.assertEqual(stored.read(), create_animated_gif().getvalue())
+        webp, gif = response.data["sources"]
+        self.assertEqual((webp["type"], webp["srcset"][0]["url"]), ("image/webp", response.data["url"]))
+        self.assertEqual(gif["type"], "image/gif")
+        self.assertTrue(gif["srcset"][0]["url"].endswith(uploaded.image.storage.url(fallback)))
 
     def test_upload_large_image_gets_resized(self):
         """Test that images larger than 1920px are automatically resized."""
@@ -191,6 +251,115 @@ class UploadFlowTests(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
 
+    def test_upload_truncated_image(self):
+        """Test that images failing to decode are rejected, not just ones failing to open."""
+        data = create_image_file(width=400, height=300).getvalue()
+        truncated = BytesIO(data[: len(data) // 2])
+        truncated.name = "truncated.jpg"
+
+        response = self.client.post(self.upload_url, {"image": truncated}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("corrupted", response.data["error"])
+
+    @mock.patch("uploads.utils.MAX_DECODE_PIXELS", 4_000_000)
+    def test_decode_size_is_capped(self):
+        """Test big bitmaps are rejected before decoding, while big JPEGs decode at reduced scale."""
+        png = self.client.post(
+            self.upload_url, {"image": create_image_file(4000, 3000, "PNG", "big.png")}, format="multipart"
+        )
+        self.assertEqual(png.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("megapixels", png.data["error"])
+
+        jpeg = self.client.post(self.upload_url, {"image": create_image_file(4000, 3000)}, format="multipart")
+        self.assertEqual(jpeg.status_code, status.HTTP_201_CREATED)
+        self.assertEqual((jpeg.data["width"], jpeg.data["height"]), (1920, 1440))
+
+    @mock.patch("uploads.utils.SPOOL_MAX_MEMORY", 1)
+    def test_processed_image_is_spooled_to_disk(self):
+        processed_file, *_ = process_uploaded_image(SimpleUploadedFile("test.jpg", create_image_file().getvalue()))
+
+        self.assertTrue(processed_file.file._rolled)
+        self.assertEqual(processed_file.size, len(processed_file.read()))
+
+    @override_settings(IMAGE_ENCODE_CONCURRENCY=1)
+    def test_encodes_are_limited_per_process(self):
+        with encode_slot():
+            self.assertFalse(_encode_slots(1).acquire(blocking=False))
+        self.assertTrue(_encode_slots(1).acquire(blocking=False))
+        _encode_slots(1).release()
+
+    @mock.patch("uploads.utils.MAX_ANIMATION_DIMENSION", 20)
+    def test_large_animation_is_downscaled(self):
+        response = self.client.post(self.upload_url, {"image": create_animated_gif()}, format="multipart")
+
+        self.assertEqual((response.data["width"], response.data["height"]), (20, 20))
+        uploaded = UploadedImage.objects.get(id=response.data["id"])
+        self.assertEqual(set(uploaded.variants), {"50.gif"})
+
+    @mock.patch("uploads.utils.MAX_ANIMATION_FRAMES", 1)
+    def test_animation_frame_limit(self):
+        response = self.client.post(self.upload_url, {"image": create_animated_gif()}, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Too many frames", response.data["error"])
+
+    def test_background_animation_keeps_the_raw_upload_as_fallback(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"{self.upload_url}?background=true", {"image": create_animated_gif()}, format="multipart"
+            )
+
+        uploaded = UploadedImage.objects.get(id=response.data["id"])
+        self.assertEqual(uploaded.content_type, "image/webp")
+        raw = uploaded.variants["50.gif"]
+        self.assertTrue(raw.endswith(".gif"))
+        self.assertTrue(uploaded.image.storage.exists(raw))
+
+        uploaded.delete()
+        self.assertFalse(uploaded.image.storage.exists(raw))
+
+    def test_local_media_is_served_as_immutable(self):
+        uploaded = UploadedImage.objects.get(id=self._upload()["id"])
+        request = RequestFactory().get(f"/media/{uploaded.image.name}")
+
+        response = serve_media(request, uploaded.image.name, document_root=settings.MEDIA_ROOT)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_image_urls_are_built_once_per_response(self):
+        """Test serializers ask the storage for one URL, however many images they list."""
+        images = [UploadedImage.objects.get(id=self._upload(width=100 + i)["id"]) for i in range(3)]
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        question = Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=images[0])
+        question.answers.create(order=1, text="A", image_upload=images[1])
+        question.answers.create(order=2, text="B", image_upload=images[2])
+        request = RequestFactory().get("/")
+        storage = images[0].image.storage
+
+        with mock.patch.object(type(storage._wrapped), "url", autospec=True, side_effect=FileSystemStorage.url) as url:
+            data = QuestionSerializer(question, context={"request": request}).data
+            sources = UploadedImageSerializer(images, many=True, context={"request": request}).data
+
+        self.assertEqual(url.call_count, 2)  # One per serializer, not one per image.
+        self.assertEqual(data["image"], request.build_absolute_uri(images[0].image.url))
+        self.assertEqual(
+            [answer["image"] for answer in data["answers"]],
+            [request.build_absolute_uri(image.image.url) for image in images[1:]],
+        )
+        self.assertEqual([item["url"] for item in sources], [request.build_absolute_uri(i.image.url) for i in images])
+
+    def test_media_urls_fall_back_to_the_storage(self):
+        """Test names that may need escaping, and storages with signed URLs, go through `storage.url`."""
+        storage = S3Storage(bucket_name="images", custom_domain="cdn.example.com")
+        self.assertEqual(MediaURLs(storage).url("images/a.avif"), "https://cdn.example.com/images/a.avif")
+        self.assertEqual(MediaURLs(storage).url("images/a b.avif"), "https://cdn.example.com/images/a%20b.avif")
+
+        signed = mock.Mock(url=lambda name: f"https://s3.example.com/{name}?signature=abc")
+        self.assertIsNone(MediaURLs(signed).base)
+        self.assertEqual(MediaURLs(signed).url("images/a.avif"), "https://s3.example.com/images/a.avif?signature=abc")
+
     def test_link_image_to_question(self):
         """Test linking uploaded image to a question via API."""
         # 1. Upload
@@ -260,6 +429,8 @@ class UploadFlowTests(APITestCase):
         # 3. Verify copy-on-write behavior
         self.assertNotEqual(q1.id, new_q1.id)  # Different question
         self.assertEqual(new_q1.image_upload, upload_obj)  # Same image reference
+        upload_obj.refresh_from_db()
+        self.assertEqual(upload_obj.reference_count, 2)
         self.assertEqual(UploadedImage.objects.count(), 1)  # Still only 1 image file
 
     def test_cleanup_orphans(self):
@@ -318,6 +489,182 @@ class UploadFlowTests(APITestCase):
         # Should still exist
         self.assertTrue(UploadedImage.objects.filter(id=image_id).exists())
 
+    def _backdated_upload(self, **kwargs):
+        uploaded = UploadedImage.objects.get(id=self._upload(**kwargs)["id"])
+        UploadedImage.objects.filter(id=uploaded.id).update(uploaded_at=timezone.now() - timedelta(hours=48))
+        return uploaded
+
+    def test_cleanup_runs_in_batches_and_can_resume(self):
+        """Test cleanup deletes orphans batch by batch, files included, and reports where to resume."""
+        images = sorted((self._backdated_upload(width=100 + i) for i in range(3)), key=lambda image: image.pk)
+        storage = images[0].image.storage
+        variant = variants.ensure_variant(images[1], 100, "jpg")
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=images[2])
+
+        out = StringIO()
+        call_command("cleanup_orphans", "--after", str(images[0].pk), "--batch-size", "1", stdout=out)
+
+        self.assertEqual(set(UploadedImage.objects.values_list("pk", flat=True)), {images[0].pk, images[2].pk})
+        self.assertFalse(storage.exists(images[1].image.name))
+        self.assertFalse(storage.exists(variant))
+        self.assertIn(f"resume with --after {images[1].pk}", out.getvalue())
+
+        call_command("cleanup_orphans", stdout=StringIO())
+        self.assertEqual(list(UploadedImage.objects.values_list("pk", flat=True)), [images[2].pk])
+        self.assertFalse(storage.exists(images[0].image.name))
+
+    def test_cleanup_skips_images_referenced_meanwhile(self):
+        image = self._backdated_upload()
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=image)
+
+        self.assertEqual(cleanup.delete_orphan_batch([image.pk]), (0, [], 0))
+        self.assertTrue(image.image.storage.exists(image.image.name))
+
+    def test_cleanup_uses_s3_multi_object_delete(self):
+        storage = S3Storage(bucket_name="images", location="media")
+        storage._bucket = mock.Mock()
+        storage._bucket.delete_objects.side_effect = [{}, {"Errors": [{"Key": "media/b.avif", "Message": "Denied"}]}]
+        names = [f"{index}.avif" for index in range(cleanup.S3_DELETE_LIMIT)] + ["b.avif"]
+
+        failed = cleanup.delete_files(storage, names)
+
+        self.assertEqual(storage._bucket.delete_objects.call_count, 2)
+        first_request = storage._bucket.delete_objects.call_args_list[0].kwargs["Delete"]
+        self.assertEqual(first_request["Objects"][0], {"Key": "media/0.avif"})
+        self.assertEqual(failed, [("b.avif", "Denied")])
+
+    def test_reconcile_media_reports_and_repairs_drift(self):
+        """Test the scan finds unreferenced files and rows without files, and --fix repairs both."""
+        kept, broken = (UploadedImage.objects.get(id=self._upload(width=1600 + i, height=800)["id"]) for i in range(2))
+        storage = kept.image.storage
+        kept_variant = variants.ensure_variant(kept, 320, "jpg")
+        lost_variant = variants.ensure_variant(kept, 640, "jpg")
+        storage.delete(lost_variant)
+        storage.delete(broken.image.name)
+        stray = storage.save(f"{os.path.dirname(kept.image.name)}/stray.avif", ContentFile(b"x"))
+
+        out = StringIO()
+        call_command("reconcile_media", stdout=out)
+
+        self.assertIn(f"orphaned file: {stray}", out.getvalue())
+        self.assertIn(f"missing file: {lost_variant} (variant 640.jpg of {kept.id})", out.getvalue())
+        self.assertIn(f"missing file: {broken.image.name} (image of {broken.id})", out.getvalue())
+        self.assertNotIn(kept_variant, out.getvalue())
+        self.assertTrue(storage.exists(stray))
+
+        call_command("reconcile_media", "--fix", "--min-age-hours", "0", stdout=StringIO())
+
+        self.assertFalse(storage.exists(stray))
+        kept.refresh_from_db()
+        self.assertEqual(kept.variants, {"320.jpg": kept_variant})
+        broken.refresh_from_db()
+        self.assertEqual(broken.status, UploadedImage.Status.FAILED)
+        out = StringIO()
+        call_command("reconcile_media", stdout=out)
+        self.assertIn(f"missing file: {broken.image.name}", out.getvalue())
+        self.assertIn("Orphaned files: 0", out.getvalue())
+
+    def test_reconcile_media_keeps_recent_files_and_scans_by_date(self):
+        image = UploadedImage.objects.get(id=self._upload()["id"])
+        storage = image.image.storage
+        stray = storage.save(f"{os.path.dirname(image.image.name)}/stray.avif", ContentFile(b"x"))
+
+        call_command("reconcile_media", "--fix", stdout=StringIO())
+        self.assertTrue(storage.exists(stray))
+
+        out = StringIO()
+        call_command("reconcile_media", "--date", "1999-01", stdout=out)
+        self.assertIn("Storage and database agree.", out.getvalue())
+        with self.assertRaises(CommandError):
+            call_command("reconcile_media", "--date", "2025/01", stdout=StringIO())
+
+    def test_reconcile_lists_s3_in_one_pass(self):
+        storage = S3Storage(bucket_name="images", location="media")
+        storage._bucket = mock.Mock()
+        modified = timezone.now()
+        storage._bucket.objects.filter.return_value = [
+            mock.Mock(key="media/images/2025/01/31/a.avif", last_modified=modified)
+        ]
+
+        files = list(reconcile.storage_files(storage, "images/2025/01/"))
+
+        storage._bucket.objects.filter.assert_called_once_with(Prefix="media/images/2025/01/")
+        self.assertEqual(files, [("images/2025/01/31/a.avif", modified)])
+
+    def _reference_counts(self, *images):
+        return [UploadedImage.objects.get(pk=image.pk).reference_count for image in images]
+
+    def test_reference_count_follows_saves_and_deletes(self):
+        first, second = (UploadedImage.objects.get(id=self._upload(width=100 + i)["id"]) for i in range(2))
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        question = Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=first)
+        answer = question.answers.create(order=1, text="A", image_upload=first)
+        self.assertEqual(self._reference_counts(first, second), [2, 0])
+
+        question = Question.objects.get(pk=question.pk)
+        question.image_upload = second
+        question.save()
+        self.assertEqual(self._reference_counts(first, second), [1, 1])
+
+        answer.delete()
+        self.assertEqual(self._reference_counts(first, second), [0, 1])
+        self.assertTrue(UploadedImage.objects.get(pk=first.pk).is_orphan)
+
+        quiz.delete()
+        self.assertEqual(self._reference_counts(first, second), [0, 0])
+
+    def test_reference_count_follows_bulk_writes(self):
+        first, second = (UploadedImage.objects.get(id=self._upload(width=100 + i)["id"]) for i in range(2))
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+
+        questions = Question.objects.bulk_create(
+            [Question(quiz=quiz, order=order, text="Q", image_upload=first) for order in range(3)]
+        )
+        self.assertEqual(self._reference_counts(first, second), [3, 0])
+
+        questions[0].image_upload = second
+        Question.objects.bulk_update(questions[:1], ["image_upload"])
+        self.assertEqual(self._reference_counts(first, second), [2, 1])
+
+        Question.objects.filter(pk=questions[1].pk).update(image_upload=None)
+        self.assertEqual(self._reference_counts(first, second), [1, 1])
+
+        Question.objects.filter(pk__in=[questions[0].pk, questions[2].pk]).delete()
+        self.assertEqual(self._reference_counts(first, second), [0, 0])
+
+    def test_cascading_deletes_recount_once(self):
+        """Test deleting a quiz recounts its images in one statement, however many rows show them."""
+        images = [UploadedImage.objects.get(id=self._upload(width=100 + i)["id"]) for i in range(2)]
+
+        def delete_quiz(questions):
+            quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+            for order in range(questions):
+                question = Question.objects.create(quiz=quiz, order=order, text="Q", image_upload=images[0])
+                question.answers.create(order=1, text="A", image_upload=images[1])
+            with CaptureQueriesContext(connection) as queries:
+                quiz.delete()
+            return [query["sql"] for query in queries if "reference_count" in query["sql"]]
+
+        self.assertEqual(len(delete_quiz(2)), 1)
+        self.assertEqual(len(delete_quiz(10)), 1)
+        self.assertEqual(self._reference_counts(*images), [0, 0])
+
+    def test_reference_counts_can_be_recounted(self):
+        image = UploadedImage.objects.get(id=self._upload()["id"])
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=image)
+        UploadedImage.objects.update(reference_count=0)
+
+        # A stale count never gets a referenced image deleted...
+        call_command("cleanup_orphans", "--hours", "0", stdout=StringIO())
+        self.assertTrue(UploadedImage.objects.filter(pk=image.pk).exists())
+
+        # ...and recounting corrects it.
+        refresh_reference_counts()
+        self.assertEqual(self._reference_counts(image), [1])
+
     def test_image_upload_priority_over_url(self):
         """Test that image_upload takes priority over image_url in the property."""
         img = create_image_file()
@@ -336,3 +683,469 @@ class UploadFlowTests(APITestCase):
         # Upload should take priority
         self.assertIn(upload_obj.image.url, question.image)
         self.assertNotIn("external.com", question.image)
+
+    def _upload(self, **kwargs):
+        response = self.client.post(self.upload_url, {"image": create_image_file(**kwargs)}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def test_upload_lists_responsive_sources(self):
+        """Test static uploads list AVIF and JPEG widths, pointing at the lazy variant view."""
+        data = self._upload(width=1600, height=800)
+
+        avif, jpeg = data["sources"]
+        self.assertEqual(avif["type"], "image/avif")
+        self.assertEqual([item["width"] for item in avif["srcset"]], [320, 640, 1280, 1600])
+        self.assertEqual(avif["srcset"][-1]["url"], data["url"])
+        self.assertEqual(jpeg["type"], "image/jpeg")
+        self.assertEqual([item["width"] for item in jpeg["srcset"]], [320, 640, 1280, 1600])
+        variant_url = reverse("image-variant", kwargs={"pk": data["id"], "width": 640, "ext": "jpg"})
+        self.assertTrue(jpeg["srcset"][1]["url"].endswith(variant_url))
+        self.assertEqual(UploadedImage.objects.get(id=data["id"]).variants, {})
+
+    def test_small_and_animated_images_have_no_smaller_variants(self):
+        """Test variants are never upscaled, and animations only list the re-encode and the original."""
+        small = self._upload(width=200, height=100)
+        self.assertEqual([[item["width"] for item in source["srcset"]] for source in small["sources"]], [[200], [200]])
+
+        response = self.client.post(self.upload_url, {"image": create_animated_gif()}, format="multipart")
+        self.assertEqual(
+            [[item["width"] for item in source["srcset"]] for source in response.data["sources"]], [[50], [50]]
+        )
+
+    def test_variant_is_rendered_once_and_then_linked_directly(self):
+        """Test the first request renders and stores the variant; later responses link to storage."""
+        data = self._upload(width=1600, height=800, format="PNG", name="test.png")
+        url = reverse("image-variant", kwargs={"pk": data["id"], "width": 640, "ext": "jpg"})
+
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+        uploaded = UploadedImage.objects.get(id=data["id"])
+        name = uploaded.variants["640.jpg"]
+        self.assertTrue(name.startswith(os.path.splitext(uploaded.image.name)[0]))
+        self.assertTrue(response["Location"].endswith(uploaded.image.storage.url(name)))
+        with uploaded.image.storage.open(name) as variant:
+            rendered = Image.open(variant)
+            self.assertEqual((rendered.format, rendered.size), ("JPEG", (640, 320)))
+
+        self.client.get(url)
+        self.assertEqual(UploadedImage.objects.get(id=data["id"]).variants, {"640.jpg": name})
+
+        detail = UploadedImageSerializer(uploaded).data
+        self.assertEqual(detail["sources"][1]["srcset"][1]["url"], uploaded.image.storage.url(name))
+
+    def test_failed_variant_is_recorded_and_not_rendered_again(self):
+        """Test a variant that can't be rendered redirects to the original without decoding it again."""
+        data = self._upload(width=1600, height=800)
+        url = reverse("image-variant", kwargs={"pk": data["id"], "width": 640, "ext": "jpg"})
+
+        with mock.patch("uploads.variants.render_variant", side_effect=OSError("Broken")) as render:
+            first = self.client.get(url)
+            second = self.client.get(url)
+
+        render.assert_called_once()
+        uploaded = UploadedImage.objects.get(id=data["id"])
+        self.assertEqual(uploaded.failed_variants, ["640.jpg"])
+        for response in (first, second):
+            self.assertEqual(response.status_code, status.HTTP_302_FOUND)
+            self.assertTrue(response["Location"].endswith(uploaded.image.url))
+        jpeg = UploadedImageSerializer(uploaded).data["sources"][1]
+        self.assertTrue(jpeg["srcset"][1]["url"].endswith(uploaded.image.name))
+
+    def test_variant_renders_are_throttled(self):
+        """Test only requests that render count against the render rate."""
+        cache.clear()
+        data = self._upload(width=1600, height=800)
+        self.client.force_authenticate(user=None)
+
+        def get(width):
+            return self.client.get(reverse("image-variant", kwargs={"pk": data["id"], "width": width, "ext": "jpg"}))
+
+        with mock.patch.object(VariantRenderThrottle, "rate", "1/m"):
+            self.assertEqual(get(320).status_code, status.HTTP_302_FOUND)
+            self.assertEqual(get(320).status_code, status.HTTP_302_FOUND)
+            self.assertEqual(get(640).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(list(UploadedImage.objects.get(id=data["id"]).variants), ["320.jpg"])
+
+    def test_unknown_variant_is_not_found(self):
+        data = self._upload(width=1600, height=800)
+
+        for width, ext in [(500, "jpg"), (640, "png"), (1600, "avif")]:
+            url = reverse("image-variant", kwargs={"pk": data["id"], "width": width, "ext": ext})
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_delete_removes_variants(self):
+        data = self._upload(width=1600, height=800)
+        self.client.get(reverse("image-variant", kwargs={"pk": data["id"], "width": 320, "ext": "avif"}))
+        uploaded = UploadedImage.objects.get(id=data["id"])
+        storage, name = uploaded.image.storage, uploaded.variants["320.avif"]
+        self.assertTrue(storage.exists(name))
+
+        uploaded.delete()
+
+        self.assertFalse(storage.exists(name))
+
+    def _background_upload(self, **kwargs):
+        return self.client.post(
+            f"{self.upload_url}?background=true", {"image": create_image_file(**kwargs)}, format="multipart"
+        )
+
+    def test_background_upload_is_processed_after_the_response(self):
+        """Test background uploads are stored raw and pending, then processed by the task."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self._background_upload(width=2500, height=2000, name="photo.jpg")
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data["status"], UploadedImage.Status.PENDING)
+        self.assertIsNone(response.data["url"])
+        self.assertEqual((response.data["width"], response.data["height"]), (2500, 2000))
+        pending = UploadedImage.objects.get(id=response.data["id"])
+        self.assertTrue(pending.image.name.endswith(".jpg"))
+        raw_name, storage = pending.image.name, pending.image.storage
+
+        # The immediate task backend runs the processing when the upload commits.
+        for callback in callbacks:
+            callback()
+
+        detail = self.client.get(reverse("image-detail", kwargs={"pk": response.data["id"]}))
+        self.assertEqual(detail.data["status"], UploadedImage.Status.READY)
+        self.assertEqual(detail.data["content_type"], "image/avif")
+        self.assertLessEqual(detail.data["width"], 1920)
+        self.assertTrue(detail.data["url"].endswith(".avif"))
+        self.assertFalse(storage.exists(raw_name))
+
+    def test_background_upload_failure_is_reported(self):
+        """Test a processing failure marks the upload as failed instead of leaving it pending."""
+        broken = mock.patch("uploads.processing.process_uploaded_image", side_effect=ValidationError("Broken"))
+        with broken, self.captureOnCommitCallbacks() as callbacks:
+            response = self._background_upload()
+        raw = UploadedImage.objects.get(id=response.data["id"]).image
+        raw_name, storage = raw.name, raw.storage
+        with broken:
+            for callback in callbacks:
+                callback()
+
+        detail = self.client.get(reverse("image-detail", kwargs={"pk": response.data["id"]}))
+        self.assertEqual(detail.data["status"], UploadedImage.Status.FAILED)
+        self.assertIn("Broken", detail.data["processing_error"])
+        self.assertFalse(storage.exists(raw_name))
+
+    def test_image_detail_is_only_shown_to_the_uploader(self):
+        data = self._upload()
+        self.client.force_authenticate(user=User.objects.create_user(email="other@example.com", password="password"))
+
+        response = self.client.get(reverse("image-detail", kwargs={"pk": data["id"]}))
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_background_upload_is_still_validated(self):
+        response = self.client.post(
+            f"{self.upload_url}?background=true", {"image": create_unsupported_format_file()}, format="multipart"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(UploadedImage.objects.exists())
+
+    def test_pending_image_in_question_serialization(self):
+        """Test questions don't hand out the raw file of a pending upload."""
+        upload = UploadedImage.objects.get(id=self._background_upload().data["id"])
+        quiz = Quiz.objects.create(title="Q", creator=self.user, folder=self.user.root_folder)
+        question = Question.objects.create(quiz=quiz, order=1, text="Q", image_upload=upload)
+        answer = question.answers.create(order=1, text="A", image_upload=upload)
+
+        for data in (QuestionSerializer(question).data, AnswerSerializer(answer).data):
+            self.assertIsNone(data["image"])
+            self.assertEqual(data["image_status"], UploadedImage.Status.PENDING)
+            self.assertEqual(data["image_width"], 100)
+        self.assertIsNone(question.image)
+
+    def test_duplicate_upload_returns_the_existing_image(self):
+        """Test re-uploading the same bytes answers with the first image without encoding again."""
+        first = self._upload(width=300, height=200)
+
+        with mock.patch("uploads.views.process_uploaded_image") as process:
+            response = self.client.post(
+                self.upload_url, {"image": create_image_file(width=300, height=200)}, format="multipart"
+            )
+
+        process.assert_not_called()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], first["id"])
+        self.assertEqual(response.data["url"], first["url"])
+        uploaded = UploadedImage.objects.get()
+        self.assertEqual(uploaded.dedup_hits, 1)
+        self.assertEqual(len(uploaded.content_hash), 64)
+        self.assertIsNotNone(uploaded.processing_ms)
+
+    def test_duplicate_of_another_users_upload_is_not_shared(self):
+        """Test dedup only reuses the uploader's own images, so uploads don't reveal what others uploaded."""
+        first = self._upload(width=300, height=200)
+        other = User.objects.create_user(email="other@example.com", password="password")
+        self.client.force_authenticate(user=other)
+
+        second = self._upload(width=300, height=200)
+
+        self.assertNotEqual(second["id"], first["id"])
+        self.assertEqual(UploadedImage.objects.get(id=second["id"]).uploaded_by, other)
+        self.assertFalse(UploadedImage.objects.filter(dedup_hits__gt=0).exists())
+
+    def test_duplicate_of_an_orphan_restarts_its_cleanup_grace(self):
+        """Test an old orphan handed out again isn't deleted by cleanup before it can be attached."""
+        first = self._upload(width=300, height=200)
+        UploadedImage.objects.filter(id=first["id"]).update(uploaded_at=timezone.now() - timedelta(days=2))
+
+        response = self.client.post(
+            self.upload_url, {"image": create_image_file(width=300, height=200)}, format="multipart"
+        )
+        call_command("cleanup_orphans", "--hours", "24", stdout=StringIO())
+
+        self.assertEqual(response.data["id"], first["id"])
+        self.assertTrue(UploadedImage.objects.filter(id=first["id"]).exists())
+
+    def test_different_bytes_are_not_deduplicated(self):
+        first = self._upload(width=300, height=200)
+        second = self._upload(width=300, height=201)
+
+        self.assertNotEqual(first["id"], second["id"])
+        self.assertFalse(UploadedImage.objects.filter(dedup_hits__gt=0).exists())
+
+    def test_failed_upload_is_not_reused(self):
+        """Test bytes whose background processing failed are processed again on re-upload."""
+        broken = mock.patch("uploads.processing.process_uploaded_image", side_effect=ValidationError("Broken"))
+        with broken, self.captureOnCommitCallbacks(execute=True):
+            failed = self._background_upload()
+
+        data = self._upload()
+
+        self.assertNotEqual(data["id"], failed.data["id"])
+        self.assertEqual(UploadedImage.objects.get(id=data["id"]).status, UploadedImage.Status.READY)
+
+    def test_admin_reports_dedup_savings(self):
+        self._upload(width=300, height=200)
+        self.client.post(self.upload_url, {"image": create_image_file(width=300, height=200)}, format="multipart")
+        self.client.post(self.upload_url, {"image": create_image_file(width=300, height=200)}, format="multipart")
+        admin_user = User.objects.create_superuser(email="admin@example.com", password="pass")
+        self.client.force_login(admin_user)
+
+        response = self.client.get(reverse("admin:uploads_uploadedimage_changelist"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "<strong>2</strong> duplicate uploads")
+
+
+@override_settings(
+    STORAGES={
+        "default": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+        },
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+        },
+    },
+    IMAGE_MIRROR_ALLOW_PRIVATE_HOSTS=True,
+)
+class ExternalImageMirrorTests(APITestCase):
+    """Tests for mirroring external images, against a local HTTP stub."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), ImageStub)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        self.user = User.objects.create_user(email="test@example.com", password="password")
+        self.client.force_authenticate(user=self.user)
+        self.quiz = Quiz.objects.create(title="Test Quiz", creator=self.user, folder=self.user.root_folder)
+        self.server.routes = {"/photo.png": self._image(width=300, height=200)}
+        self.server.hits = {}
+        self.server.delay = 0
+
+    @staticmethod
+    def _image(**kwargs):
+        return 200, {"Content-Type": "image/png"}, create_image_file(format="PNG", **kwargs).getvalue()
+
+    @override_settings(TASKS=WORKER_TASKS)
+    def test_saving_a_quiz_mirrors_its_external_images(self):
+        url = f"{self.base_url}/photo.png"
+        data = {
+            "title": "Test",
+            "questions": [
+                {
+                    "order": 1,
+                    "text": "Question",
+                    "image_url": url,
+                    "answers": [{"order": 1, "text": "Answer", "image_url": url, "is_correct": True}],
+                },
+                {"order": 2, "text": "Other question", "image_url": url, "answers": []},
+            ],
+        }
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.put(reverse("quiz-detail", args=[self.quiz.id]), data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.server.hits, {})
+        Worker().run(burst=True)
+
+        image = UploadedImage.objects.get()
+        self.assertEqual(image.source_url, url)
+        self.assertEqual(image.original_filename, "photo.png")
+        self.assertEqual(image.content_type, "image/avif")
+        self.assertEqual((image.width, image.height), (300, 200))
+        self.assertEqual(image.uploaded_by, self.user)
+        self.assertEqual(image.reference_count, 3)
+        self.assertEqual(self.server.hits, {"/photo.png": 1})
+        for row in [*Question.objects.filter(quiz=self.quiz), *Answer.objects.filter(question__quiz=self.quiz)]:
+            self.assertEqual(row.image_upload, image)
+            self.assertEqual(row.image_url, url)
+
+        response = self.client.get(reverse("quiz-detail", args=[self.quiz.id]))
+        self.assertFalse(response.data["has_external_images"])
+        self.assertTrue(response.data["questions"][0]["image"].endswith(image.image.name))
+
+    def test_saving_doesnt_mirror_in_the_request_with_the_immediate_backend(self):
+        data = {"quiz": str(self.quiz.id), "text": "Question", "image_url": f"{self.base_url}/photo.png", "answers": []}
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse("question-list"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.server.hits, {})
+        self.assertFalse(UploadedImage.objects.exists())
+
+    @override_settings(TASKS=WORKER_TASKS)
+    def test_failed_urls_are_not_fetched_again_until_their_retry(self):
+        url = f"{self.base_url}/missing.png"
+        Question.objects.create(quiz=self.quiz, order=1, text="Missing", image_url=url)
+
+        mirror_external_images(self.quiz.id)
+        failure = MirrorFailure.objects.get(url=url)
+        self.assertEqual(failure.failures, 1)
+        self.assertGreater(failure.retry_after, timezone.now())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            schedule_mirror(self.quiz.id)
+        self.assertFalse(QueuedTask.objects.exists())
+        self.assertEqual(mirror_external_images(self.quiz.id).deferred, 1)
+        self.assertEqual(self.server.hits, {"/missing.png": 1})
+
+        call_command("mirror_external_images", stdout=StringIO(), stderr=StringIO())
+
+        self.assertEqual(self.server.hits, {"/missing.png": 2})
+        self.assertEqual(MirrorFailure.objects.get(url=url).failures, 2)
+
+    def test_mirroring_clears_a_recorded_failure(self):
+        url = f"{self.base_url}/photo.png"
+        MirrorFailure.objects.create(url=url, retry_after=timezone.now())
+        Question.objects.create(quiz=self.quiz, order=1, text="Question", image_url=url)
+
+        self.assertEqual(mirror_external_images(self.quiz.id).mirrored, 1)
+        self.assertFalse(MirrorFailure.objects.exists())
+
+    def test_mirrors_are_reused_across_quizzes(self):
+        url = f"{self.base_url}/photo.png"
+        other = Quiz.objects.create(title="Other Quiz", creator=self.user, folder=self.user.root_folder)
+        Question.objects.create(quiz=self.quiz, order=1, text="Question", image_url=url)
+        Question.objects.create(quiz=other, order=1, text="Question", image_url=url)
+
+        mirror_external_images(self.quiz.id)
+        mirror_external_images(other.id)
+
+        self.assertEqual(self.server.hits, {"/photo.png": 1})
+        self.assertEqual(UploadedImage.objects.get().reference_count, 2)
+
+    def test_editing_a_mirrored_url_shows_and_mirrors_the_new_one(self):
+        url, new_url = f"{self.base_url}/photo.png", f"{self.base_url}/other.png"
+        self.server.routes["/other.png"] = self._image(width=120, height=80)
+        question = Question.objects.create(quiz=self.quiz, order=1, text="Question", image_url=url)
+        mirror_external_images(self.quiz.id)
+
+        response = self.client.patch(
+            reverse("question-detail", args=[question.id]), {"image_url": new_url}, format="json"
+        )
+        self.assertEqual(response.data["image"], new_url)
+        self.assertIsNone(response.data["image_width"])
+        self.assertTrue(self.client.get(reverse("quiz-detail", args=[self.quiz.id])).data["has_external_images"])
+
+        mirror_external_images(self.quiz.id)
+
+        question.refresh_from_db()
+        self.assertEqual(question.image_upload.source_url, new_url)
+        self.assertEqual(UploadedImage.objects.get(source_url=url).reference_count, 0)
+
+    def test_removing_a_mirrored_url_releases_the_mirror(self):
+        url = f"{self.base_url}/photo.png"
+        question = Question.objects.create(quiz=self.quiz, order=1, text="Question", image_url=url)
+        mirror_external_images(self.quiz.id)
+
+        response = self.client.patch(reverse("question-detail", args=[question.id]), {"image_url": ""}, format="json")
+        self.assertFalse(response.data["image"])
+
+        mirror_external_images(self.quiz.id)
+
+        question.refresh_from_db()
+        self.assertIsNone(question.image_upload)
+        self.assertEqual(UploadedImage.objects.get().reference_count, 0)
+
+    def test_failed_downloads_stay_external(self):
+        self.server.routes["/page.html"] = (200, {"Content-Type": "text/html"}, b"<html></html>")
+        Question.objects.create(quiz=self.quiz, order=1, text="Missing", image_url=f"{self.base_url}/missing.png")
+        Question.objects.create(quiz=self.quiz, order=2, text="Not an image", image_url=f"{self.base_url}/page.html")
+        Question.objects.create(quiz=self.quiz, order=3, text="Image", image_url=f"{self.base_url}/photo.png")
+
+        result = mirror_external_images(self.quiz.id)
+
+        self.assertEqual(result.mirrored, 1)
+        self.assertEqual(set(result.failed), {f"{self.base_url}/missing.png", f"{self.base_url}/page.html"})
+        self.assertEqual(Question.objects.filter(quiz=self.quiz, image_upload=None).count(), 2)
+        self.assertEqual(UploadedImage.objects.count(), 1)
+
+    def test_fetch_follows_redirects(self):
+        self.server.routes["/old.png"] = (302, {"Location": "/photo.png"}, b"")
+
+        self.assertEqual(fetch_image(f"{self.base_url}/old.png"), self.server.routes["/photo.png"][2])
+
+    def test_fetch_limits_redirects(self):
+        self.server.routes["/loop.png"] = (302, {"Location": "/loop.png"}, b"")
+
+        with self.assertRaisesMessage(MirrorError, "Too many redirects."):
+            fetch_image(f"{self.base_url}/loop.png")
+
+    def test_fetch_limits_size(self):
+        with self.assertRaisesMessage(MirrorError, "The image is too large."):
+            fetch_image(f"{self.base_url}/photo.png", max_bytes=100)
+
+    def test_fetch_limits_time(self):
+        self.server.routes["/slow.png"] = (200, {}, b"x" * 8192)
+        self.server.delay = 0.1
+
+        with self.assertRaises(MirrorError):
+            fetch_image(f"{self.base_url}/slow.png", timeout=0.3)
+
+    @override_settings(IMAGE_MIRROR_ALLOW_PRIVATE_HOSTS=False)
+    def test_fetch_refuses_private_addresses(self):
+        with self.assertRaisesMessage(MirrorError, "The image host resolves to a private address."):
+            fetch_image(f"{self.base_url}/photo.png")
+        self.assertEqual(self.server.hits, {})
+
+    def test_fetch_refuses_other_schemes(self):
+        with self.assertRaisesMessage(MirrorError, "Only HTTP(S) image URLs can be mirrored."):
+            fetch_image("ftp://localhost/photo.png")
+
+    def test_mirror_command_catches_up_on_existing_quizzes(self):
+        question = Question.objects.create(quiz=self.quiz, order=1, text="Question")
+        Answer.objects.create(question=question, order=1, text="Answer", image_url=f"{self.base_url}/photo.png")
+        out = StringIO()
+
+        call_command("mirror_external_images", stdout=out, stderr=StringIO())
+
+        self.assertIn("Mirrored 1 images; 0 left external.", out.getvalue())
+        self.assertIsNotNone(Answer.objects.get().image_upload)
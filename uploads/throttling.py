@@ -0,0 +1,13 @@
+from rest_framework.throttling import UserRateThrottle
+
+
+class VariantRenderThrottle(UserRateThrottle):
+    """
+    Rendering a variant decodes the whole original (under an encode slot), and
+    the variant view is open to anyone. Only requests that render are counted:
+    a page of images renders each variant once, so 60/min per user (or IP) is
+    plenty for real clients.
+    """
+
+    scope = "image_variant_render"
+    rate = "60/m"
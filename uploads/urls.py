@@ -1,7 +1,9 @@
 from django.urls import path
 
-from .views import ImageUploadView
+from .views import ImageDetailView, ImageUploadView, ImageVariantView
 
 urlpatterns = [
     path("upload/", ImageUploadView.as_view(), name="image-upload"),
+    path("images/<uuid:pk>/", ImageDetailView.as_view(), name="image-detail"),
+    path("images/<uuid:pk>/<int:width>.<str:ext>", ImageVariantView.as_view(), name="image-variant"),
 ]
@@ -1,13 +1,28 @@
-import io
+import functools
+import hashlib
+import math
 import os
+import tempfile
+import threading
 import uuid
+from contextlib import contextmanager
 
+from django.conf import settings
 from django.core.exceptions import ValidationError
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from PIL import Image, ImageOps
+from django.core.files.uploadedfile import UploadedFile
+from PIL import Image, ImageOps, ImageSequence
 
 MAX_DIMENSION = 1920
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10MB
+# Largest bitmap we decode (~200MB as RGBA). JPEGs count at the size `draft()` decodes them at.
+MAX_DECODE_PIXELS = 50_000_000
+# Animations are re-encoded as animated WebP, downscaled to fit MAX_ANIMATION_DIMENSION.
+MAX_ANIMATION_FRAMES = 500
+MAX_ANIMATION_DIMENSION = 800
+# Formats whose animations are kept next to the re-encode, for browsers without animated WebP.
+ANIMATION_FALLBACKS = {"GIF": "gif"}
+# Encoded output beyond this is spooled to a temporary file instead of kept in memory.
+SPOOL_MAX_MEMORY = 2 * 1024 * 1024
 
 # Map PIL format names to MIME types
 FORMAT_TO_MIME = {
@@ -21,20 +36,36 @@ FORMAT_TO_MIME = {
 Image.MAX_IMAGE_PIXELS = 178956970  # ~13400x13400 pixels
 
 
-def process_uploaded_image(image_file):
+def content_hash(image_file):
+    """SHA-256 of the uploaded bytes (before any processing), with `image_file` rewound."""
+    digest = hashlib.sha256()
+    for chunk in image_file.chunks():
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+
+@functools.cache
+def _encode_slots(limit):
+    return threading.BoundedSemaphore(limit)
+
+
+@contextmanager
+def encode_slot():
+    """Holds one of the `settings.IMAGE_ENCODE_CONCURRENCY` decode/encode slots of this process."""
+    with _encode_slots(settings.IMAGE_ENCODE_CONCURRENCY):
+        yield
+
+
+def validate_uploaded_image(image_file, verify=True):
     """
-    Validates, processes, and converts an uploaded image to AVIF format.
+    Checks size, integrity and format of an upload without decoding its pixels.
 
-    Performs:
-    1. File size validation
-    2. Image integrity verification
-    3. Format validation
-    4. EXIF orientation correction
-    5. Resize if exceeds MAX_DIMENSION
-    6. Convert to AVIF for optimal compression
+    `verify=False` skips the integrity check (which reads the whole file once more),
+    for callers that decode the image right away and report errors themselves.
 
     Returns:
-        tuple: (processed_file, width, height, content_type)
+        PIL.Image.Image: the opened (lazy) image, with `image_file` rewound
 
     Raises:
         ValidationError: If validation fails
@@ -47,67 +78,163 @@ def process_uploaded_image(image_file):
 
     try:
         img = Image.open(image_file)
-        img.verify()
+        if verify:
+            img.verify()
+            image_file.seek(0)
+            img = Image.open(image_file)
     except Exception as e:
         raise ValidationError(f"Invalid or corrupted image file: {e}")
 
-    image_file.seek(0)
-    img = Image.open(image_file)
-
     detected_format = img.format
     if detected_format not in FORMAT_TO_MIME:
         raise ValidationError(f"Unsupported image format '{detected_format}'. Allowed: JPEG, PNG, GIF, WEBP, AVIF.")
+    return img
 
-    is_animated = getattr(img, "is_animated", False) or (hasattr(img, "n_frames") and img.n_frames > 1)
-
-    img = ImageOps.exif_transpose(img) or img
 
+def _draft(img):
+    """Let JPEGs decode straight at the smallest DCT scale (1/2 to 1/8) that still covers the resize."""
     width, height = img.size
-    if not is_animated and (width > MAX_DIMENSION or height > MAX_DIMENSION):
-        img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
-        width, height = img.size
+    if img.format != "JPEG" or max(width, height) <= MAX_DIMENSION:
+        return
+    scale = MAX_DIMENSION / max(width, height)
+    img.draft(img.mode, (math.ceil(width * scale), math.ceil(height * scale)))
+
+
+def _animation_frame_size(img):
+    """Output size of an animation's frames, enforcing the animation limits."""
+    frames = getattr(img, "n_frames", 1)
+    if frames > MAX_ANIMATION_FRAMES:
+        raise ValidationError(f"Too many frames. Maximum is {MAX_ANIMATION_FRAMES}, got {frames}.")
+    scale = min(1, MAX_ANIMATION_DIMENSION / max(img.size))
+    size = (max(1, round(img.width * scale)), max(1, round(img.height * scale)))
+    if frames * size[0] * size[1] > MAX_DECODE_PIXELS:
+        raise ValidationError(
+            f"Animation too large. Maximum is {MAX_DECODE_PIXELS // 1_000_000} megapixels over all frames, "
+            f"got {frames} frames of {size[0]}×{size[1]}."
+        )
+    return size
+
+
+def _save_animation(img, size, output):
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(img):
+        durations.append(frame.info.get("duration", 100))
+        frame = frame.convert("RGBA")
+        if frame.size != size:
+            frame = frame.resize(size, Image.Resampling.LANCZOS)
+        frames.append(frame)
+    frames[0].save(
+        output,
+        format="WEBP",
+        save_all=True,
+        append_images=frames[1:],
+        duration=durations,
+        # No loop count means play once in a GIF, but forever in a WebP.
+        loop=img.info.get("loop", 1),
+        quality=80,
+        method=4,
+    )
 
-    output = io.BytesIO()
 
-    if is_animated:
-        img_format = img.format or detected_format or "GIF"
-        content_type = FORMAT_TO_MIME.get(img_format, "image/gif")
-        original_ext = os.path.splitext(image_file.name)[1].lower()
-        format_ext = f".{img_format.lower()}" if img_format else ".gif"
-        extension = original_ext if original_ext else format_ext
-
-        if img_format == "GIF":
-            img.save(output, format="GIF", save_all=True, optimize=True)
-        else:
-            img.save(output, format=img_format)
-    else:
-        content_type = "image/avif"
-        extension = ".avif"
-
-        if img.mode not in ("RGB", "RGBA"):
-            if img.mode == "P" and "transparency" in img.info:
-                img = img.convert("RGBA")
-            elif img.mode in ("LA", "L"):
-                img = img.convert("RGBA" if img.mode == "LA" else "RGB")
-            else:
-                img = img.convert("RGB")
+def process_uploaded_image(image_file):
+    """
+    Validates, processes, and converts an uploaded image to AVIF format.
 
-        img.save(
-            output,
-            format="AVIF",
-            quality=80,
-            speed=8,
-        )
+    Performs:
+    1. File size validation
+    2. Format validation
+    3. Decode (JPEGs at reduced scale when they will be downsized), capped at MAX_DECODE_PIXELS
+    4. EXIF orientation correction
+    5. Resize if exceeds MAX_DIMENSION
+    6. Convert to AVIF for optimal compression
 
+    Animations are re-encoded as animated WebP instead (frames capped at MAX_ANIMATION_FRAMES
+    and MAX_ANIMATION_DIMENSION), unless that comes out no smaller than the upload.
+
+    At most `settings.IMAGE_ENCODE_CONCURRENCY` images are decoded at once per process,
+    and large results are spooled to disk.
+
+    Returns:
+        tuple: (processed_file, width, height, content_type, fallback_ext), where `fallback_ext`
+        is the extension to keep the upload itself under as a fallback (see
+        `variants.store_fallback`), or None
+
+    Raises:
+        ValidationError: If validation fails
+    """
+    img = validate_uploaded_image(image_file, verify=False)
+    detected_format = img.format
+
+    is_animated = getattr(img, "is_animated", False) or (hasattr(img, "n_frames") and img.n_frames > 1)
+    if not is_animated:
+        _draft(img)
+    if img.width * img.height > MAX_DECODE_PIXELS:
+        raise ValidationError(
+            f"Image too large. Maximum is {MAX_DECODE_PIXELS // 1_000_000} megapixels, got {img.width}×{img.height}."
+        )
+    if is_animated:
+        frame_size = _animation_frame_size(img)
+
+    output = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)  # noqa: SIM115 - returned to the caller
+    fallback_ext = None
+    with encode_slot():
+        try:
+            if is_animated:
+                _save_animation(img, frame_size, output)
+                width, height = frame_size
+                content_type = "image/webp"
+                extension = ".webp"
+                if frame_size == img.size and output.tell() >= image_file.size:
+                    # The upload is already as compact: keep it as it is.
+                    output.seek(0)
+                    output.truncate()
+                    image_file.seek(0)
+                    for chunk in image_file.chunks():
+                        output.write(chunk)
+                    content_type = FORMAT_TO_MIME[detected_format]
+                    original_ext = os.path.splitext(image_file.name)[1].lower()
+                    extension = original_ext if original_ext else f".{detected_format.lower()}"
+                else:
+                    fallback_ext = ANIMATION_FALLBACKS.get(detected_format)
+            else:
+                img.load()
+                img = ImageOps.exif_transpose(img) or img
+
+                width, height = img.size
+                if width > MAX_DIMENSION or height > MAX_DIMENSION:
+                    img.thumbnail((MAX_DIMENSION, MAX_DIMENSION), Image.Resampling.LANCZOS)
+                    width, height = img.size
+
+                content_type = "image/avif"
+                extension = ".avif"
+
+                if img.mode not in ("RGB", "RGBA"):
+                    if img.mode == "P" and "transparency" in img.info:
+                        img = img.convert("RGBA")
+                    elif img.mode in ("LA", "L"):
+                        img = img.convert("RGBA" if img.mode == "LA" else "RGB")
+                    else:
+                        img = img.convert("RGB")
+
+                img.save(
+                    output,
+                    format="AVIF",
+                    quality=80,
+                    speed=8,
+                )
+        except (OSError, SyntaxError, EOFError) as e:
+            output.close()
+            raise ValidationError(f"Invalid or corrupted image file: {e}")
+
+    output_size = output.tell()
     output.seek(0)
-    output_size = output.getbuffer().nbytes
 
     new_filename = f"{uuid.uuid4()}{extension}"
 
     return (
-        InMemoryUploadedFile(
+        UploadedFile(
             file=output,
-            field_name="ImageField",
             name=new_filename,
             content_type=content_type,
             size=output_size,
@@ -116,4 +243,5 @@ def process_uploaded_image(image_file):
         width,
         height,
         content_type,
+        fallback_ext,
     )
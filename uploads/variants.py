@@ -0,0 +1,145 @@
+"""Responsive variants of uploaded images, rendered on first request.
+
+Every static upload can be served at a few smaller widths (`VARIANT_WIDTHS`)
+in its own format (AVIF), plus a JPEG fallback at those widths and at full
+size for browsers without AVIF support. Nothing is rendered at upload time:
+the serializer points at `image-variant` URLs until a variant exists, and
+`ensure_variant` renders it, stores it next to the original and records it in
+`UploadedImage.variants`, after which the serializer hands out the storage URL
+directly. A variant that fails to render is recorded in
+`UploadedImage.failed_variants` and never tried again: the original stands in
+for it.
+"""
+
+import io
+import os
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from .utils import encode_slot
+
+VARIANT_WIDTHS = (320, 640, 1280)
+
+# Extension -> (PIL format, MIME type, save options).
+VARIANT_FORMATS = {
+    "avif": ("AVIF", "image/avif", {"quality": 80, "speed": 8}),
+    "jpg": ("JPEG", "image/jpeg", {"quality": 82, "optimize": True, "progressive": True}),
+}
+PRIMARY_FORMAT = "avif"
+FALLBACK_FORMAT = "jpg"
+
+# Uploads kept next to their animated WebP re-encode (see `store_fallback`): extension -> MIME type.
+ANIMATION_FALLBACK_TYPES = {"gif": "image/gif"}
+
+
+def has_variants(uploaded_image) -> bool:
+    """Only static images get variants; animations are served as uploaded."""
+    return (
+        uploaded_image.is_ready
+        and bool(uploaded_image.image)
+        and uploaded_image.content_type == "image/avif"
+        and bool(uploaded_image.width)
+    )
+
+
+def variant_widths(uploaded_image, ext: str) -> list[int]:
+    """Widths offered in `ext`: the smaller sizes, plus full size for the fallback format."""
+    if not has_variants(uploaded_image):
+        return []
+    widths = [width for width in VARIANT_WIDTHS if width < uploaded_image.width]
+    if ext != PRIMARY_FORMAT:
+        widths.append(uploaded_image.width)
+    return widths
+
+
+def variant_key(width: int, ext: str) -> str:
+    return f"{width}.{ext}"
+
+
+def variant_name(original_name: str, width: int, ext: str) -> str:
+    """`images/2025/01/31/<id>.avif` -> `images/2025/01/31/<id>-640w.jpg`."""
+    root, _ = os.path.splitext(original_name)
+    return f"{root}-{width}w.{ext}"
+
+
+def render_variant(source, width: int, ext: str) -> ContentFile:
+    pil_format, _, options = VARIANT_FORMATS[ext]
+    img = Image.open(source)
+    img = ImageOps.exif_transpose(img) or img
+    if width < img.width:
+        height = max(1, round(img.height * width / img.width))
+        img = img.resize((width, height), Image.Resampling.LANCZOS)
+
+    if pil_format == "JPEG" and img.mode != "RGB":
+        # JPEG has no alpha: flatten onto white, as browsers would show it on a light page.
+        rgba = img.convert("RGBA")
+        background = Image.new("RGB", rgba.size, "white")
+        background.paste(rgba, mask=rgba.getchannel("A"))
+        img = background
+    elif pil_format == "AVIF" and img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+    output = io.BytesIO()
+    img.save(output, format=pil_format, **options)
+    return ContentFile(output.getvalue())
+
+
+def ensure_variant(uploaded_image, width: int, ext: str) -> str:
+    """Storage name of the variant, rendering and storing it first if needed."""
+    key = variant_key(width, ext)
+    if key in uploaded_image.variants:
+        return uploaded_image.variants[key]
+
+    storage = uploaded_image.image.storage
+    with encode_slot(), uploaded_image.image.open("rb") as source:
+        content = render_variant(source, width, ext)
+    name = storage.save(variant_name(uploaded_image.image.name, width, ext), content)
+
+    with transaction.atomic():
+        locked = type(uploaded_image).objects.select_for_update().only("variants").get(pk=uploaded_image.pk)
+        if key in locked.variants:
+            # Another request rendered it first; keep theirs.
+            storage.delete(name)
+        else:
+            locked.variants[key] = name
+            type(uploaded_image).objects.filter(pk=uploaded_image.pk).update(variants=locked.variants)
+    uploaded_image.variants = locked.variants
+    return locked.variants[key]
+
+
+def record_failure(uploaded_image, width: int, ext: str) -> None:
+    """Remember that the variant can't be rendered, so it is served as the original from now on."""
+    key = variant_key(width, ext)
+    with transaction.atomic():
+        locked = type(uploaded_image).objects.select_for_update().only("failed_variants").get(pk=uploaded_image.pk)
+        if key not in locked.failed_variants:
+            locked.failed_variants.append(key)
+            type(uploaded_image).objects.filter(pk=uploaded_image.pk).update(failed_variants=locked.failed_variants)
+    uploaded_image.failed_variants = locked.failed_variants
+
+
+def store_fallback(uploaded_image, original, ext: str) -> str:
+    """Keep the upload itself (say, the GIF behind an animated WebP) as a full-size variant."""
+    width = Image.open(original).width
+    original.seek(0)
+    name = uploaded_image.image.storage.save(variant_name(uploaded_image.image.name, width, ext), original)
+    uploaded_image.variants = {**uploaded_image.variants, variant_key(width, ext): name}
+    type(uploaded_image).objects.filter(pk=uploaded_image.pk).update(variants=uploaded_image.variants)
+    return name
+
+
+def animation_fallback(uploaded_image) -> tuple[int, str] | None:
+    """`(width, ext)` of the upload an animation was re-encoded from, if it was kept."""
+    for key in uploaded_image.variants:
+        width, ext = key.split(".")
+        if ext in ANIMATION_FALLBACK_TYPES:
+            return int(width), ext
+    return None
+
+
+def content_type(ext: str) -> str:
+    if ext in ANIMATION_FALLBACK_TYPES:
+        return ANIMATION_FALLBACK_TYPES[ext]
+    return VARIANT_FORMATS[ext][1]
@@ -1,16 +1,25 @@
 import logging
+import time
 
 from django.core.exceptions import ValidationError
+from django.http import Http404, HttpResponseRedirect
+from django.shortcuts import get_object_or_404
 from django.utils.text import Truncator
-from drf_spectacular.utils import OpenApiResponse, extend_schema
-from rest_framework import permissions, status
+from django.views import static
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
+from rest_framework import generics, permissions, status
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from . import variants
+from .media import IMMUTABLE_CACHE_CONTROL
 from .models import UploadedImage
+from .processing import store_pending_image
 from .serializers import UploadedImageSerializer
-from .utils import process_uploaded_image
+from .throttling import VariantRenderThrottle
+from .utils import content_hash, process_uploaded_image
 
 logger = logging.getLogger(__name__)
 
@@ -33,9 +42,22 @@ class ImageUploadView(APIView):
             "Uploads an image file (max 10MB). Supported formats: JPEG, PNG, GIF, WEBP, AVIF. "
             "Images larger than 1920px are automatically resized. "
             "Static images are converted to AVIF. "
-            "Animated GIFs are preserved in original format. "
-            "Returns the image UUID and URL for use in question/answer creation."
+            "Animations are re-encoded as animated WebP (max 500 frames, scaled to fit 800px); for GIFs the "
+            "original is kept as a fallback source. "
+            "Static images also list responsive `sources` (AVIF and JPEG widths), rendered on first request. "
+            "Returns the image UUID and URL for use in question/answer creation. "
+            "Re-uploading bytes identical to an earlier upload of yours returns that image (200) instead of a new one. "
+            "With `background=true` the image is only validated and stored: the response is 202 with "
+            "`status: pending` and no URL, processing runs in a background task, and the image can be "
+            "polled at `/images/<id>/` until it is `ready` (or `failed`)."
         ),
+        parameters=[
+            OpenApiParameter(
+                "background",
+                OpenApiTypes.BOOL,
+                description="Process the image in a background task instead of in the request.",
+            ),
+        ],
         request={
             "multipart/form-data": {
                 "type": "object",
@@ -50,7 +72,9 @@ class ImageUploadView(APIView):
             }
         },
         responses={
+            200: UploadedImageSerializer,
             201: UploadedImageSerializer,
+            202: UploadedImageSerializer,
             400: OpenApiResponse(description="Invalid file, unsupported format, or size limit exceeded"),
             401: OpenApiResponse(description="Authentication required"),
         },
@@ -64,9 +88,34 @@ class ImageUploadView(APIView):
             )
 
         image_file = request.FILES["image"]
+        original_filename = Truncator(image_file.name).chars(255, truncate="")
 
+        digest = content_hash(image_file)
+        duplicate = UploadedImage.find_duplicate(digest, uploaded_by=request.user)
+        if duplicate is not None:
+            # Same bytes as an earlier upload of this user: share it (copy-on-write) and skip the encode.
+            serializer = UploadedImageSerializer(duplicate, context={"request": request})
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        if request.query_params.get("background", "").lower() in ("1", "true"):
+            try:
+                uploaded_image = store_pending_image(
+                    image_file, original_filename=original_filename, uploaded_by=request.user, content_hash=digest
+                )
+            except ValidationError as e:
+                logger.warning(
+                    "Image validation failed for user %s: %s - %s",
+                    request.user.id,
+                    image_file.name,
+                    str(e),
+                )
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            serializer = UploadedImageSerializer(uploaded_image, context={"request": request})
+            return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
+
+        started = time.perf_counter()
         try:
-            processed_file, width, height, content_type = process_uploaded_image(image_file)
+            processed_file, width, height, content_type, fallback_ext = process_uploaded_image(image_file)
         except ValidationError as e:
             logger.warning(
                 "Image validation failed for user %s: %s - %s",
@@ -88,13 +137,96 @@ class ImageUploadView(APIView):
 
         uploaded_image = UploadedImage.objects.create(
             image=processed_file,
-            original_filename=Truncator(image_file.name).chars(255, truncate=""),
+            original_filename=original_filename,
             content_type=content_type,
             file_size=processed_file.size,
+            original_size=image_file.size,
             width=width,
             height=height,
             uploaded_by=request.user,
+            content_hash=digest,
+            processing_ms=round((time.perf_counter() - started) * 1000),
         )
+        if fallback_ext:
+            variants.store_fallback(uploaded_image, image_file, fallback_ext)
 
         serializer = UploadedImageSerializer(uploaded_image, context={"request": request})
         return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+class ImageDetailView(generics.RetrieveAPIView):
+    """
+    API endpoint for an uploaded image's metadata.
+
+    Used to poll background uploads until their `status` is `ready` (or `failed`);
+    only the uploader sees an image's metadata (and processing error).
+    """
+
+    serializer_class = UploadedImageSerializer
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_queryset(self):
+        return UploadedImage.objects.filter(uploaded_by=self.request.user)
+
+    @extend_schema(summary="Get an uploaded image", tags=["uploads"])
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
+
+class ImageVariantView(APIView):
+    """
+    Redirects to a responsive variant of an uploaded image, rendering it on first request.
+
+    Variants are listed in `UploadedImageSerializer.sources`; once rendered, the
+    serializer links to the stored file directly and this view is no longer hit.
+    """
+
+    permission_classes = [permissions.AllowAny]
+    render_throttle_classes = [VariantRenderThrottle]
+
+    @extend_schema(
+        summary="Get an image variant",
+        description="Redirects to the image resized to `width` in `ext` (avif or jpg), rendering it if needed.",
+        responses={
+            302: OpenApiResponse(description="Redirect to the stored variant"),
+            404: OpenApiResponse(description="Unknown image or variant"),
+            429: OpenApiResponse(description="Too many variants rendered recently"),
+        },
+        tags=["uploads"],
+    )
+    def get(self, request, pk, width, ext):
+        uploaded_image = get_object_or_404(UploadedImage, pk=pk)
+        if ext not in variants.VARIANT_FORMATS or width not in variants.variant_widths(uploaded_image, ext):
+            raise Http404("No such image variant.")
+
+        key = variants.variant_key(width, ext)
+        if key in uploaded_image.failed_variants:
+            # The original is still a valid (if larger) answer.
+            return HttpResponseRedirect(uploaded_image.image.url)
+        if key not in uploaded_image.variants:
+            self.check_render_throttles(request)
+
+        try:
+            name = variants.ensure_variant(uploaded_image, width, ext)
+        except Exception:
+            logger.exception("Rendering variant %s of image %s failed", key, pk)
+            variants.record_failure(uploaded_image, width, ext)
+            return HttpResponseRedirect(uploaded_image.image.url)
+        return HttpResponseRedirect(uploaded_image.image.storage.url(name))
+
+    def check_render_throttles(self, request):
+        """`check_throttles` for `render_throttle_classes`: only requests that render count against the rate."""
+        durations = [
+            throttle.wait()
+            for throttle in (cls() for cls in self.render_throttle_classes)
+            if not throttle.allow_request(request, self)
+        ]
+        if durations:
+            self.throttled(request, max(duration or 0 for duration in durations))
+
+
+def serve_media(request, path, document_root=None):
+    """`django.views.static.serve` for MEDIA_ROOT, marking files as immutable (their names are never reused)."""
+    response = static.serve(request, path, document_root=document_root)
+    response["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+    return response
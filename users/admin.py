@@ -29,6 +29,7 @@ from unfold.admin import ModelAdmin, StackedInline
 
 from oauth_integrations.models import OAuthApplicationMetadata
 
+from . import dictionaries
 from .models import CourseClassType, EmailLoginToken, StudyGroup, Term, User, UserSettings
 
 
@@ -127,10 +128,30 @@ class UserAdmin(ModelAdmin):
         self.message_user(request, f"Successfully unbanned {count} user(s).")
 
 
+class TermListFilter(admin.SimpleListFilter):
+    """Filter on a `term` foreign key, listing terms from the dictionary cache instead of a query."""
+
+    title = "term"
+    parameter_name = "term_id"
+
+    def lookups(self, request, model_admin):
+        terms = sorted(
+            dictionaries.terms.get().values(),
+            key=lambda term: (term.start_date is not None, term.start_date, term.id),
+            reverse=True,
+        )
+        return [(term.id, term.name or term.id) for term in terms]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(term_id=self.value())
+        return queryset
+
+
 @admin.register(StudyGroup)
 class StudyGroupAdmin(ModelAdmin):
     list_display = ["id", "name", "term"]
-    list_filter = ["term"]
+    list_filter = [TermListFilter]
     search_fields = ["id", "name", "term__name"]
     filter_horizontal = ["members"]
 
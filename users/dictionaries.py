@@ -0,0 +1,80 @@
+"""In-process caches of the USOS dictionary tables (`Term`, `CourseClassType`).
+
+These tables only change when `sync_usos_dictionaries` runs (plus the odd admin
+edit or a term first seen at login), yet `/grades`, Wrapped and the admin read
+them on nearly every request. Each process keeps one copy per table, tagged
+with a version number stored in Django's cache: writers call `invalidate()`,
+which bumps the version, and readers reload once they see a different one.
+With a per-process cache backend (the default `LocMemCache`) other processes
+only notice after `settings.USOS_DICTIONARY_CACHE_SECONDS`, so that bounds how
+long a stale copy can be served.
+
+Reads inside a transaction bypass the cache, so rows that may still be rolled
+back never end up in it.
+
+Cached model instances are shared between requests: treat them as read-only.
+"""
+
+import time
+from collections.abc import Callable
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+
+from users.models import CourseClassType, Term
+
+
+class DictionaryCache[T]:
+    def __init__(self, name: str, load: Callable[[], T]):
+        self.name = name
+        self._load = load
+        self._version_key = f"usos-dictionaries:{name}:version"
+        # (version, loaded at, value); replaced as a whole, so readers never see a torn entry.
+        self._entry: tuple[int, float, T] | None = None
+
+    def get(self) -> T:
+        if connection.in_atomic_block:
+            return self._load()
+        version = cache.get(self._version_key, 0)
+        entry = self._entry
+        if entry is not None and entry[0] == version and time.monotonic() - entry[1] < self._max_age():
+            return entry[2]
+        value = self._load()
+        self._entry = (version, time.monotonic(), value)
+        return value
+
+    async def aget(self) -> T:
+        entry = self._entry
+        if entry is not None and time.monotonic() - entry[1] < self._max_age():
+            version = await cache.aget(self._version_key, 0)
+            if entry[0] == version:
+                return entry[2]
+        return await sync_to_async(self.get)()
+
+    def invalidate(self) -> None:
+        self._entry = None
+        try:
+            cache.incr(self._version_key)
+        except ValueError:
+            cache.set(self._version_key, 1, timeout=None)
+
+    async def ainvalidate(self) -> None:
+        await sync_to_async(self.invalidate)()
+
+    @staticmethod
+    def _max_age() -> float:
+        return settings.USOS_DICTIONARY_CACHE_SECONDS
+
+
+def _load_terms() -> dict[str, Term]:
+    return {term.id: term for term in Term.objects.all()}
+
+
+def _load_class_types() -> dict[str, CourseClassType]:
+    return {class_type.id: class_type for class_type in CourseClassType.objects.all()}
+
+
+terms = DictionaryCache("terms", _load_terms)
+class_types = DictionaryCache("class-types", _load_class_types)
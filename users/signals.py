@@ -0,0 +1,18 @@
+from django.db.models.signals import post_delete, post_save
+
+
+def invalidate_dictionary_cache(sender, **kwargs):
+    from . import dictionaries
+    from .models import CourseClassType, Term
+
+    {Term: dictionaries.terms, CourseClassType: dictionaries.class_types}[sender].invalidate()
+
+
+def register_signals():
+    from .models import CourseClassType, Term
+
+    for model in (Term, CourseClassType):
+        for signal in (post_save, post_delete):
+            signal.connect(
+                invalidate_dictionary_cache, sender=model, dispatch_uid=f"users.invalidate_{model.__name__}_cache"
+            )
@@ -0,0 +1,72 @@
+from datetime import date
+
+from asgiref.sync import async_to_sync
+from django.db import connection, transaction
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from grades.terms import sync_terms
+from users import dictionaries
+from users.models import Term
+from wrapped import config
+
+
+def term_description(term_id, name):
+    return {
+        "id": term_id,
+        "order_key": 1,
+        "name": {"pl": name, "en": name},
+        "start_date": "2024-10-01",
+        "end_date": "2025-01-31",
+        "finish_date": "2025-02-20",
+        "is_active": True,
+    }
+
+
+# Transactional, because reads inside a transaction (as in `TestCase`) bypass the cache.
+class DictionaryCacheTests(TransactionTestCase):
+    def setUp(self):
+        Term.objects.create(id="2024/25-Z", name="Zima", start_date=date(2024, 10, 1), finish_date=date(2025, 2, 20))
+        dictionaries.terms.invalidate()
+        self.addCleanup(dictionaries.terms.invalidate)
+
+    def test_repeated_reads_hit_the_database_once(self):
+        with CaptureQueriesContext(connection) as queries:
+            first = dictionaries.terms.get()
+            second = async_to_sync(dictionaries.terms.aget)()
+            config.select_term("2024/25-Z")
+
+        self.assertEqual(len(queries), 1)
+        self.assertIs(first, second)
+
+    def test_model_writes_invalidate(self):
+        dictionaries.terms.get()
+        Term.objects.filter(id="2024/25-Z").get().delete()
+
+        self.assertEqual(dictionaries.terms.get(), {})
+
+    def test_sync_invalidates_only_on_changes(self):
+        async_to_sync(sync_terms)([term_description("2024/25-Z", "Zima")])
+        cached = dictionaries.terms.get()
+
+        async_to_sync(sync_terms)([term_description("2024/25-Z", "Zima")])
+        self.assertIs(dictionaries.terms.get(), cached)
+
+        async_to_sync(sync_terms)([term_description("2024/25-Z", "Zima 2024/25")])
+        self.assertEqual(dictionaries.terms.get()["2024/25-Z"].name, "Zima 2024/25")
+
+    def test_reads_inside_a_transaction_are_not_cached(self):
+        with transaction.atomic():
+            Term.objects.create(id="2025/26-Z", name="Zima 2025/26")
+            self.assertIn("2025/26-Z", dictionaries.terms.get())
+            transaction.set_rollback(True)
+
+        self.assertNotIn("2025/26-Z", dictionaries.terms.get())
+
+    @override_settings(USOS_DICTIONARY_CACHE_SECONDS=0)
+    def test_entries_expire(self):
+        dictionaries.terms.get()
+        # Another process wrote the row: no signal reached this one.
+        Term.objects.filter(id="2024/25-Z").update(name="Zima (zm.)")
+
+        self.assertEqual(dictionaries.terms.get()["2024/25-Z"].name, "Zima (zm.)")
@@ -0,0 +1,78 @@
+from datetime import date
+from types import SimpleNamespace
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from usos_api.models import Group
+from usos_api.models import Term as USOSTerm
+
+from users.models import StudyGroup, Term, User
+from users.views.oauth import _sync_study_groups
+
+
+def usos_group(course_unit_id, group_number, term_id, course="Analiza", class_type="Wykład"):
+    return Group(
+        course_unit_id=course_unit_id,
+        group_number=group_number,
+        term_id=term_id,
+        course_name={"pl": course, "en": course},
+        class_type={"pl": class_type, "en": class_type},
+    )
+
+
+class StudyGroupSyncTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(email="student@example.com", first_name="Student", last_name="Test")
+        Term.objects.create(id="2024/25-Z", name="Zima", start_date=date(2024, 10, 1))
+        self.get_term = mock.AsyncMock(
+            side_effect=lambda term_id: USOSTerm(
+                id=term_id, name={"pl": f"Semestr {term_id}", "en": term_id}, start_date=date(2025, 2, 21)
+            )
+        )
+        self.client = SimpleNamespace(term_service=SimpleNamespace(get_term=self.get_term))
+
+    def _sync(self, groups):
+        async_to_sync(_sync_study_groups)(self.client, self.user, groups)
+
+    def test_groups_terms_and_memberships_are_created(self):
+        self._sync(
+            [
+                usos_group("100", 1, "2024/25-Z"),
+                usos_group("200", 2, "2024/25-L", course="Algebra"),
+                usos_group("300", 3, "2024/25-L", course="Fizyka", class_type="Ćwiczenia"),
+            ]
+        )
+
+        self.get_term.assert_awaited_once_with("2024/25-L")
+        self.assertEqual(Term.objects.get(id="2024/25-L").name, "Semestr 2024/25-L")
+        self.assertEqual(
+            set(self.user.study_groups.values_list("id", "term_id")),
+            {("100-1", "2024/25-Z"), ("200-2", "2024/25-L"), ("300-3", "2024/25-L")},
+        )
+        self.assertEqual(StudyGroup.objects.get(id="300-3").name, "Fizyka - Ćwiczenia, grupa 3")
+
+    def test_existing_groups_are_updated_and_memberships_kept(self):
+        other = StudyGroup.objects.create(id="900-1", name="Stara grupa")
+        other.members.add(self.user)
+        StudyGroup.objects.create(id="100-1", name="Stara nazwa")
+
+        self._sync([usos_group("100", 1, "2024/25-Z")])
+
+        self.assertEqual(StudyGroup.objects.get(id="100-1").name, "Analiza - Wykład, grupa 1")
+        self.assertEqual(set(self.user.study_groups.values_list("id", flat=True)), {"100-1", "900-1"})
+
+    def test_query_count_does_not_grow_with_groups(self):
+        groups = [usos_group(str(100 + index), 1, "2024/25-Z") for index in range(30)]
+
+        with CaptureQueriesContext(connection) as few:
+            self._sync(groups[:2])
+        StudyGroup.objects.all().delete()
+        with CaptureQueriesContext(connection) as many:
+            self._sync(groups)
+
+        self.assertEqual(len(many), len(few))
+        self.assertEqual(self.user.study_groups.count(), 30)
+        self.get_term.assert_not_awaited()
@@ -1,6 +1,5 @@
 import logging
-import os
-from asyncio import CancelledError, sleep
+from asyncio import CancelledError, gather, sleep
 
 import dotenv
 from adrf.views import APIView as AsyncAPIView
@@ -11,10 +10,13 @@ from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, OpenApiResponse, extend_schema
 from rest_framework.permissions import AllowAny
 from rest_framework.views import APIView
-from usos_api import USOSAPIException, USOSClient
+from usos_api import USOSAPIException
 from usos_api.models import StaffStatus, StudentStatus
 
+from grades.sync import allow_retry
 from testownik_core.settings import oauth
+from testownik_core.usos import consumer_credentials, usos_client
+from users import dictionaries
 from users.models import AccountType, StudyGroup, Term, User
 
 from .auth_helpers import (
@@ -156,8 +158,7 @@ class UsosLoginView(AsyncAPIView):
 
         callback_url = build_oauth_callback_url(request, "/api/authorize/usos/", build_callback_params(params))
 
-        usos_key = os.getenv("USOS_CONSUMER_KEY")
-        usos_secret = os.getenv("USOS_CONSUMER_SECRET")
+        usos_key, usos_secret = consumer_credentials()
 
         if not usos_key or not usos_secret:
             logger.error(
@@ -174,13 +175,7 @@ class UsosLoginView(AsyncAPIView):
 
         for attempt in range(max_retries):
             try:
-                async with USOSClient(
-                    "https://apps.usos.pwr.edu.pl/",
-                    usos_key,
-                    usos_secret,
-                    trust_env=True,
-                ) as client:
-                    client.set_scopes(["offline_access", "studies", "email", "photo", "grades"])
+                async with usos_client(scopes=["offline_access", "studies", "email", "photo", "grades"]) as client:
                     authorization_url = await client.get_authorization_url(callback_url, params.confirm_user)
                     request_token, request_token_secret = client.connection.auth_manager.get_request_token()
                     await request.session.aset(f"request_token_{request_token}", request_token_secret)
@@ -343,12 +338,7 @@ class UsosAuthorizeView(AsyncAPIView):
         jwt = request.GET.get("jwt", "false") == "true"
         guest_id = request.GET.get("guest_id", "")
 
-        async with USOSClient(
-            "https://apps.usos.pwr.edu.pl/",
-            os.getenv("USOS_CONSUMER_KEY"),
-            os.getenv("USOS_CONSUMER_SECRET"),
-            trust_env=True,
-        ) as client:
+        async with usos_client() as client:
             verifier = request.GET.get("oauth_verifier")
             request_token = request.GET.get("oauth_token")
 
@@ -427,13 +417,7 @@ async def update_user_data_from_usos(client=None, access_token=None, access_toke
         if not access_token or not access_token_secret:
             logger.error("update_user_data_from_usos called without client or tokens")
             raise ValueError("Either client or access_token and access_token_secret must be provided")
-        async with USOSClient(
-            "https://apps.usos.pwr.edu.pl/",
-            os.getenv("USOS_CONSUMER_KEY"),
-            os.getenv("USOS_CONSUMER_SECRET"),
-            trust_env=True,
-        ) as owned_client:
-            owned_client.load_access_token(access_token, access_token_secret)
+        async with usos_client(access_token, access_token_secret) as owned_client:
             return await _sync_usos_user(owned_client, access_token, access_token_secret)
 
     return await _sync_usos_user(client, access_token, access_token_secret)
@@ -474,6 +458,9 @@ async def _sync_usos_user(client, access_token, access_token_secret):
     if created:
         user_obj.set_unusable_password()
         await user_obj.asave()
+    elif access_token and access_token_secret:
+        # Grade syncs that USOS refused with the old tokens may run again.
+        await allow_retry(user_obj)
 
     user_groups = await client.group_service.get_groups_for_participant(
         fields=[
@@ -484,28 +471,50 @@ async def _sync_usos_user(client, access_token, access_token_secret):
             "class_type",
         ]
     )
+    await _sync_study_groups(client, user_obj, user_groups)
 
-    for group in user_groups:
-        try:
-            term = await Term.objects.aget(
-                id=group.term_id,
-            )
-        except Term.DoesNotExist:
-            term_response = await client.term_service.get_term(group.term_id)
-            term = await Term.objects.acreate(
-                id=term_response.id,
-                name=term_response.name.pl,
-                start_date=term_response.start_date,
-                end_date=term_response.end_date,
-                finish_date=term_response.finish_date,
-            )
-        group_obj, _ = await StudyGroup.objects.aupdate_or_create(
-            id=f"{group.course_unit_id}-{group.group_number}",
-            defaults={
-                "name": f"{group.course_name.pl} - {group.class_type.pl}, grupa {group.group_number}",
-                "term": term,
-            },
+    return user_obj, created
+
+
+async def _sync_study_groups(client, user_obj, user_groups):
+    """Upsert the user's USOS groups (and any terms we haven't seen) in a fixed number of queries."""
+    if not user_groups:
+        return
+
+    term_ids = {group.term_id for group in user_groups if group.term_id}
+    known = {term_id async for term_id in Term.objects.filter(id__in=term_ids).values_list("id", flat=True)}
+    missing = sorted(term_ids - known)
+    if missing:
+        fetched = await gather(*(client.term_service.get_term(term_id) for term_id in missing))
+        await Term.objects.abulk_create(
+            [
+                Term(
+                    id=term.id,
+                    name=term.name.pl,
+                    start_date=term.start_date,
+                    end_date=term.end_date,
+                    finish_date=term.finish_date,
+                )
+                for term in fetched
+            ],
+            ignore_conflicts=True,
         )
-        await user_obj.study_groups.aadd(group_obj)
+        await dictionaries.terms.ainvalidate()
 
-    return user_obj, created
+    # A group can be listed more than once (e.g. across class types); the last entry wins, as before.
+    groups = {
+        f"{group.course_unit_id}-{group.group_number}": StudyGroup(
+            id=f"{group.course_unit_id}-{group.group_number}",
+            name=f"{group.course_name.pl} - {group.class_type.pl}, grupa {group.group_number}",
+            term_id=group.term_id,
+        )
+        for group in user_groups
+    }
+    await StudyGroup.objects.abulk_create(
+        groups.values(),
+        update_conflicts=True,
+        unique_fields=["id"],
+        update_fields=["name", "term"],
+    )
+    # `add` only inserts the memberships that are missing.
+    await user_obj.study_groups.aadd(*groups)
@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.db.models import Q
 from unfold.admin import ModelAdmin, TabularInline
 
+from users.admin import TermListFilter
 from wrapped.models import WrappedReport, WrappedTopQuiz
 
 
@@ -24,7 +25,7 @@ class WrappedReportAdmin(ModelAdmin):
         "total_answers",
         "generated_at",
     )
-    list_filter = ("term", "is_global")
+    list_filter = (TermListFilter, "is_global")
     list_select_related = ("user", "term")
     search_fields = (
         "user__first_name",
@@ -39,6 +40,11 @@ class WrappedReportAdmin(ModelAdmin):
     ordering = ("-generated_at",)
     inlines = [WrappedTopQuizInline]
 
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        # Keep the served payload in step with manual edits.
+        form.instance.refresh_payload()
+
     def get_search_results(self, request, queryset, search_term):
         base_queryset = queryset
         queryset, may_have_duplicates = super().get_search_results(request, queryset, search_term)
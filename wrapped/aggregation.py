@@ -6,10 +6,13 @@ single quiz and run over a term window. Writes typed `WrappedReport` rows.
 
 from __future__ import annotations
 
-import bisect
+from array import array
 from collections import defaultdict
+from collections.abc import Iterable, Sequence
 from datetime import datetime, time, timedelta
+from operator import itemgetter
 from typing import Any
+from uuid import UUID
 
 from django.db import transaction
 from django.db.models import Count, OuterRef, Q, QuerySet, Subquery, Sum
@@ -38,11 +41,13 @@ def term_window(term: Term) -> tuple[datetime, datetime]:
 # --- Ranking (non-guest users) ---------------------------------------------
 
 
-def _raw_metrics(start: datetime, end: datetime) -> dict[Any, dict[str, float]]:
+def _raw_metrics(start: datetime, end: datetime, user_ids: Iterable[Any] | None = None) -> dict[Any, dict[str, float]]:
     metrics: dict[Any, dict[str, float]] = defaultdict(lambda: {"study": 0.0, "answers": 0, "active_days": 0})
+    session_users = Q() if user_ids is None else Q(user_id__in=user_ids)
+    answer_users = Q() if user_ids is None else Q(session__user_id__in=user_ids)
 
     sessions = (
-        QuizSession.objects.filter(started_at__gte=start, started_at__lt=end)
+        QuizSession.objects.filter(session_users, started_at__gte=start, started_at__lt=end)
         .exclude(user__account_type=GUEST)
         .values("user")
         .annotate(study=Sum("study_time"))
@@ -51,7 +56,7 @@ def _raw_metrics(start: datetime, end: datetime) -> dict[Any, dict[str, float]]:
         metrics[row["user"]]["study"] = row["study"].total_seconds() if row["study"] else 0.0
 
     answers = (
-        AnswerRecord.objects.filter(answered_at__gte=start, answered_at__lt=end)
+        AnswerRecord.objects.filter(answer_users, answered_at__gte=start, answered_at__lt=end)
         .exclude(session__user__account_type=GUEST)
         .values("session__user")
         .annotate(answers=Count("id"))
@@ -60,7 +65,7 @@ def _raw_metrics(start: datetime, end: datetime) -> dict[Any, dict[str, float]]:
         metrics[row["session__user"]]["answers"] = row["answers"] or 0
 
     days = (
-        AnswerRecord.objects.filter(answered_at__gte=start, answered_at__lt=end)
+        AnswerRecord.objects.filter(answer_users, answered_at__gte=start, answered_at__lt=end)
         .exclude(session__user__account_type=GUEST)
         .annotate(day=TruncDate("answered_at", tzinfo=_tz()))
         .values("session__user")
@@ -72,41 +77,73 @@ def _raw_metrics(start: datetime, end: datetime) -> dict[Any, dict[str, float]]:
     return metrics
 
 
-def _percentile_ranks(metrics: dict[Any, dict[str, float]], key: str) -> dict[Any, float]:
-    users = list(metrics)
-    values = sorted(metrics[u][key] for u in users)
+def _percentile_ranks(values: Sequence[float]) -> array:
+    """Share of users at or below each value (`bisect_right` over the sorted column)."""
     n = len(values)
-    return {u: bisect.bisect_right(values, metrics[u][key]) / n for u in users}
+    ranks = array("d", bytes(8 * n))
+    order = sorted(range(n), key=values.__getitem__)
+    # Walk runs of equal values; each run's rank is where the run ends.
+    run_start = 0
+    for end in range(1, n + 1):
+        if end == n or values[order[end]] != values[order[run_start]]:
+            rank = end / n
+            for i in range(run_start, end):
+                ranks[order[i]] = rank
+            run_start = end
+    return ranks
 
 
 def compute_ranking(start: datetime, end: datetime) -> dict[Any, dict[str, Any]]:
     """Rank every active non-guest user by a composite score → 'top X%'."""
-    metrics = _raw_metrics(start, end)
-    users = list(metrics)
-    if not users:
-        return {}
+    return rank_metrics(_raw_metrics(start, end))
 
-    p_study = _percentile_ranks(metrics, "study")
-    p_answers = _percentile_ranks(metrics, "answers")
-    p_days = _percentile_ranks(metrics, "active_days")
-    weights = config.COMPOSITE_WEIGHTS
 
-    composite = {
-        u: (weights["study"] * p_study[u] + weights["answers"] * p_answers[u] + weights["active_days"] * p_days[u])
-        for u in users
-    }
+def _user_sort_key(user_id: Any) -> Any:
+    # Same order as comparing the ids, without `UUID.__lt__` running per comparison.
+    return user_id.int if isinstance(user_id, UUID) else user_id
+
+
+def rank_metrics(metrics: dict[Any, dict[str, float]]) -> dict[Any, dict[str, Any]]:
+    """Turn raw per-user `study`/`answers`/`active_days` metrics into ranks."""
+    # Sorted up front so the stable composite sort below breaks ties by user id.
+    users = sorted(metrics, key=_user_sort_key)
+    rows = list(map(metrics.__getitem__, users))
+    study = array("d", map(itemgetter("study"), rows))
+    answers = array("q", map(itemgetter("answers"), rows))
+    days = array("q", map(itemgetter("active_days"), rows))
+    return rank_columns(users, study, answers, days)
+
+
+def rank_columns(
+    users: Sequence[Any], study: Sequence[float], answers: Sequence[int], days: Sequence[int]
+) -> dict[Any, dict[str, Any]]:
+    """`rank_metrics` over parallel columns; `users` must be sorted ascending."""
+    n = len(users)
+    if not n:
+        return {}
+
+    p_study = _percentile_ranks(study)
+    p_answers = _percentile_ranks(answers)
+    p_days = _percentile_ranks(days)
+    w_study = config.COMPOSITE_WEIGHTS["study"]
+    w_answers = config.COMPOSITE_WEIGHTS["answers"]
+    w_days = config.COMPOSITE_WEIGHTS["active_days"]
+    composite = array(
+        "d", (w_study * s + w_answers * a + w_days * d for s, a, d in zip(p_study, p_answers, p_days, strict=True))
+    )
 
-    order = sorted(users, key=lambda u: composite[u], reverse=True)
-    n = len(order)
+    # Ties are broken by user id so a re-rank from stored metrics matches a full run;
+    # `reverse=True` keeps the sort stable, so equal scores stay in user order.
+    order = sorted(range(n), key=composite.__getitem__, reverse=True)
     ranking: dict[Any, dict[str, Any]] = {}
-    for index, user_id in enumerate(order):
+    for index, i in enumerate(order):
         rank = index + 1
         top_percent = max(1, round(rank / n * 100))
-        ranking[user_id] = {
-            "composite": composite[user_id],
+        ranking[users[i]] = {
+            "composite": composite[i],
             "percentile": (n - rank) / n if n > 1 else 1.0,
             "top_percent": top_percent,
-            "percentile_fill": max(0, min(100, 100 - top_percent)),
+            "percentile_fill": 100 - top_percent,
         }
     return ranking
 
@@ -256,6 +293,7 @@ def compute_stats(
                 }
 
     return {
+        "study_seconds": total_seconds,
         "study_minutes": round(total_seconds / 60),
         "sessions": sessions_count,
         "active_days": active_days,
@@ -284,6 +322,7 @@ def _save_report(defaults: dict[str, Any], top_quizzes: list[dict], **lookup) ->
         report, _ = WrappedReport.objects.update_or_create(defaults=defaults, **lookup)
         report.top_quizzes.all().delete()
         WrappedTopQuiz.objects.bulk_create(WrappedTopQuiz(report=report, **tq) for tq in top_quizzes)
+        WrappedReport.objects.filter(pk=report.pk).update(payload=report.to_payload(top_quizzes))
 
 
 def build_user_report(user_id: Any, term: Term, rank: dict[str, Any]) -> bool:
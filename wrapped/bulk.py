@@ -0,0 +1,376 @@
+"""Single-pass Wrapped generation for every user in a term.
+
+`build_user_report` runs `compute_stats` (~10 queries) per user, which is
+N×10 queries over the term's `AnswerRecord` table. This module produces the
+same per-user fields from two streams ordered by user — the term's sessions
+and the term's answers — folded into a per-user accumulator as they go by.
+Creator impact is a cross-user metric, so it comes from two grouped queries up
+front instead. Reports are written with bulk upserts in batches.
+"""
+
+from __future__ import annotations
+
+from collections import Counter, defaultdict
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from itertools import groupby
+from operator import itemgetter
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from quizzes.models import AnswerRecord, Question, QuizSession
+from users.models import Term
+
+from . import config
+from .aggregation import GUEST, _tz, term_window
+
+BATCH_SIZE = 500
+STREAM_CHUNK_SIZE = 2000
+
+# Hardest-question fields filled in per batch once the question ids are known.
+_NO_HARDEST = {
+    "hardest_question_number": None,
+    "hardest_quiz_name": "",
+    "hardest_text": "",
+    "hardest_wrong": None,
+    "hardest_correct": None,
+    "hardest_image": "",
+}
+
+_NO_CREATOR = {
+    "creator_people": None,
+    "creator_answers": None,
+    "creator_hours": None,
+}
+
+
+@dataclass
+class UserAccumulator:
+    """Running totals for one user while their rows stream past."""
+
+    user_id: Any
+    sessions: int = 0
+    study_time: timedelta = field(default_factory=timedelta)
+    quiz_time: dict[str, timedelta] = field(default_factory=lambda: defaultdict(timedelta))
+    total_answers: int = 0
+    correct: int = 0
+    first_total: int = 0
+    first_correct: int = 0
+    days: set = field(default_factory=set)
+    hour_totals: list[int] = field(default_factory=lambda: [0] * 24)
+    hour_corrects: list[int] = field(default_factory=lambda: [0] * 24)
+    question_wrong: Counter = field(default_factory=Counter)
+    question_correct: Counter = field(default_factory=Counter)
+
+    def add_session(self, quiz_title: str | None, study_time: timedelta | None) -> None:
+        # Summed as timedeltas so the float seconds match the SQL `Sum` exactly.
+        study_time = study_time or timedelta()
+        self.sessions += 1
+        self.study_time += study_time
+        self.quiz_time[quiz_title or "Bez nazwy"] += study_time
+
+    def add_answer(self, question_id: Any, answered_at: datetime, was_correct: bool, is_first: bool) -> None:
+        local = answered_at.astimezone(_tz())
+        self.total_answers += 1
+        self.days.add(local.date())
+        self.hour_totals[local.hour] += 1
+        if was_correct:
+            self.correct += 1
+            self.hour_corrects[local.hour] += 1
+            self.question_correct[question_id] += 1
+        else:
+            self.question_wrong[question_id] += 1
+        if is_first:
+            self.first_total += 1
+            self.first_correct += was_correct
+
+    def hardest_question_id(self) -> Any | None:
+        """Most-missed question; ties go to the lowest id, like the SQL ordering."""
+        if not self.question_wrong:
+            return None
+        return min(self.question_wrong, key=lambda qid: (-self.question_wrong[qid], qid))
+
+    def to_stats(self) -> dict[str, Any]:
+        """The `compute_stats` fields that don't need another query."""
+        total = self.total_answers
+        peak_count = max(self.hour_totals)
+        scale = peak_count or 1
+        total_seconds = self.study_time.total_seconds()
+        top = sorted(self.quiz_time.items(), key=lambda item: (-item[1], item[0]))[: config.TOP_QUIZZES_LIMIT]
+        return {
+            "study_seconds": total_seconds,
+            "study_minutes": round(total_seconds / 60),
+            "sessions": self.sessions,
+            "active_days": len(self.days) or 1,
+            "total_answers": total,
+            "answers_per_session": round(total / self.sessions) if self.sessions else 0,
+            "correct": self.correct,
+            "wrong": total - self.correct,
+            "accuracy_percent": round(self.correct / total * 100) if total else 0,
+            "first_attempt_percent": round(self.first_correct / self.first_total * 100) if self.first_total else 0,
+            "hours": [round(t / scale * 100) for t in self.hour_totals],
+            "correct_hours": [round(c / scale * 100) for c in self.hour_corrects],
+            "peak_hour": self.hour_totals.index(peak_count) if peak_count else 22,
+            "top_quizzes": [
+                {"rank": index + 1, "name": name, "value": int(time.total_seconds())}
+                for index, (name, time) in enumerate(top)
+            ],
+        }
+
+
+# --- Streams ----------------------------------------------------------------
+
+
+UserRange = tuple[Any, Any]
+
+
+def _user_filter(prefix: str, user_ids: Iterable[Any] | None, user_range: UserRange | None) -> Q:
+    """Restrict a stream to explicit ids and/or an inclusive (low, high) id range."""
+    condition = Q()
+    if user_ids is not None:
+        condition &= Q(**{f"{prefix}__in": list(user_ids)})
+    if user_range is not None:
+        condition &= Q(**{f"{prefix}__gte": user_range[0], f"{prefix}__lte": user_range[1]})
+    return condition
+
+
+def _session_rows(start: datetime, end: datetime, users: Q) -> Iterator[tuple]:
+    return (
+        QuizSession.objects.filter(users, started_at__gte=start, started_at__lt=end)
+        .exclude(user__account_type=GUEST)
+        .order_by("user_id")
+        .values_list("user_id", "quiz__title", "study_time")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+
+def _answer_rows(start: datetime, end: datetime, users: Q) -> Iterator[tuple]:
+    # Same "first attempt" rule as `_first_attempt_accuracy`: the earliest
+    # record of the (session, question) pair, even if it predates the term.
+    first_sub = (
+        AnswerRecord.objects.filter(session=OuterRef("session"), question=OuterRef("question"))
+        .order_by("answered_at", "id")
+        .values("id")[:1]
+    )
+    return (
+        AnswerRecord.objects.filter(users, answered_at__gte=start, answered_at__lt=end)
+        .exclude(session__user__account_type=GUEST)
+        .annotate(first_id=Subquery(first_sub))
+        .order_by("session__user_id")
+        .values_list("session__user_id", "question_id", "answered_at", "was_correct", "id", "first_id")
+        .iterator(chunk_size=STREAM_CHUNK_SIZE)
+    )
+
+
+def iter_user_accumulators(
+    start: datetime,
+    end: datetime,
+    user_ids: Iterable[Any] | None = None,
+    user_range: UserRange | None = None,
+) -> Iterator[UserAccumulator]:
+    """Merge-join the session and answer streams, yielding one folded user at a time."""
+    if user_ids is not None:
+        user_ids = list(user_ids)
+    session_users = _user_filter("user_id", user_ids, user_range)
+    answer_users = _user_filter("session__user_id", user_ids, user_range)
+    session_groups = groupby(_session_rows(start, end, session_users), key=itemgetter(0))
+    answer_groups = groupby(_answer_rows(start, end, answer_users), key=itemgetter(0))
+    sessions = next(session_groups, None)
+    answers = next(answer_groups, None)
+
+    while sessions is not None or answers is not None:
+        sessions_first = answers is None or (sessions is not None and sessions[0] < answers[0])
+        user_id = sessions[0] if sessions_first else answers[0]
+
+        acc = UserAccumulator(user_id)
+        if sessions is not None and sessions[0] == user_id:
+            for _, quiz_title, study_time in sessions[1]:
+                acc.add_session(quiz_title, study_time)
+            sessions = next(session_groups, None)
+        if answers is not None and answers[0] == user_id:
+            for _, question_id, answered_at, was_correct, answer_id, first_id in answers[1]:
+                acc.add_answer(question_id, answered_at, was_correct, answer_id == first_id)
+            answers = next(answer_groups, None)
+        yield acc
+
+
+# --- Cross-user + per-batch lookups -----------------------------------------
+
+
+def creator_impact(start: datetime, end: datetime) -> dict[Any, dict[str, int]]:
+    """Creator impact for every creator at once (others studying their quizzes)."""
+    others_answers = (
+        AnswerRecord.objects.filter(answered_at__gte=start, answered_at__lt=end)
+        .exclude(session__user_id=F("session__quiz__creator_id"))
+        .values("session__quiz__creator_id")
+        .annotate(answers=Count("id"), people=Count("session__user", distinct=True))
+    )
+    others_time = (
+        QuizSession.objects.filter(started_at__gte=start, started_at__lt=end)
+        .exclude(user_id=F("quiz__creator_id"))
+        .values("quiz__creator_id")
+        .annotate(total=Sum("study_time"))
+    )
+    seconds = {row["quiz__creator_id"]: row["total"].total_seconds() if row["total"] else 0 for row in others_time}
+
+    impact: dict[Any, dict[str, int]] = {}
+    for row in others_answers:
+        creator_id = row["session__quiz__creator_id"]
+        if row["people"]:
+            impact[creator_id] = {
+                "creator_people": row["people"],
+                "creator_answers": row["answers"] or 0,
+                "creator_hours": int(seconds.get(creator_id, 0) // 3600),
+            }
+    return impact
+
+
+def _hardest_fields(accumulators: list[UserAccumulator]) -> dict[Any, dict[str, Any]]:
+    """Resolve the hardest question of every user in a batch with one query."""
+    hardest_ids = {acc.user_id: acc.hardest_question_id() for acc in accumulators}
+    questions = Question.objects.select_related("quiz", "image_upload").in_bulk(
+        {qid for qid in hardest_ids.values() if qid is not None}
+    )
+    fields: dict[Any, dict[str, Any]] = {}
+    accs = {acc.user_id: acc for acc in accumulators}
+    for user_id, question_id in hardest_ids.items():
+        question = questions.get(question_id)
+        if question is None:
+            fields[user_id] = _NO_HARDEST
+            continue
+        fields[user_id] = {
+            "hardest_question_number": question.order,
+            "hardest_quiz_name": question.quiz.title or "",
+            "hardest_text": question.text or "",
+            "hardest_wrong": accs[user_id].question_wrong[question_id],
+            "hardest_correct": accs[user_id].question_correct[question_id],
+            "hardest_image": question.image or "",
+        }
+    return fields
+
+
+# --- Writer -----------------------------------------------------------------
+
+
+def _report_update_fields() -> list[str]:
+    from .models import WrappedReport
+
+    fixed = {"id", "user", "term", "is_global"}
+    return [f.name for f in WrappedReport._meta.concrete_fields if f.name not in fixed]
+
+
+def write_user_reports(term: Term, rows: list[dict[str, Any]], generated_at: datetime | None = None) -> int:
+    """Upsert a batch of user reports (+ their top quizzes) in one transaction.
+
+    Each row is a full set of report fields plus `user_id` and `top_quizzes`;
+    the served `payload` is rendered from them before writing.
+    The per-user unique constraint is partial, which `ON CONFLICT` can't
+    target portably, so existing rows are matched by id and bulk-updated.
+    `generated_at` defaults to now; a run passes its start time so that
+    activity during the run is picked up by the next incremental refresh.
+    """
+    from .models import WrappedReport, WrappedTopQuiz
+
+    if not rows:
+        return 0
+
+    user_ids = [row["user_id"] for row in rows]
+    existing = dict(
+        WrappedReport.objects.filter(term=term, is_global=False, user_id__in=user_ids).values_list("user_id", "id")
+    )
+    generated_at = generated_at or timezone.now()
+    to_create: list[WrappedReport] = []
+    to_update: list[WrappedReport] = []
+    top_quizzes: list[WrappedTopQuiz] = []
+    for row in rows:
+        values = {k: v for k, v in row.items() if k != "top_quizzes"}
+        report = WrappedReport(term=term, is_global=False, generated_at=generated_at, **values)
+        report.payload = report.to_payload(row["top_quizzes"])
+        if row["user_id"] in existing:
+            report.id = existing[row["user_id"]]
+            to_update.append(report)
+        else:
+            to_create.append(report)
+        top_quizzes.extend(WrappedTopQuiz(report=report, **tq) for tq in row["top_quizzes"])
+
+    with transaction.atomic():
+        WrappedReport.objects.bulk_create(to_create, batch_size=BATCH_SIZE)
+        if to_create:
+            # `auto_now` overrides the value on insert; pin it back to the run's timestamp.
+            WrappedReport.objects.filter(id__in=[r.id for r in to_create]).update(generated_at=generated_at)
+        WrappedReport.objects.bulk_update(to_update, _report_update_fields(), batch_size=BATCH_SIZE)
+        WrappedTopQuiz.objects.filter(report_id__in=[r.id for r in to_update]).delete()
+        WrappedTopQuiz.objects.bulk_create(top_quizzes, batch_size=BATCH_SIZE)
+    return len(rows)
+
+
+def _build_rows(
+    accumulators: list[UserAccumulator],
+    ranking: dict[Any, dict[str, Any]],
+    impact: dict[Any, dict[str, int]],
+) -> list[dict[str, Any]]:
+    hardest = _hardest_fields(accumulators)
+    rows = []
+    for acc in accumulators:
+        rank = ranking[acc.user_id]
+        rows.append(
+            {
+                "user_id": acc.user_id,
+                **acc.to_stats(),
+                **hardest[acc.user_id],
+                **impact.get(acc.user_id, _NO_CREATOR),
+                "composite_score": rank["composite"],
+                "percentile": rank["percentile"],
+                "top_percent": rank["top_percent"],
+                "percentile_fill": rank["percentile_fill"],
+            }
+        )
+    return rows
+
+
+def build_user_reports(
+    term: Term,
+    ranking: dict[Any, dict[str, Any]],
+    user_ids: Iterable[Any] | None = None,
+    *,
+    user_range: UserRange | None = None,
+    impact: dict[Any, dict[str, int]] | None = None,
+    generated_at: datetime | None = None,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> tuple[int, int]:
+    """Generate reports for every ranked user (or `user_ids`) in one pass.
+
+    Produces the same rows as calling `build_user_report` per user. Returns
+    `(written, skipped)`; users without activity are skipped. `user_range`
+    limits the scan to a contiguous slice of user ids (one shard), and
+    `impact` lets a caller pass creator impact it already computed.
+    """
+    start, end = term_window(term)
+    if impact is None:
+        impact = creator_impact(start, end)
+    wanted = set(ranking) if user_ids is None else set(user_ids) & set(ranking)
+
+    def flush(batch: list[UserAccumulator]) -> int:
+        if dry_run:
+            return len(batch)
+        return write_user_reports(term, _build_rows(batch, ranking, impact), generated_at)
+
+    written = 0
+    batch: list[UserAccumulator] = []
+    for acc in iter_user_accumulators(start, end, None if user_ids is None else wanted, user_range):
+        if acc.user_id not in wanted:
+            continue
+        wanted.discard(acc.user_id)
+        batch.append(acc)
+        if len(batch) >= batch_size:
+            written += flush(batch)
+            batch = []
+    if batch:
+        written += flush(batch)
+
+    return written, len(wanted)
@@ -11,6 +11,7 @@ from __future__ import annotations
 import re
 from datetime import date
 
+from users import dictionaries
 from users.models import Term
 
 # --- Scoring ----------------------------------------------------------------
@@ -52,7 +53,7 @@ def is_real_term(term_id: str) -> bool:
 
 def real_terms():
     """All eligible terms (real id, has start + finish), newest first."""
-    terms = [t for t in Term.objects.all() if is_real_term(t.id) and t.start_date and t.finish_date]
+    terms = [t for t in dictionaries.terms.get().values() if is_real_term(t.id) and t.start_date and t.finish_date]
     return sorted(terms, key=lambda t: t.finish_date, reverse=True)
 
 
@@ -0,0 +1,136 @@
+"""Incremental Wrapped refresh for nightly runs during a term.
+
+Every run stamps its reports with the time it *started*, so the newest
+`generated_at` of a term is a watermark: all activity before it is already in
+the stored reports. A refresh only recomputes users with activity after the
+watermark (plus creators whose quizzes others studied), and re-ranks everyone
+from the ranking inputs kept on each report instead of rescanning the term.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from django.db import transaction
+from django.db.models import Max
+
+from quizzes.models import AnswerRecord, QuizSession
+from users.models import Term
+
+from .aggregation import GUEST, _raw_metrics, rank_metrics, term_window
+from .bulk import BATCH_SIZE, build_user_reports
+
+RANK_FIELDS = ["composite_score", "percentile", "top_percent", "percentile_fill", "generated_at"]
+
+
+@dataclass
+class RefreshResult:
+    since: datetime
+    recomputed: int = 0
+    skipped: int = 0
+    reranked: int = 0
+
+
+def last_generated_at(term: Term) -> datetime | None:
+    """The watermark: start of the last run that wrote user reports for `term`."""
+    from .models import WrappedReport
+
+    return WrappedReport.objects.filter(term=term, is_global=False).aggregate(last=Max("generated_at"))["last"]
+
+
+def has_ranking_inputs(term: Term) -> bool:
+    """False when reports predate `study_seconds`; those need one full run first."""
+    from .models import WrappedReport
+
+    return not WrappedReport.objects.filter(term=term, is_global=False, study_seconds=0, study_minutes__gt=0).exists()
+
+
+def changed_user_ids(term: Term, since: datetime) -> set[Any]:
+    """Users whose report may differ: own activity since `since`, or others on their quizzes."""
+    start, end = term_window(term)
+    answers = AnswerRecord.objects.filter(answered_at__gte=max(start, since), answered_at__lt=end)
+    sessions = QuizSession.objects.filter(started_at__gte=start, started_at__lt=end, updated_at__gte=since)
+
+    changed: set[Any] = set()
+    changed.update(answers.exclude(session__user__account_type=GUEST).values_list("session__user_id", flat=True))
+    changed.update(sessions.exclude(user__account_type=GUEST).values_list("user_id", flat=True))
+    # Creator impact moves whenever anyone studies a user's quiz.
+    changed.update(answers.values_list("session__quiz__creator_id", flat=True))
+    changed.update(sessions.values_list("quiz__creator_id", flat=True))
+    return changed
+
+
+def stored_metrics(term: Term) -> dict[Any, dict[str, float]]:
+    """Ranking inputs as kept on the term's reports (same shape as `_raw_metrics`)."""
+    from .models import WrappedReport
+
+    rows = WrappedReport.objects.filter(term=term, is_global=False).values_list(
+        "user_id", "study_seconds", "total_answers", "active_days"
+    )
+    # `active_days` is stored as at least 1 for display; the ranking counts 0 without answers.
+    return {
+        user_id: {"study": study, "answers": answers, "active_days": days if answers else 0}
+        for user_id, study, answers, days in rows
+    }
+
+
+def _rerank_unchanged(term: Term, ranking: dict[Any, dict[str, Any]], skip: set[Any], generated_at: datetime) -> int:
+    """Write new rank fields on reports that weren't recomputed, where they moved."""
+    from .models import WrappedReport
+
+    to_update = []
+    reports = WrappedReport.objects.filter(term=term, is_global=False).only(
+        "id", "user_id", "payload", *RANK_FIELDS[:-1]
+    )
+    for report in reports.iterator(chunk_size=BATCH_SIZE):
+        rank = ranking.get(report.user_id)
+        if report.user_id in skip or rank is None:
+            continue
+        new = (rank["composite"], rank["percentile"], rank["top_percent"], rank["percentile_fill"])
+        if new == (report.composite_score, report.percentile, report.top_percent, report.percentile_fill):
+            continue
+        report.composite_score, report.percentile, report.top_percent, report.percentile_fill = new
+        report.generated_at = generated_at
+        report.term = term
+        if report.payload is not None:
+            # Only the rank and the season's "as of" date depend on what changed.
+            report.payload = {**report.payload, "season": report.season_block(), "rank": report.rank_block()}
+        to_update.append(report)
+
+    with transaction.atomic():
+        WrappedReport.objects.bulk_update(to_update, [*RANK_FIELDS, "payload"], batch_size=BATCH_SIZE)
+    return len(to_update)
+
+
+def refresh_term(
+    term: Term,
+    *,
+    since: datetime,
+    generated_at: datetime,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> RefreshResult:
+    """Recompute users active since `since` and re-rank the rest from stored metrics."""
+    start, end = term_window(term)
+    changed = changed_user_ids(term, since)
+
+    metrics = stored_metrics(term)
+    for user_id in changed:
+        metrics.pop(user_id, None)
+    metrics.update(_raw_metrics(start, end, user_ids=changed))
+    ranking = rank_metrics(metrics)
+
+    result = RefreshResult(since=since)
+    result.recomputed, result.skipped = build_user_reports(
+        term,
+        ranking,
+        changed,
+        generated_at=generated_at,
+        dry_run=dry_run,
+        batch_size=batch_size,
+    )
+    if not dry_run:
+        result.reranked = _rerank_unchanged(term, ranking, changed, generated_at)
+    return result
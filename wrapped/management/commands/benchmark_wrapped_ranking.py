@@ -0,0 +1,71 @@
+"""Benchmark the Wrapped ranking on synthetic users.
+
+    python manage.py benchmark_wrapped_ranking                  # 100k users
+    python manage.py benchmark_wrapped_ranking --users 40000 --seed 7
+    python manage.py benchmark_wrapped_ranking --baseline main
+
+Times `rank_metrics`. With `--baseline`, also times `rank_metrics` as of that
+git revision (e.g. `eb8c8a9~1`, the dict-of-dicts + per-user `bisect` ranking)
+and checks the output is identical. No database access.
+"""
+
+import random
+import time
+import tracemalloc
+import uuid
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandError
+
+from testownik_core.benchmarks import module_at_revision
+from wrapped.aggregation import rank_metrics
+
+
+def synthetic_metrics(users: int, seed: int) -> dict[Any, dict[str, float]]:
+    """Skewed activity with plenty of ties, like a real term (many light users)."""
+    rng = random.Random(seed)
+    metrics = {}
+    for _ in range(users):
+        answers = int(rng.paretovariate(1.2)) - 1
+        metrics[uuid.UUID(int=rng.getrandbits(128), version=4)] = {
+            "study": float(rng.randrange(0, 36_000, 30)),
+            "answers": answers,
+            "active_days": min(answers, rng.randint(0, 90)),
+        }
+    return metrics
+
+
+class Command(BaseCommand):
+    help = "Benchmark the Wrapped ranking on synthetic users (no database access)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=100_000, help="Synthetic users (default: 100000).")
+        parser.add_argument("--seed", type=int, default=0, help="Random seed (default: 0).")
+        parser.add_argument(
+            "--baseline", metavar="REVISION", help="Also time (and compare with) the ranking at this git revision."
+        )
+
+    def handle(self, *args, **options):
+        metrics = synthetic_metrics(options["users"], options["seed"])
+        self.stdout.write(f"{len(metrics)} synthetic user(s).")
+
+        ranking = self._measure("rank_metrics", rank_metrics, metrics)
+        if not options["baseline"]:
+            return
+        baseline = module_at_revision("wrapped.aggregation", options["baseline"])
+        expected = self._measure(options["baseline"], baseline.rank_metrics, metrics)
+        if ranking != expected:
+            raise CommandError(f"Rankings differ from the ranking at {options['baseline']}.")
+        self.stdout.write(self.style.SUCCESS("Rankings are identical."))
+
+    def _measure(self, label, fn, metrics):
+        started = time.perf_counter()
+        result = fn(metrics)
+        elapsed = time.perf_counter() - started
+        # A second run for memory: tracing would skew the timing.
+        tracemalloc.start()
+        fn(metrics)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        self.stdout.write(f"  {label:<14} {elapsed * 1000:9.1f} ms · peak {peak / 2**20:7.1f} MiB")
+        return result
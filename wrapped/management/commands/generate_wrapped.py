@@ -5,22 +5,31 @@
     python manage.py generate_wrapped --user <uuid>   # one user, no global
     python manage.py generate_wrapped --global         # only the platform report
     python manage.py generate_wrapped --dry-run
+    python manage.py generate_wrapped --workers 4     # shard users across 4 processes
+    python manage.py generate_wrapped --incremental   # nightly: only users active since the last run
 
-The endpoint then just reads `WrappedReport`, so it does no live aggregation.
+Per-user reports come from a single streaming pass over the term's sessions and
+answers (`wrapped.bulk`), written with batched bulk upserts.
+
+The endpoint then serves the payload stored on `WrappedReport`, so it does no
+live aggregation or rendering.
 """
 
 import logging
 import uuid
 
 from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
 
 from wrapped import config
 from wrapped.aggregation import (
     build_global_report,
-    build_user_report,
     compute_ranking,
     term_window,
 )
+from wrapped.bulk import BATCH_SIZE, build_user_reports
+from wrapped.incremental import has_ranking_inputs, last_generated_at, refresh_term
+from wrapped.parallel import DEFAULT_RETRIES, ShardProgress, generate_parallel
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +47,29 @@ class Command(BaseCommand):
             help="Only (re)generate the platform-wide report.",
         )
         parser.add_argument("--dry-run", action="store_true", help="Compute but do not write.")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help=f"Reports written per bulk upsert (default: {BATCH_SIZE}).",
+        )
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Only recompute users active since the last run and re-rank the rest from stored metrics.",
+        )
+        parser.add_argument(
+            "--workers",
+            type=int,
+            default=1,
+            help="Worker processes to shard users across (default: 1, in-process).",
+        )
+        parser.add_argument(
+            "--retries",
+            type=int,
+            default=DEFAULT_RETRIES,
+            help=f"Times a failed shard is retried (default: {DEFAULT_RETRIES}).",
+        )
 
     def handle(self, *args, **options):
         term = config.select_term(options["term"])
@@ -46,6 +78,8 @@ class Command(BaseCommand):
         self.stdout.write(f"Term {term.id} · {term.name}")
 
         start, end = term_window(term)
+        # Stamped on every report written by this run; see `wrapped.incremental`.
+        run_started = timezone.now()
 
         # Global report (unless a single user was requested).
         if not options["user"]:
@@ -59,29 +93,84 @@ class Command(BaseCommand):
             if options["only_global"]:
                 return
 
+        if options["incremental"] and options["user"] is None:
+            since = last_generated_at(term)
+            if since is None or not has_ranking_inputs(term):
+                self.stdout.write("No reusable reports for this term — running a full generation.")
+            else:
+                self._refresh(term, since, run_started, options)
+                return
+
         self.stdout.write("Ranking users…")
         ranking = compute_ranking(start, end)
-        user_ids = list(ranking)
         if options["user"] is not None:
-            try:
-                target = uuid.UUID(options["user"])
-            except ValueError as exc:
-                raise CommandError(f"Invalid user id: {options['user']}") from exc
-            user_ids = [target] if target in ranking else []
+            self._generate_one(term, ranking, options)
+            return
 
-        self.stdout.write(f"{len(user_ids)} eligible user(s).")
-        created = skipped = failed = 0
-        for user_id in user_ids:
-            if options["dry_run"]:
-                continue
-            try:
-                if build_user_report(user_id, term, ranking[user_id]):
-                    created += 1
-                else:
-                    skipped += 1
-            except Exception:  # noqa: BLE001 - one bad user shouldn't stop the batch
-                failed += 1
-                logger.exception("Failed to generate Wrapped for user %s", user_id)
+        self.stdout.write(f"{len(ranking)} eligible user(s), {options['workers']} worker(s).")
+        try:
+            result = generate_parallel(
+                term,
+                ranking,
+                workers=options["workers"],
+                retries=options["retries"],
+                generated_at=run_started,
+                dry_run=options["dry_run"],
+                batch_size=options["batch_size"],
+                on_progress=self._report_progress,
+            )
+        except Exception as exc:
+            logger.exception("Failed to generate Wrapped reports for term %s", term.id)
+            raise CommandError(f"Wrapped generation failed: {exc}") from exc
+
+        verb = "Would write" if options["dry_run"] else "Wrote"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.written}, skipped {result.skipped} (no activity), failed {result.failed}."
+            )
+        )
+
+    def _generate_one(self, term, ranking, options):
+        try:
+            target = uuid.UUID(options["user"])
+        except ValueError as exc:
+            raise CommandError(f"Invalid user id: {options['user']}") from exc
+        user_ids = [target] if target in ranking else []
 
+        self.stdout.write(f"{len(user_ids)} eligible user(s).")
+        created, skipped = build_user_reports(
+            term,
+            ranking,
+            user_ids,
+            # Don't move the term's watermark forward for a single user.
+            generated_at=last_generated_at(term),
+            dry_run=options["dry_run"],
+            batch_size=options["batch_size"],
+        )
         verb = "Would write" if options["dry_run"] else "Wrote"
-        self.stdout.write(self.style.SUCCESS(f"{verb} {created}, skipped {skipped} (no activity), failed {failed}."))
+        self.stdout.write(self.style.SUCCESS(f"{verb} {created}, skipped {skipped} (no activity)."))
+
+    def _refresh(self, term, since, run_started, options):
+        self.stdout.write(f"Refreshing users active since {timezone.localtime(since):%Y-%m-%d %H:%M}…")
+        try:
+            result = refresh_term(
+                term,
+                since=since,
+                generated_at=run_started,
+                dry_run=options["dry_run"],
+                batch_size=options["batch_size"],
+            )
+        except Exception as exc:
+            logger.exception("Failed to refresh Wrapped reports for term %s", term.id)
+            raise CommandError(f"Wrapped refresh failed: {exc}") from exc
+
+        verb = "Would recompute" if options["dry_run"] else "Recomputed"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {result.recomputed}, skipped {result.skipped} (no activity), re-ranked {result.reranked}."
+            )
+        )
+
+    def _report_progress(self, progress: ShardProgress):
+        status = "FAILED" if progress.failed else f"{progress.written} written, {progress.skipped} skipped"
+        self.stdout.write(f"  shard {progress.shard}/{progress.shards} · {progress.users} user(s) · {status}")
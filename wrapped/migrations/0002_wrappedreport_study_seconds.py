@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 04:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wrapped', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wrappedreport',
+            name='study_seconds',
+            field=models.FloatField(default=0.0, help_text='Exact study time; ranking input.'),
+        ),
+    ]
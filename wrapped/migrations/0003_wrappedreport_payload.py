@@ -0,0 +1,18 @@
+# Generated by Django 6.0.6 on 2026-10-19 04:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wrapped', '0002_wrappedreport_study_seconds'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wrappedreport',
+            name='payload',
+            field=models.JSONField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -30,6 +30,7 @@ class WrappedReport(models.Model):
     percentile = models.FloatField(default=0.0, help_text="Fraction of users this user beat (0–1).")
 
     # Study time
+    study_seconds = models.FloatField(default=0.0, help_text="Exact study time; ranking input.")
     study_minutes = models.PositiveIntegerField(default=0)
     sessions = models.PositiveIntegerField(default=0)
     active_days = models.PositiveIntegerField(default=0)
@@ -66,6 +67,9 @@ class WrappedReport(models.Model):
     creator_answers = models.PositiveIntegerField(null=True, blank=True)
     creator_hours = models.PositiveIntegerField(null=True, blank=True)
 
+    # `to_payload()` as of generation, served as-is by the endpoints.
+    payload = models.JSONField(null=True, blank=True, editable=False)
+
     class Meta:
         ordering = ["-generated_at"]
         constraints = [
@@ -93,8 +97,20 @@ class WrappedReport(models.Model):
         who = "GLOBAL" if self.is_global else str(self.user_id)
         return f"Wrapped {self.term_id} · {who}"
 
-    def to_payload(self) -> dict:
-        """Assemble the exact `WrappedData` shape the frontend consumes."""
+    def season_block(self) -> dict:
+        return config.season_block(self.term, timezone.localdate(self.generated_at))
+
+    def rank_block(self) -> dict:
+        return {"top_percent": self.top_percent, "percentile_fill": self.percentile_fill}
+
+    def to_payload(self, top_quizzes: list[dict] | None = None) -> dict:
+        """Assemble the exact `WrappedData` shape the frontend consumes.
+
+        `top_quizzes` (as `WrappedTopQuiz.as_dict()` rows) saves the query when
+        the caller already has them, e.g. while the report is being written.
+        """
+        if top_quizzes is None:
+            top_quizzes = [tq.as_dict() for tq in self.top_quizzes.all()]
         hardest = None
         if self.hardest_question_number is not None:
             hardest = {
@@ -115,7 +131,7 @@ class WrappedReport(models.Model):
         return {
             "is_empty": False,
             "is_global": self.is_global,
-            "season": config.season_block(self.term, timezone.localdate(self.generated_at)),
+            "season": self.season_block(),
             "study_time": {"total_minutes": self.study_minutes},
             "volume": {
                 "total_answers": self.total_answers,
@@ -133,15 +149,17 @@ class WrappedReport(models.Model):
                 "correct_hours": self.correct_hours,
                 "peak_hour": self.peak_hour,
             },
-            "top_quizzes": [tq.as_dict() for tq in self.top_quizzes.all()],
+            "top_quizzes": top_quizzes,
             "hardest_question": hardest,
             "creator_impact": creator,
-            "rank": {
-                "top_percent": self.top_percent,
-                "percentile_fill": self.percentile_fill,
-            },
+            "rank": self.rank_block(),
         }
 
+    def refresh_payload(self) -> None:
+        """Re-render and store `payload` from the saved fields and top quizzes."""
+        self.payload = self.to_payload()
+        WrappedReport.objects.filter(pk=self.pk).update(payload=self.payload)
+
 
 class WrappedTopQuiz(models.Model):
     """One row of the 'top quizzes by time' list on a report."""
@@ -0,0 +1,176 @@
+"""Sharded Wrapped generation across worker processes.
+
+The ranked users are sorted by id and cut into contiguous shards, so each
+shard is a `user_range` scan of the term in `wrapped.bulk`. Shards run in a
+process pool where every worker opens its own database connection; a failed
+shard is retried as a whole, which is safe because the writes are upserts.
+With one worker the shards run inline through the same code path, so the
+reports are identical to a serial run either way.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import multiprocessing
+import os
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any
+
+from django.db import connections
+
+from users.models import Term
+
+from .aggregation import term_window
+from .bulk import BATCH_SIZE, build_user_reports, creator_impact
+
+logger = logging.getLogger(__name__)
+
+# More shards than workers keeps the pool busy when shard sizes are uneven.
+SHARDS_PER_WORKER = 4
+DEFAULT_RETRIES = 2
+
+
+@dataclass
+class ShardProgress:
+    """Reported after each shard finishes (or gives up)."""
+
+    shard: int
+    shards: int
+    users: int
+    written: int
+    skipped: int
+    failed: bool
+
+
+@dataclass
+class GenerationResult:
+    written: int = 0
+    skipped: int = 0
+    failed: int = 0
+
+
+def shard_ranking(ranking: dict[Any, dict[str, Any]], shards: int) -> list[dict[Any, dict[str, Any]]]:
+    """Split the ranking into at most `shards` contiguous slices of sorted user ids."""
+    user_ids = sorted(ranking)
+    if not user_ids:
+        return []
+    size = math.ceil(len(user_ids) / max(1, shards))
+    return [{uid: ranking[uid] for uid in user_ids[i : i + size]} for i in range(0, len(user_ids), size)]
+
+
+def _init_worker() -> None:
+    """Set up Django in a fresh worker and drop any connection inherited from the parent."""
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "testownik_core.settings")
+    import django
+
+    django.setup()
+    connections.close_all()
+
+
+def generate_shard(
+    term_id: str,
+    shard: dict[Any, dict[str, Any]],
+    impact: dict[Any, dict[str, int]],
+    generated_at: datetime | None = None,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+) -> tuple[int, int]:
+    """Worker entry point: generate one shard's reports, batched per `batch_size`."""
+    term = Term.objects.get(id=term_id)
+    return build_user_reports(
+        term,
+        shard,
+        user_range=(min(shard), max(shard)),
+        impact=impact,
+        generated_at=generated_at,
+        dry_run=dry_run,
+        batch_size=batch_size,
+    )
+
+
+class _InlineExecutor:
+    """Runs submitted shards immediately in this process (the `workers=1` mode)."""
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except Exception as exc:  # noqa: BLE001 - surfaced through the future like a pool would
+            future.set_exception(exc)
+        return future
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def generate_parallel(
+    term: Term,
+    ranking: dict[Any, dict[str, Any]],
+    *,
+    workers: int = 1,
+    retries: int = DEFAULT_RETRIES,
+    generated_at: datetime | None = None,
+    dry_run: bool = False,
+    batch_size: int = BATCH_SIZE,
+    on_progress: Callable[[ShardProgress], None] | None = None,
+) -> GenerationResult:
+    """Generate every ranked user's report, sharded across `workers` processes."""
+    start, end = term_window(term)
+    impact = creator_impact(start, end)
+    shards = shard_ranking(ranking, workers * SHARDS_PER_WORKER)
+    result = GenerationResult()
+
+    if workers > 1:
+        # Forked workers must not share the parent's socket.
+        connections.close_all()
+        # Forked, not spawned: workers inherit the parent's database settings (e.g. the test database).
+        executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("fork"), initializer=_init_worker
+        )
+    else:
+        executor = _InlineExecutor()
+
+    def submit(index: int) -> Future:
+        shard = shards[index]
+        shard_impact = {uid: impact[uid] for uid in shard if uid in impact}
+        return executor.submit(generate_shard, term.id, shard, shard_impact, generated_at, dry_run, batch_size)
+
+    with executor:
+        attempts = dict.fromkeys(range(len(shards)), 1)
+        pending = {submit(index): index for index in range(len(shards))}
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                try:
+                    written, skipped = future.result()
+                except Exception:
+                    if attempts[index] <= retries:
+                        logger.warning(
+                            "Wrapped shard %d/%d failed (attempt %d), retrying",
+                            index + 1,
+                            len(shards),
+                            attempts[index],
+                            exc_info=True,
+                        )
+                        attempts[index] += 1
+                        pending[submit(index)] = index
+                        continue
+                    logger.exception("Wrapped shard %d/%d failed, giving up", index + 1, len(shards))
+                    result.failed += len(shards[index])
+                    progress = ShardProgress(index + 1, len(shards), len(shards[index]), 0, 0, failed=True)
+                else:
+                    result.written += written
+                    result.skipped += skipped
+                    progress = ShardProgress(index + 1, len(shards), len(shards[index]), written, skipped, False)
+                if on_progress is not None:
+                    on_progress(progress)
+
+    return result
@@ -0,0 +1,171 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from quizzes.models import AnswerRecord, Question, Quiz, QuizSession
+from users.models import AccountType, Term, User
+from wrapped.aggregation import build_user_report, compute_ranking, term_window
+from wrapped.bulk import build_user_reports
+from wrapped.models import WrappedReport
+
+
+class WrappedFixtureMixin:
+    """A small term with a mix of users, quizzes, sessions and answers."""
+
+    def make_term(self):
+        today = timezone.localdate()
+        return Term.objects.create(
+            id="2025/26-Z",
+            name="Semestr zimowy 2025/26",
+            start_date=today - timedelta(days=30),
+            end_date=today + timedelta(days=30),
+            finish_date=today + timedelta(days=30),
+        )
+
+    def make_user(self, name, account_type=AccountType.STUDENT):
+        return User.objects.create(
+            email=f"{name}@example.com", first_name=name, last_name="Test", account_type=account_type
+        )
+
+    def make_quiz(self, creator, title, questions=3):
+        quiz = Quiz.objects.create(title=title, creator=creator, folder=creator.root_folder)
+        for order in range(1, questions + 1):
+            Question.objects.create(quiz=quiz, order=order, text=f"{title} Q{order}")
+        return quiz
+
+    def make_session(self, user, quiz, *, minutes, started_days_ago=1, is_active=True):
+        session = QuizSession.objects.create(
+            quiz=quiz, user=user, is_active=is_active, study_time=timedelta(minutes=minutes)
+        )
+        QuizSession.objects.filter(id=session.id).update(started_at=timezone.now() - timedelta(days=started_days_ago))
+        return session
+
+    def answer(self, session, question, was_correct, *, days_ago=1, hour=10):
+        record = AnswerRecord.objects.create(
+            session=session, question=question, selected_answers=[], was_correct=was_correct
+        )
+        at = timezone.localtime() - timedelta(days=days_ago)
+        AnswerRecord.objects.filter(id=record.id).update(answered_at=at.replace(hour=hour, minute=0))
+        return record
+
+    def populate(self, extra_users=0):
+        alice = self.make_user("alice")
+        bob = self.make_user("bob")
+        guest = User.objects.create_guest_user()
+        algebra = self.make_quiz(alice, "Algebra")
+        physics = self.make_quiz(bob, "Fizyka")
+        a_q = list(algebra.questions.all())
+        p_q = list(physics.questions.all())
+
+        s = self.make_session(alice, algebra, minutes=40)
+        self.answer(s, a_q[0], False, days_ago=3, hour=9)
+        self.answer(s, a_q[0], True, days_ago=2, hour=9)
+        self.answer(s, a_q[1], False, days_ago=2, hour=21)
+        self.answer(s, a_q[1], False, days_ago=1, hour=21)
+        s = self.make_session(alice, physics, minutes=15)
+        self.answer(s, p_q[2], True, days_ago=1, hour=22)
+        # Before the term: the session and its first attempt stay out of the window.
+        s = self.make_session(alice, physics, minutes=90, started_days_ago=45, is_active=False)
+        self.answer(s, p_q[0], False, days_ago=45)
+        self.answer(s, p_q[0], True, days_ago=5, hour=8)
+
+        s = self.make_session(bob, algebra, minutes=25)
+        self.answer(s, a_q[2], True, days_ago=4, hour=13)
+        self.answer(s, a_q[2], False, days_ago=4, hour=14)
+        s = self.make_session(guest, physics, minutes=5)
+        self.answer(s, p_q[1], True, days_ago=1, hour=18)
+        self.make_session(bob, physics, minutes=3)
+
+        for index in range(extra_users):
+            user = self.make_user(f"extra{index}")
+            s = self.make_session(user, algebra, minutes=index + 1)
+            self.answer(s, a_q[index % 3], index % 2 == 0, days_ago=index % 7 + 1, hour=index % 24)
+        return alice, bob, guest
+
+
+class BulkGenerationTests(WrappedFixtureMixin, TestCase):
+    def setUp(self):
+        self.term = self.make_term()
+        self.start, self.end = term_window(self.term)
+
+    def _payloads(self):
+        return {
+            report.user_id: report.to_payload()
+            for report in WrappedReport.objects.filter(term=self.term, is_global=False).prefetch_related("top_quizzes")
+        }
+
+    def test_matches_per_user_reports(self):
+        self.populate(extra_users=4)
+        ranking = compute_ranking(self.start, self.end)
+        for user_id, rank in ranking.items():
+            build_user_report(user_id, self.term, rank)
+        expected = self._payloads()
+        WrappedReport.objects.all().delete()
+
+        written, skipped = build_user_reports(self.term, ranking, batch_size=2)
+
+        self.assertEqual((written, skipped), (len(ranking), 0))
+        self.assertEqual(self._payloads(), expected)
+
+    def test_guests_are_not_reported(self):
+        _, _, guest = self.populate()
+        build_user_reports(self.term, compute_ranking(self.start, self.end))
+
+        self.assertFalse(WrappedReport.objects.filter(user=guest).exists())
+        self.assertEqual(WrappedReport.objects.filter(term=self.term).count(), 2)
+
+    def test_creator_impact_counts_other_users(self):
+        alice, bob, _ = self.populate()
+        build_user_reports(self.term, compute_ranking(self.start, self.end))
+
+        bob_report = WrappedReport.objects.get(user=bob, term=self.term)
+        # alice answered 3 times on Fizyka in the window, the guest once.
+        self.assertEqual(bob_report.creator_people, 2)
+        self.assertEqual(bob_report.creator_answers, 3)
+        alice_report = WrappedReport.objects.get(user=alice, term=self.term)
+        self.assertEqual(alice_report.creator_people, 1)
+
+    def test_regenerating_updates_in_place(self):
+        alice, _, _ = self.populate()
+        ranking = compute_ranking(self.start, self.end)
+        build_user_reports(self.term, ranking)
+        report_id = WrappedReport.objects.get(user=alice, term=self.term).id
+
+        s = QuizSession.objects.filter(user=alice).first()
+        self.answer(s, s.quiz.questions.first(), True)
+        build_user_reports(self.term, compute_ranking(self.start, self.end))
+
+        report = WrappedReport.objects.get(user=alice, term=self.term)
+        self.assertEqual(report.id, report_id)
+        self.assertEqual(report.total_answers, 7)
+        self.assertEqual(report.top_quizzes.count(), 2)
+
+    def test_query_count_does_not_grow_with_users(self):
+        self.populate(extra_users=2)
+        ranking = compute_ranking(self.start, self.end)
+        with CaptureQueriesContext(connection) as small:
+            build_user_reports(self.term, ranking)
+
+        for index in range(10):
+            user = self.make_user(f"more{index}")
+            quiz = Quiz.objects.get(title="Algebra")
+            self.answer(self.make_session(user, quiz, minutes=5), quiz.questions.first(), True)
+        ranking = compute_ranking(self.start, self.end)
+        WrappedReport.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            build_user_reports(self.term, ranking)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+    def test_command_writes_reports(self):
+        self.populate()
+        out = StringIO()
+        call_command("generate_wrapped", "--term", self.term.id, stdout=out)
+
+        self.assertIn("Wrote 2, skipped 0", out.getvalue())
+        self.assertTrue(WrappedReport.objects.filter(term=self.term, is_global=True).exists())
@@ -0,0 +1,99 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from quizzes.models import AnswerRecord, Quiz, QuizSession
+from wrapped.aggregation import compute_ranking, term_window
+from wrapped.bulk import build_user_reports
+from wrapped.incremental import changed_user_ids, last_generated_at, refresh_term, stored_metrics
+from wrapped.models import WrappedReport
+
+from .test_bulk_generation import WrappedFixtureMixin
+
+
+class IncrementalRefreshTests(WrappedFixtureMixin, TestCase):
+    def setUp(self):
+        self.term = self.make_term()
+        self.alice, self.bob, self.guest = self.populate(extra_users=5)
+        self.start, self.end = term_window(self.term)
+        self.first_run = timezone.now()
+        build_user_reports(self.term, compute_ranking(self.start, self.end), generated_at=self.first_run)
+
+    def _payloads(self):
+        return {
+            report.user_id: report.to_payload()
+            for report in WrappedReport.objects.filter(term=self.term).prefetch_related("top_quizzes")
+        }
+
+    def _full_run_payloads(self):
+        WrappedReport.objects.all().delete()
+        build_user_reports(self.term, compute_ranking(self.start, self.end))
+        return self._payloads()
+
+    def test_watermark_is_the_run_start(self):
+        self.assertEqual(last_generated_at(self.term), self.first_run)
+
+    def test_stored_metrics_match_a_term_scan(self):
+        from wrapped.aggregation import _raw_metrics
+
+        self.assertEqual(stored_metrics(self.term), dict(_raw_metrics(self.start, self.end)))
+
+    def test_changed_users_include_creators_of_studied_quizzes(self):
+        extra = self.make_user("extra0-late")
+        session = QuizSession.objects.create(quiz=Quiz.objects.get(title="Fizyka"), user=extra)
+        AnswerRecord.objects.create(
+            session=session, question=session.quiz.questions.first(), selected_answers=[], was_correct=True
+        )
+
+        self.assertEqual(changed_user_ids(self.term, self.first_run), {extra.id, self.bob.id})
+
+    def test_refresh_matches_full_regeneration(self):
+        session = QuizSession.objects.get(user=self.alice, quiz__title="Algebra")
+        session.study_time += timedelta(minutes=30)
+        session.save()
+        AnswerRecord.objects.create(
+            session=session, question=session.quiz.questions.last(), selected_answers=[], was_correct=False
+        )
+        newcomer = self.make_user("newcomer")
+        s = QuizSession.objects.create(quiz=session.quiz, user=newcomer, study_time=timedelta(hours=3))
+        AnswerRecord.objects.create(session=s, question=s.quiz.questions.first(), selected_answers=[], was_correct=True)
+
+        result = refresh_term(self.term, since=self.first_run, generated_at=timezone.now())
+
+        # alice studied (and, as Algebra's creator, gained impact); the newcomer is new.
+        self.assertEqual(result.recomputed, 2)
+        self.assertGreater(result.reranked, 0)
+        refreshed = self._payloads()
+        self.assertEqual(refreshed, self._full_run_payloads())
+
+    def test_refresh_without_activity_changes_nothing(self):
+        before = self._payloads()
+        result = refresh_term(self.term, since=self.first_run, generated_at=timezone.now())
+
+        self.assertEqual((result.recomputed, result.reranked), (0, 0))
+        self.assertEqual(self._payloads(), before)
+        self.assertEqual(last_generated_at(self.term), self.first_run)
+
+    def test_command_incremental_mode(self):
+        AnswerRecord.objects.create(
+            session=QuizSession.objects.get(user=self.bob, quiz__title="Algebra"),
+            question=Quiz.objects.get(title="Algebra").questions.first(),
+            selected_answers=[],
+            was_correct=True,
+        )
+        out = StringIO()
+        call_command("generate_wrapped", "--term", self.term.id, "--incremental", stdout=out)
+
+        self.assertIn("Recomputed 2", out.getvalue())
+        self.assertGreater(last_generated_at(self.term), self.first_run)
+
+    def test_command_falls_back_to_full_run_without_reports(self):
+        WrappedReport.objects.all().delete()
+        out = StringIO()
+        call_command("generate_wrapped", "--term", self.term.id, "--incremental", stdout=out)
+
+        self.assertIn("running a full generation", out.getvalue())
+        self.assertEqual(WrappedReport.objects.filter(term=self.term, is_global=False).count(), 7)
@@ -0,0 +1,125 @@
+import uuid
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+
+from wrapped.aggregation import compute_ranking, term_window
+from wrapped.bulk import build_user_reports
+from wrapped.models import WrappedReport
+from wrapped.parallel import SHARDS_PER_WORKER, GenerationResult, generate_parallel, shard_ranking
+
+from .test_bulk_generation import WrappedFixtureMixin
+
+
+class ShardRankingTests(TestCase):
+    def test_shards_are_contiguous_and_cover_everyone(self):
+        ranking = {uuid.uuid4(): {"composite": i} for i in range(10)}
+        shards = shard_ranking(ranking, 3)
+
+        self.assertEqual(len(shards), 3)
+        flattened = [uid for shard in shards for uid in shard]
+        self.assertEqual(flattened, sorted(ranking))
+        for shard in shards:
+            for uid, rank in shard.items():
+                self.assertIs(rank, ranking[uid])
+
+    def test_empty_ranking_has_no_shards(self):
+        self.assertEqual(shard_ranking({}, 4), [])
+
+
+class ParallelGenerationTests(WrappedFixtureMixin, TestCase):
+    def setUp(self):
+        self.term = self.make_term()
+        self.populate(extra_users=6)
+        self.ranking = compute_ranking(*term_window(self.term))
+
+    def _payloads(self):
+        return {
+            report.user_id: report.to_payload()
+            for report in WrappedReport.objects.filter(term=self.term).prefetch_related("top_quizzes")
+        }
+
+    def test_sharded_run_matches_serial_run(self):
+        build_user_reports(self.term, self.ranking)
+        expected = self._payloads()
+        WrappedReport.objects.all().delete()
+
+        progress = []
+        result = generate_parallel(self.term, self.ranking, workers=1, batch_size=2, on_progress=progress.append)
+
+        self.assertEqual(result.written, len(self.ranking))
+        self.assertEqual(result.failed, 0)
+        self.assertGreater(len(progress), 1)
+        self.assertEqual(sum(p.users for p in progress), len(self.ranking))
+        self.assertEqual(self._payloads(), expected)
+
+    def test_failed_shard_is_retried(self):
+        calls = []
+
+        def flaky(*args, **kwargs):
+            calls.append(kwargs["user_range"])
+            if len(calls) == 1:
+                raise RuntimeError("connection reset")
+            return build_user_reports(*args, **kwargs)
+
+        with mock.patch("wrapped.parallel.build_user_reports", side_effect=flaky):
+            result = generate_parallel(self.term, self.ranking, workers=1, retries=1)
+
+        self.assertEqual(calls.count(calls[0]), 2)
+        self.assertEqual(result.written, len(self.ranking))
+        self.assertEqual(result.failed, 0)
+
+    def test_shard_gives_up_after_retries(self):
+        shards = shard_ranking(self.ranking, 4)
+
+        def broken_first_shard(*args, **kwargs):
+            if kwargs["user_range"][0] == min(shards[0]):
+                raise RuntimeError("boom")
+            return build_user_reports(*args, **kwargs)
+
+        with mock.patch("wrapped.parallel.build_user_reports", side_effect=broken_first_shard):
+            result = generate_parallel(self.term, self.ranking, workers=1, retries=2)
+
+        self.assertEqual(result.failed, len(shards[0]))
+        self.assertEqual(result.written, len(self.ranking) - len(shards[0]))
+
+    def test_command_reports_shard_progress(self):
+        out = StringIO()
+        call_command("generate_wrapped", "--term", self.term.id, stdout=out)
+
+        self.assertIn("shard 1/", out.getvalue())
+        self.assertIn(f"Wrote {len(self.ranking)}, skipped 0 (no activity), failed 0.", out.getvalue())
+
+
+class ProcessPoolGenerationTests(WrappedFixtureMixin, TransactionTestCase):
+    """`workers > 1`: shards are pickled to forked worker processes set up by `_init_worker`."""
+
+    def setUp(self):
+        self.term = self.make_term()
+        self.populate(extra_users=6)
+        self.ranking = compute_ranking(*term_window(self.term))
+
+    def test_worker_processes_match_serial_run(self):
+        serial = generate_parallel(self.term, self.ranking, workers=1, dry_run=True)
+        progress = []
+        parallel = generate_parallel(self.term, self.ranking, workers=2, dry_run=True, on_progress=progress.append)
+
+        # A shard that failed to pickle or to set up Django would be counted as failed.
+        self.assertEqual(parallel, GenerationResult(written=len(self.ranking)))
+        self.assertEqual(parallel, serial)
+        self.assertEqual(len(progress), 2 * SHARDS_PER_WORKER)
+
+    def test_worker_processes_write_the_serial_reports(self):
+        if connection.vendor == "sqlite" and connection.is_in_memory_db():
+            self.skipTest("Worker processes write to their own copy of an in-memory database.")
+        build_user_reports(self.term, self.ranking)
+        expected = {report.user_id: report.to_payload() for report in WrappedReport.objects.all()}
+        WrappedReport.objects.all().delete()
+
+        result = generate_parallel(self.term, self.ranking, workers=2)
+
+        self.assertEqual(result.written, len(self.ranking))
+        self.assertEqual({report.user_id: report.to_payload() for report in WrappedReport.objects.all()}, expected)
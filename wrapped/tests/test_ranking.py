@@ -0,0 +1,54 @@
+import uuid
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import SimpleTestCase
+
+from wrapped.aggregation import rank_metrics
+
+
+class RankMetricsTests(SimpleTestCase):
+    def test_ranks_by_weighted_percentiles(self):
+        ranking = rank_metrics(
+            {
+                "a": {"study": 10.0, "answers": 1, "active_days": 1},
+                "b": {"study": 20.0, "answers": 1, "active_days": 2},
+                "c": {"study": 20.0, "answers": 5, "active_days": 2},
+                "d": {"study": 40.0, "answers": 0, "active_days": 3},
+            }
+        )
+
+        # Percentiles count users at or below: b and c tie on study (0.75) and a and b on answers (0.75).
+        expected = {
+            "c": (0.5 * 0.75 + 0.3 * 1.0 + 0.2 * 0.75, 0.75, 25),
+            "d": (0.5 * 1.0 + 0.3 * 0.25 + 0.2 * 1.0, 0.5, 50),
+            "b": (0.5 * 0.75 + 0.3 * 0.75 + 0.2 * 0.75, 0.25, 75),
+            "a": (0.5 * 0.25 + 0.3 * 0.75 + 0.2 * 0.25, 0.0, 100),
+        }
+        self.assertEqual(list(ranking), list(expected))
+        for user, (composite, percentile, top_percent) in expected.items():
+            self.assertAlmostEqual(ranking[user]["composite"], composite)
+            self.assertEqual(ranking[user]["percentile"], percentile)
+            self.assertEqual(ranking[user]["top_percent"], top_percent)
+            self.assertEqual(ranking[user]["percentile_fill"], 100 - top_percent)
+
+    def test_ties_are_broken_by_user_id(self):
+        users = sorted(uuid.uuid4() for _ in range(4))
+        metrics = {u: {"study": 60.0, "answers": 3, "active_days": 1} for u in reversed(users)}
+        ranking = rank_metrics(metrics)
+
+        self.assertEqual(sorted(ranking, key=lambda u: -ranking[u]["percentile"]), users)
+
+    def test_single_and_empty(self):
+        user = uuid.uuid4()
+        ranking = rank_metrics({user: {"study": 0.0, "answers": 0, "active_days": 0}})
+
+        self.assertEqual(ranking[user]["percentile"], 1.0)
+        self.assertEqual(ranking[user]["top_percent"], 100)
+        self.assertEqual(rank_metrics({}), {})
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command("benchmark_wrapped_ranking", "--users", "500", "--baseline", "HEAD", stdout=out)
+
+        self.assertIn("Rankings are identical.", out.getvalue())
@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from constance.test import override_config
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APITestCase
+
+from quizzes.models import AnswerRecord, QuizSession
+from users.models import AccountType
+from wrapped.aggregation import build_global_report, compute_ranking, term_window
+from wrapped.bulk import build_user_reports
+from wrapped.incremental import refresh_term
+from wrapped.models import WrappedReport
+
+from .test_bulk_generation import WrappedFixtureMixin
+
+
+@override_config(WRAPPED_ENABLED=True)
+class WrappedPayloadTests(WrappedFixtureMixin, APITestCase):
+    def setUp(self):
+        self.term = self.make_term()
+        self.alice, self.bob, _ = self.populate(extra_users=3)
+        build_user_reports(self.term, compute_ranking(*term_window(self.term)))
+        build_global_report(self.term)
+        self.admin = self.make_user("admin", account_type=AccountType.STUDENT)
+        self.admin.is_staff = True
+        self.admin.save()
+
+    def _rendered(self, **lookup):
+        report = WrappedReport.objects.prefetch_related("top_quizzes").get(term=self.term, **lookup)
+        return report.to_payload()
+
+    def test_payload_is_stored_at_generation(self):
+        for report in WrappedReport.objects.prefetch_related("top_quizzes"):
+            self.assertEqual(report.payload, report.to_payload())
+
+    def test_user_endpoint_serves_the_stored_payload(self):
+        self.client.force_authenticate(user=self.alice)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("get_wrapped"))
+
+        self.assertEqual(response.status_code, 200)
+        wrapped_queries = [q["sql"] for q in ctx.captured_queries if "wrapped_" in q["sql"]]
+        self.assertEqual(len(wrapped_queries), 1)
+        self.assertNotIn("wrapped_wrappedtopquiz", wrapped_queries[0])
+        self.assertEqual(response.json(), self._rendered(user=self.alice))
+
+    def test_global_endpoint_serves_the_stored_payload(self):
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get(reverse("get_wrapped_global"))
+
+        self.assertEqual(response.json(), self._rendered(is_global=True))
+
+    def test_reports_without_a_payload_are_rendered(self):
+        WrappedReport.objects.update(payload=None)
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.get(reverse("get_wrapped"))
+
+        self.assertEqual(response.json(), self._rendered(user=self.bob))
+
+    def test_rerank_updates_stored_payloads(self):
+        newcomer = self.make_user("newcomer")
+        session = QuizSession.objects.create(
+            quiz=self.alice.created_quizzes.first(), user=newcomer, study_time=timedelta(hours=10)
+        )
+        AnswerRecord.objects.create(
+            session=session, question=session.quiz.questions.first(), selected_answers=[], was_correct=True
+        )
+        since = WrappedReport.objects.filter(is_global=False).latest("generated_at").generated_at
+        result = refresh_term(self.term, since=since, generated_at=since + timedelta(seconds=1))
+
+        self.assertGreater(result.reranked, 0)
+        for report in WrappedReport.objects.filter(is_global=False).prefetch_related("top_quizzes"):
+            self.assertEqual(report.payload, report.to_payload())
@@ -18,6 +18,19 @@ def _no_activity_payload(term, *, is_global: bool = False) -> dict:
     }
 
 
+def _latest_payload(reports) -> dict | None:
+    """The stored payload of the latest-term report: one indexed lookup, no joins to render."""
+    latest = reports.order_by("-term__finish_date").values_list("id", "payload").first()
+    if latest is None:
+        return None
+    report_id, payload = latest
+    if payload is None:
+        # Written before payloads were stored; render it the old way.
+        report = reports.select_related("term").prefetch_related("top_quizzes").get(id=report_id)
+        payload = report.to_payload()
+    return payload
+
+
 @extend_schema(
     summary="Get Testownik Wrapped",
     description="Returns the current user's latest Wrapped report. Gated by the "
@@ -29,15 +42,9 @@ def get_wrapped(request: Request) -> Response:
     if not constance_config.WRAPPED_ENABLED:
         return Response({"detail": "Wrapped is not available."}, status=404)
 
-    report = (
-        WrappedReport.objects.filter(user=request.user, is_global=False)
-        .select_related("term")
-        .prefetch_related("top_quizzes")
-        .order_by("-term__finish_date")
-        .first()
-    )
-    if report is not None:
-        return Response(report.to_payload())
+    payload = _latest_payload(WrappedReport.objects.filter(user=request.user, is_global=False))
+    if payload is not None:
+        return Response(payload)
 
     return Response(_no_activity_payload(config.select_term()))
 
@@ -52,14 +59,8 @@ def get_wrapped_global(request: Request) -> Response:
     if not constance_config.WRAPPED_ENABLED:
         return Response({"detail": "Wrapped is not available."}, status=404)
 
-    report = (
-        WrappedReport.objects.filter(is_global=True)
-        .select_related("term")
-        .prefetch_related("top_quizzes")
-        .order_by("-term__finish_date")
-        .first()
-    )
-    if report is not None:
-        return Response(report.to_payload())
+    payload = _latest_payload(WrappedReport.objects.filter(is_global=True))
+    if payload is not None:
+        return Response(payload)
 
     return Response(_no_activity_payload(config.select_term(), is_global=True))